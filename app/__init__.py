@@ -5,7 +5,10 @@ from unidecode import unidecode
 from .membresia import models as membresia_models
 from .eleve import models as eleve_models
 from .financeiro import models as financeiro_models
+from .financeiro import resumo as financeiro_resumo
 from .grupos import models as grupos_models
+from .grupos import escopos as grupos_escopos
+from . import busca
 from .jornada import models as jornada_models
 from .eventos import models as eventos_models
 from .jornada.models import registrar_evento_jornada
@@ -66,11 +69,22 @@ def create_app():
     app.register_blueprint(eventos_bp)
     app.register_blueprint(jornada_bp)
 
-    from .cli import create_admin, optimize_images_command, seed_plano_contas, migrar_dados_antigos
+    from .cli import create_admin, optimize_images_command, seed_plano_contas, migrar_dados_antigos, reindexar_busca, benchmark_periodos
     app.cli.add_command(create_admin)
     app.cli.add_command(optimize_images_command)
     app.cli.add_command(seed_plano_contas)
     app.cli.add_command(migrar_dados_antigos)
+    app.cli.add_command(reindexar_busca)
+    app.cli.add_command(benchmark_periodos)
+
+    from .grupos.cli import grupos as grupos_cli
+    app.cli.add_command(grupos_cli)
+
+    from .membresia.cli import membresia as membresia_cli
+    app.cli.add_command(membresia_cli)
+
+    from .financeiro.cli import financeiro as financeiro_cli
+    app.cli.add_command(financeiro_cli)
 
     @app.context_processor
     def inject_config():
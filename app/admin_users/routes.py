@@ -3,6 +3,7 @@ from flask_login import login_required, current_user
 from app.extensions import db
 from app.auth.models import User
 from app.membresia.models import Membro
+from app.busca import filtro_nome
 from app.decorators import admin_required, secretaria_or_admin_required
 from .forms import RequestResetPasswordForm, ResetPasswordForm, UserEditForm
 from werkzeug.security import generate_password_hash
@@ -26,7 +27,7 @@ def list_users():
         query = query.join(Membro, User.membro_id == Membro.id, isouter=True).filter(
             or_(
                 User.email.ilike(f'%{busca}%'),
-                Membro.nome_completo.ilike(f'%{busca}%')
+                filtro_nome(Membro, busca)
             )
         )
 
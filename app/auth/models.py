@@ -3,6 +3,7 @@ from flask_login import UserMixin
 from werkzeug.security import generate_password_hash, check_password_hash
 from app.membresia.models import Membro
 from app.grupos.models import Area, Setor, PequenoGrupo
+from app.auth.permissoes import indice_permissoes
 
 class User(db.Model, UserMixin):
     id = db.Column(db.Integer, primary_key=True)
@@ -29,64 +30,30 @@ class User(db.Model, UserMixin):
         return permission_name in permissions_list
 
     def is_leader(self):
-        if not self.membro:
+        if not self.membro_id or self.membro is None:
             return False
-            
-        return (len(self.membro.areas_supervisionadas) > 0 or
-                len(self.membro.setores_supervisionados) > 0 or
-                len(self.membro.pgs_facilitados) > 0 or
-                len(self.membro.pgs_anfitriados) > 0)
+        return self.membro.cargos_mask != 0
 
     def has_group_permission(self, entity, action):
         if self.has_permission('admin'):
             return True
             
-        if not self.membro:
+        if not self.membro_id:
             return False
 
-        membro_logado = self.membro
+        indice = indice_permissoes(self.membro_id)
 
         if isinstance(entity, Area):
-            if membro_logado in entity.supervisores:
-                return True
-            return False
+            return indice.permite('area', entity.id, action)
 
         if isinstance(entity, Setor):
-            if membro_logado in entity.supervisores:
-                return True
-            if entity.area and membro_logado in entity.area.supervisores:
-                if action in ['edit', 'manage_metas_setor', 'view']:
-                    return True
-            return False
+            return indice.permite('setor', entity.id, action)
 
         if isinstance(entity, PequenoGrupo):
-            if entity.facilitador_id == membro_logado.id:
-                if action in ['view', 'edit', 'manage_participants', 'manage_metas_pg']:
-                    return True
-            if entity.anfitriao_id == membro_logado.id:
-                if action in ['view', 'manage_participants', 'manage_metas_pg']:
-                    return True
-            if entity.setor and membro_logado in entity.setor.supervisores:
-                if action in ['view', 'edit', 'manage_participants', 'manage_metas_pg']:
-                    return True
-            if action == 'view' and entity.setor and entity.setor.area and membro_logado in entity.setor.area.supervisores:
-                return True
-            return False
+            return indice.permite('pg', entity.id, action)
         
         if isinstance(entity, Membro):
-            if entity.id == membro_logado.id:
-                return True
-            if membro_logado.pgs_facilitados.filter_by(id=entity.pg_id).first() or \
-               membro_logado.pgs_anfitriados.filter_by(id=entity.pg_id).first():
-                return True
-            for setor in membro_logado.setores_supervisionados:
-                if entity.pg_participante in setor.pequenos_grupos.all():
-                    return True
-            for area in membro_logado.areas_supervisionadas:
-                for setor in area.setores:
-                    if entity.pg_participante in setor.pequenos_grupos.all():
-                        return True
-            return False
+            return indice.permite_membro(entity.id)
             
         return False
 
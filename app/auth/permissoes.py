@@ -0,0 +1,115 @@
+from app.extensions import db
+from app.cache import CacheVersionado, VERSAO_HIERARQUIA
+from app.grupos.models import Setor, PequenoGrupo, area_supervisores, setor_supervisores
+from app.membresia.models import Membro
+from sqlalchemy import select, and_, or_
+
+TODAS_AS_ACOES = '*'
+
+ACOES_SUPERVISOR_AREA_NO_SETOR = frozenset({'view', 'edit', 'manage_metas_setor'})
+ACOES_SUPERVISOR_SETOR_NO_PG = frozenset({'view', 'edit', 'manage_participants', 'manage_metas_pg'})
+ACOES_FACILITADOR = frozenset({'view', 'edit', 'manage_participants', 'manage_metas_pg'})
+ACOES_ANFITRIAO = frozenset({'view', 'manage_participants', 'manage_metas_pg'})
+ACOES_SUPERVISOR_AREA_NO_PG = frozenset({'view'})
+
+# Tipos de grupo por nome de tabela (usado pelo decorator group_permission_required).
+TIPO_POR_TABELA = {'area': 'area', 'setor': 'setor', 'pequeno_grupo': 'pg'}
+
+_cache = CacheVersionado(VERSAO_HIERARQUIA, tamanho_maximo=2000)
+
+
+class IndicePermissoes:
+    """
+    Índice das permissões de um membro sobre a hierarquia de grupos.
+
+    - grupos[tipo][id] -> conjunto de ações permitidas ('*' = todas), para tipo em 'area', 'setor', 'pg'.
+    - membros -> ids dos membros que ele pode acessar (ele próprio e os dos grupos que lidera/supervisiona).
+    """
+    def __init__(self, grupos, membros):
+        self.grupos = grupos
+        self.membros = membros
+
+    def alcanca(self, tipo, grupo_id):
+        """Se o grupo está dentro da hierarquia do membro (independente da ação)."""
+        return grupo_id in self.grupos.get(tipo, {})
+
+    def permite(self, tipo, grupo_id, acao):
+        acoes = self.grupos.get(tipo, {}).get(grupo_id)
+        if not acoes:
+            return False
+        return TODAS_AS_ACOES in acoes or acao in acoes
+
+    def supervisiona(self, tipo, grupo_id):
+        """Se o membro é supervisor direto da área/setor (todas as ações)."""
+        return TODAS_AS_ACOES in self.grupos.get(tipo, {}).get(grupo_id, ())
+
+    def permite_membro(self, membro_id):
+        return membro_id in self.membros
+
+    @property
+    def is_lider(self):
+        return any(self.grupos.values())
+
+
+def _adicionar(grupos, tipo, grupo_id, acoes):
+    grupos[tipo][grupo_id] = grupos[tipo].get(grupo_id, frozenset()) | acoes
+
+
+def construir_indice(membro_id):
+    """Monta o índice a partir das tabelas de hierarquia (quatro consultas, sem carregar objetos)."""
+    grupos = {'area': {}, 'setor': {}, 'pg': {}}
+
+    areas_supervisionadas = set(db.session.execute(
+        select(area_supervisores.c.area_id).where(area_supervisores.c.supervisor_id == membro_id)
+    ).scalars())
+    for area_id in areas_supervisionadas:
+        _adicionar(grupos, 'area', area_id, frozenset({TODAS_AS_ACOES}))
+
+    setores = db.session.execute(
+        select(Setor.id, Setor.area_id, setor_supervisores.c.supervisor_id)
+        .outerjoin(setor_supervisores, and_(setor_supervisores.c.setor_id == Setor.id, setor_supervisores.c.supervisor_id == membro_id))
+        .where(or_(setor_supervisores.c.supervisor_id.isnot(None), Setor.area_id.in_(areas_supervisionadas)))
+    ).all()
+    setores_supervisionados = set()
+    for setor_id, area_id, supervisor_id in setores:
+        if supervisor_id is not None:
+            setores_supervisionados.add(setor_id)
+            _adicionar(grupos, 'setor', setor_id, frozenset({TODAS_AS_ACOES}))
+        if area_id in areas_supervisionadas:
+            _adicionar(grupos, 'setor', setor_id, ACOES_SUPERVISOR_AREA_NO_SETOR)
+
+    pgs = db.session.execute(
+        select(PequenoGrupo.id, PequenoGrupo.setor_id, Setor.area_id, PequenoGrupo.facilitador_id, PequenoGrupo.anfitriao_id)
+        .join(Setor, PequenoGrupo.setor_id == Setor.id)
+        .where(or_(
+            PequenoGrupo.facilitador_id == membro_id,
+            PequenoGrupo.anfitriao_id == membro_id,
+            PequenoGrupo.setor_id.in_(setores_supervisionados),
+            Setor.area_id.in_(areas_supervisionadas),
+        ))
+    ).all()
+    for pg_id, setor_id, area_id, facilitador_id, anfitriao_id in pgs:
+        if facilitador_id == membro_id:
+            _adicionar(grupos, 'pg', pg_id, ACOES_FACILITADOR)
+        if anfitriao_id == membro_id:
+            _adicionar(grupos, 'pg', pg_id, ACOES_ANFITRIAO)
+        if setor_id in setores_supervisionados:
+            _adicionar(grupos, 'pg', pg_id, ACOES_SUPERVISOR_SETOR_NO_PG)
+        if area_id in areas_supervisionadas:
+            _adicionar(grupos, 'pg', pg_id, ACOES_SUPERVISOR_AREA_NO_PG)
+
+    membros = {membro_id}
+    if grupos['pg']:
+        membros.update(db.session.execute(
+            select(Membro.id).where(Membro.pg_id.in_(list(grupos['pg'])))
+        ).scalars())
+
+    return IndicePermissoes(grupos, frozenset(membros))
+
+
+def indice_permissoes(membro_id):
+    """
+    Índice de permissões do membro, mantido em memória até a próxima alteração da hierarquia.
+    A versão da hierarquia é lida do banco no máximo uma vez por requisição.
+    """
+    return _cache.obter(membro_id, lambda: construir_indice(membro_id))
@@ -0,0 +1,240 @@
+from app.extensions import db
+from app.cache import CacheVersionado, incrementar_versao, VERSAO_MEMBROS
+from app.membresia.models import Membro
+from app.grupos.models import Area, Setor, PequenoGrupo
+from flask import current_app
+from sqlalchemy import event, select, update, text, table, column, literal_column
+from sqlalchemy.orm import Session
+from bisect import bisect_left
+from itertools import chain
+from unidecode import unidecode
+
+# Coluna de nome de cada modelo pesquisável; a versão normalizada fica em <modelo>.nome_normalizado.
+CAMPOS_NOME = {
+    Membro: 'nome_completo',
+    Area: 'nome',
+    Setor: 'nome',
+    PequenoGrupo: 'nome',
+}
+
+# Índice FTS5 (tokenizador trigram) sobre membro.nome_normalizado, mantido por triggers no SQLite.
+TABELA_FTS_MEMBROS = 'membro_busca'
+
+SQL_INDICE_FTS_MEMBROS = [
+    f"""CREATE VIRTUAL TABLE IF NOT EXISTS {TABELA_FTS_MEMBROS}
+        USING fts5(nome_normalizado, content='membro', content_rowid='id', tokenize='trigram')""",
+    f"""CREATE TRIGGER IF NOT EXISTS {TABELA_FTS_MEMBROS}_ai AFTER INSERT ON membro BEGIN
+            INSERT INTO {TABELA_FTS_MEMBROS}(rowid, nome_normalizado) VALUES (new.id, new.nome_normalizado);
+        END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {TABELA_FTS_MEMBROS}_ad AFTER DELETE ON membro BEGIN
+            INSERT INTO {TABELA_FTS_MEMBROS}({TABELA_FTS_MEMBROS}, rowid, nome_normalizado) VALUES ('delete', old.id, old.nome_normalizado);
+        END""",
+    f"""CREATE TRIGGER IF NOT EXISTS {TABELA_FTS_MEMBROS}_au AFTER UPDATE OF nome_normalizado ON membro BEGIN
+            INSERT INTO {TABELA_FTS_MEMBROS}({TABELA_FTS_MEMBROS}, rowid, nome_normalizado) VALUES ('delete', old.id, old.nome_normalizado);
+            INSERT INTO {TABELA_FTS_MEMBROS}(rowid, nome_normalizado) VALUES (new.id, new.nome_normalizado);
+        END""",
+]
+
+
+def normalizar(texto):
+    """Texto sem acentos, em minúsculas e com espaços simples (ex.: 'João  Araújo' -> 'joao araujo')."""
+    return ' '.join(unidecode(texto or '').lower().split())
+
+
+def _fts_disponivel():
+    disponivel = current_app.extensions.get('busca_fts_membros')
+    if disponivel is None:
+        disponivel = db.engine.dialect.name == 'sqlite' and db.session.execute(
+            text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = :nome"),
+            {'nome': TABELA_FTS_MEMBROS}
+        ).first() is not None
+        current_app.extensions['busca_fts_membros'] = disponivel
+    return disponivel
+
+
+def filtro_nome(modelo, termo):
+    """
+    Condição "nome contém o termo" (sem diferenciar acentos e maiúsculas) para Membro, Area, Setor ou PequenoGrupo.
+    Para membros no SQLite a busca passa pelo índice trigram; nos demais casos usa a coluna normalizada.
+    """
+    padrao = f'%{normalizar(termo)}%'
+    if modelo is Membro and _fts_disponivel():
+        fts = table(TABELA_FTS_MEMBROS, column('nome_normalizado'))
+        encontrados = select(literal_column('rowid')).select_from(fts).where(fts.c.nome_normalizado.like(padrao))
+        return Membro.id.in_(encontrados)
+    return modelo.nome_normalizado.like(padrao)
+
+
+def _atualizar_nome_normalizado(mapper, connection, alvo):
+    alvo.nome_normalizado = normalizar(getattr(alvo, CAMPOS_NOME[type(alvo)]))
+
+for _modelo in CAMPOS_NOME:
+    event.listen(_modelo, 'before_insert', _atualizar_nome_normalizado)
+    event.listen(_modelo, 'before_update', _atualizar_nome_normalizado)
+
+
+def reconstruir_busca(sessao=None):
+    """
+    Recalcula os nomes normalizados de todos os modelos e, no SQLite, recria e repopula o índice FTS de membros.
+    Não faz commit. Retorna o número de registros normalizados.
+    """
+    sessao = sessao or db.session
+    total = 0
+    for modelo, campo in CAMPOS_NOME.items():
+        linhas = sessao.execute(select(modelo.id, getattr(modelo, campo))).all()
+        valores = [{'id': id, 'nome_normalizado': normalizar(nome)} for id, nome in linhas]
+        if valores:
+            sessao.execute(update(modelo), valores)
+        total += len(valores)
+
+    if sessao.get_bind().dialect.name == 'sqlite':
+        for comando in SQL_INDICE_FTS_MEMBROS:
+            sessao.execute(text(comando))
+        sessao.execute(text(f"INSERT INTO {TABELA_FTS_MEMBROS}({TABELA_FTS_MEMBROS}) VALUES ('rebuild')"))
+        current_app.extensions.pop('busca_fts_membros', None)
+    return total
+
+
+# ====================================================================
+# AUTOCOMPLETE DE MEMBROS (índice em memória por prefixo de palavra)
+# ====================================================================
+
+# Marca, em session.info, que o commit corrente altera membros (invalida o índice).
+CHAVE_MEMBROS_ALTERADOS = 'membros_alterados'
+
+
+class MembroResumo:
+    """Dados de um membro guardados no índice de autocomplete."""
+    __slots__ = ('id', 'nome_completo', 'ativo', 'status', 'campus', 'pg_id', 'participou_encontro_deus')
+
+    def __init__(self, id, nome_completo, ativo, status, campus, pg_id, participou_encontro_deus):
+        self.id = id
+        self.nome_completo = nome_completo
+        self.ativo = bool(ativo)
+        self.status = status
+        self.campus = campus
+        self.pg_id = pg_id
+        self.participou_encontro_deus = bool(participou_encontro_deus)
+
+
+class IndiceMembros:
+    """
+    Índice em memória dos membros: cada palavra do nome normalizado aponta para os membros que a contêm.
+    Um termo de busca casa quando cada uma das suas palavras é início de alguma palavra do nome
+    (ex.: 'jo silv' encontra 'João da Silva').
+    """
+    def __init__(self, membros):
+        self.membros = sorted(membros, key=lambda m: m.nome_completo)
+        self.por_id = {m.id: m for m in self.membros}
+        entradas = sorted(
+            (palavra, posicao)
+            for posicao, membro in enumerate(self.membros)
+            for palavra in set(normalizar(membro.nome_completo).split())
+        )
+        self._palavras = [palavra for palavra, _ in entradas]
+        self._posicoes = [posicao for _, posicao in entradas]
+
+    def _com_prefixo(self, prefixo):
+        inicio = bisect_left(self._palavras, prefixo)
+        fim = inicio
+        while fim < len(self._palavras) and self._palavras[fim].startswith(prefixo):
+            fim += 1
+        return set(self._posicoes[inicio:fim])
+
+    def buscar(self, termo, filtro=None, limite=20):
+        prefixos = normalizar(termo).split()
+        if prefixos:
+            conjuntos = sorted((self._com_prefixo(p) for p in set(prefixos)), key=len)
+            posicoes = sorted(set.intersection(*conjuntos))
+        else:
+            posicoes = range(len(self.membros))
+
+        resultados = []
+        for posicao in posicoes:
+            membro = self.membros[posicao]
+            if filtro is None or filtro(membro):
+                resultados.append(membro)
+                if len(resultados) >= limite:
+                    break
+        return resultados
+
+
+def _construir_indice_membros():
+    linhas = db.session.execute(select(
+        Membro.id, Membro.nome_completo, Membro.ativo, Membro.status, Membro.campus,
+        Membro.pg_id, Membro.participou_encontro_deus,
+    ))
+    return IndiceMembros([MembroResumo(*linha) for linha in linhas])
+
+_cache_indice = CacheVersionado(VERSAO_MEMBROS, tamanho_maximo=1)
+
+
+def indice_membros():
+    """Índice de autocomplete, reconstruído na primeira busca após qualquer alteração em membros."""
+    return _cache_indice.obter('membros', _construir_indice_membros)
+
+
+def buscar_membros(termo, limite=20, ativo=True, sem_pg=False, status=None, sem_encontro_deus=False,
+                   excluir_ids=(), fora_do_evento=None, fora_da_turma=None):
+    """
+    Serviço único dos campos de seleção de membros (autocomplete). O casamento do nome é feito
+    em memória; apenas os filtros de evento/turma consultam o banco (uma consulta indexada cada).
+
+    Args:
+        ativo: True/False filtra pela situação; None traz todos.
+        sem_pg: apenas membros sem PG.
+        status: apenas membros com este status (ex.: 'Não-Membro').
+        sem_encontro_deus: apenas quem ainda não participou do Encontro com Deus.
+        excluir_ids: ids a ignorar (ex.: o próprio usuário).
+        fora_do_evento / fora_da_turma: ignora quem já participa do evento / turma de CTM informado.
+
+    Returns:
+        Lista de MembroResumo em ordem de nome.
+    """
+    excluidos = {i for i in excluir_ids if i is not None}
+    if fora_do_evento:
+        from app.eventos.models import participantes_evento
+        excluidos.update(db.session.execute(
+            select(participantes_evento.c.membro_id).where(participantes_evento.c.evento_id == fora_do_evento)
+        ).scalars())
+    if fora_da_turma:
+        from app.ctm.models import aluno_turma
+        excluidos.update(db.session.execute(
+            select(aluno_turma.c.membro_id).where(aluno_turma.c.turma_id == fora_da_turma)
+        ).scalars())
+
+    def filtro(membro):
+        return (
+            (ativo is None or membro.ativo == ativo) and
+            (not sem_pg or membro.pg_id is None) and
+            (status is None or membro.status == status) and
+            (not sem_encontro_deus or not membro.participou_encontro_deus) and
+            membro.id not in excluidos
+        )
+
+    return indice_membros().buscar(termo, filtro, limite)
+
+
+def _membros_alterados(sessao):
+    sessao.info[CHAVE_MEMBROS_ALTERADOS] = True
+
+@event.listens_for(Session, 'after_flush')
+def _coletar_membros_alterados(sessao, flush_context):
+    if any(isinstance(obj, Membro) for obj in chain(sessao.new, sessao.dirty, sessao.deleted)):
+        _membros_alterados(sessao)
+
+@event.listens_for(Session, 'do_orm_execute')
+def _coletar_alteracoes_em_massa(estado):
+    if (estado.is_update or estado.is_delete) and estado.bind_mapper is not None \
+            and estado.bind_mapper.class_ is Membro:
+        _membros_alterados(estado.session)
+
+@event.listens_for(Session, 'before_commit')
+def _invalidar_indice_membros(sessao):
+    sessao.flush()
+    if sessao.info.pop(CHAVE_MEMBROS_ALTERADOS, False):
+        incrementar_versao(sessao, VERSAO_MEMBROS)
+
+@event.listens_for(Session, 'after_rollback')
+def _descartar_membros_alterados(sessao):
+    sessao.info.pop(CHAVE_MEMBROS_ALTERADOS, None)
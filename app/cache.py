@@ -0,0 +1,83 @@
+from app.extensions import db
+from flask import g, has_app_context, has_request_context
+from sqlalchemy import select, update, insert
+from collections import OrderedDict
+from threading import Lock
+
+# Chaves de versão usadas pela aplicação.
+VERSAO_HIERARQUIA = 'hierarquia'
+VERSAO_MEMBROS = 'membros'
+
+
+class CacheVersao(db.Model):
+    """
+    Contador de versão por assunto (ex.: 'hierarquia'). Incrementado no mesmo commit que
+    altera os dados, invalida os caches em memória de todos os processos da aplicação.
+    """
+    __tablename__ = 'cache_versao'
+
+    chave = db.Column(db.String(50), primary_key=True)
+    versao = db.Column(db.Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f'<CacheVersao {self.chave}={self.versao}>'
+
+
+def versao_atual(chave):
+    """Versão corrente de uma chave; lida do banco no máximo uma vez por requisição."""
+    if has_request_context():
+        versoes = g.setdefault('_cache_versoes', {})
+        if chave not in versoes:
+            versoes[chave] = _ler_versao(chave)
+        return versoes[chave]
+    return _ler_versao(chave)
+
+
+def _ler_versao(chave):
+    return db.session.execute(select(CacheVersao.versao).where(CacheVersao.chave == chave)).scalar() or 0
+
+
+def incrementar_versao(sessao, chave):
+    """Incrementa a versão de uma chave dentro da transação da sessão informada. Não faz commit."""
+    resultado = sessao.execute(update(CacheVersao).where(CacheVersao.chave == chave).values(versao=CacheVersao.versao + 1))
+    if resultado.rowcount == 0:
+        sessao.execute(insert(CacheVersao).values(chave=chave, versao=1))
+    if has_app_context():
+        g.setdefault('_cache_versoes', {}).pop(chave, None)
+
+
+class CacheVersionado:
+    """
+    Cache em memória (LRU) cujos itens valem enquanto a versão da chave (ou de todas as chaves,
+    se for uma tupla) não mudar.
+
+    Uso:
+        cache = CacheVersionado(VERSAO_HIERARQUIA)
+        valor = cache.obter(membro_id, lambda: montar_valor(membro_id))
+    """
+    def __init__(self, chave_versao, tamanho_maximo=1000):
+        self.chave_versao = chave_versao
+        self._chaves_versao = (chave_versao,) if isinstance(chave_versao, str) else tuple(chave_versao)
+        self.tamanho_maximo = tamanho_maximo
+        self._itens = OrderedDict()
+        self._lock = Lock()
+
+    def obter(self, chave, construtor):
+        versao = tuple(versao_atual(chave) for chave in self._chaves_versao)
+        with self._lock:
+            item = self._itens.get(chave)
+            if item is not None and item[0] == versao:
+                self._itens.move_to_end(chave)
+                return item[1]
+
+        valor = construtor()
+        with self._lock:
+            self._itens[chave] = (versao, valor)
+            self._itens.move_to_end(chave)
+            while len(self._itens) > self.tamanho_maximo:
+                self._itens.popitem(last=False)
+        return valor
+
+    def limpar(self):
+        with self._lock:
+            self._itens.clear()
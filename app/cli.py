@@ -1,13 +1,31 @@
 import click
 import os
+import re
 from flask.cli import with_appcontext
 from flask import current_app
 from app.extensions import db
 from app.auth.models import User
 from app.membresia.models import Membro
-from app.membresia.routes import save_profile_picture, allowed_file, PROFILE_PIC_SIZE, COMPRESSION_QUALITY
-from app.financeiro.models import CategoriaDespesa, ItemDespesa, Despesa
-from PIL import Image
+from app.membresia.fotos import (
+    FOTO_PADRAO, ManifestoOtimizacao, assinatura_variantes, eh_foto_por_conteudo, variantes, variantes_prontas,
+    arquivos_da_foto, melhor_origem, otimizar_foto, descartar_foto
+)
+from app.financeiro.models import CategoriaDespesa, ItemDespesa, Despesa, Contribuicao
+from app.busca import reconstruir_busca
+from app.ctm.models import Presenca, AulaRealizada
+from app.eventos.models import Evento
+from app.eleve.models import RegistroPresenca
+from app.grupos.models import PequenoGrupo, IndicadorHistorico
+from app.grupos.escopos import ESCOPO_GERAL, ESCOPO_GERAL_ID
+from app.grupos.indicadores import janelas_de_meta, JANELA_FREQUENCIA_DIAS
+from app.periodos import Periodo
+from sqlalchemy import select, update, func, extract, cast, String
+from datetime import date, timedelta
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import time
+
+# Fotos processadas entre cada gravação do progresso (banco e manifesto).
+LOTE_OTIMIZACAO = 50
 
 @click.command("create-admin")
 @with_appcontext
@@ -22,52 +40,116 @@ def create_admin():
         click.echo("✅ Usuário 'admin' criado com sucesso.")
 
 @click.command('optimize-images')
+@click.option('--workers', type=int, default=None, help='Processos em paralelo (padrão: número de núcleos).')
+@click.option('--dry-run', is_flag=True, help='Apenas mostra o que seria otimizado, sem gravar nada.')
+@click.option('--manifesto', type=click.Path(dir_okay=False), default=None,
+              help='Arquivo de controle das fotos já otimizadas (padrão: instance/otimizacao_fotos.json).')
 @with_appcontext
-def optimize_images_command():
-    click.echo('Iniciando otimização das fotos de perfil existentes...')
-    
+def optimize_images_command(workers, dry_run, manifesto):
+    """
+    Otimiza as fotos de perfil em paralelo: converte as fotos antigas (um arquivo por membro)
+    para o formato atual e gera de novo os tamanhos das fotos feitas com outra configuração
+    de tamanhos/formatos. O manifesto guarda o que já foi feito, então uma execução
+    interrompida pode ser retomada e as seguintes pulam as fotos prontas.
+    """
     upload_folder = current_app.config['UPLOAD_FOLDER']
-    membros = Membro.query.filter(Membro.foto_perfil.isnot(None)).all()
-    total_membros = len(membros)
-    membros_otimizados = 0
-    membros_com_erro = 0
-
     if not os.path.exists(upload_folder):
         click.echo('Pasta de uploads não encontrada. Abortando.')
         return
-    
-    for membro in membros:
-        if membro.foto_perfil and membro.foto_perfil != 'default.jpg':
-            filepath = os.path.join(upload_folder, membro.foto_perfil)
-            if not os.path.exists(filepath):
-                click.echo(f"Aviso: Arquivo '{membro.foto_perfil}' não encontrado para o membro {membro.nome_completo}.")
+
+    manifesto = ManifestoOtimizacao(manifesto or os.path.join(current_app.instance_path, 'otimizacao_fotos.json'))
+    assinatura = assinatura_variantes()
+    fotos_em_uso = db.session.execute(
+        select(Membro.foto_perfil).where(Membro.foto_perfil.isnot(None), Membro.foto_perfil != FOTO_PADRAO).distinct()
+    ).scalars().all()
+
+    # (foto atual, arquivo de origem, chave conhecida, forçar nova geração)
+    tarefas = []
+    prontas = 0
+    for foto in fotos_em_uso:
+        if not eh_foto_por_conteudo(foto):
+            origem = os.path.join(upload_folder, foto)
+            if not os.path.exists(origem):
+                click.echo(f"Aviso: Arquivo '{foto}' não encontrado.")
                 continue
+            tarefas.append((foto, origem, None, False))
+            continue
 
-            try:
-                img = Image.open(filepath)
+        entrada = manifesto.entradas.get(foto)
+        atualizada = variantes_prontas(upload_folder, foto) and \
+            set(arquivos_da_foto(upload_folder, foto)) == set(variantes(foto)) and \
+            (entrada is None or manifesto.concluida(foto, assinatura))
+        if atualizada:
+            prontas += 1
+            if not dry_run and entrada is None:
+                manifesto.registrar(foto, status='ok', assinatura=assinatura)
+            continue
 
-                img.thumbnail(PROFILE_PIC_SIZE, Image.Resampling.LANCZOS)
+        origem = melhor_origem(upload_folder, foto)
+        if not origem:
+            click.echo(f"Aviso: Nenhum arquivo encontrado para a foto '{foto}'.")
+            continue
+        tarefas.append((foto, origem, foto, True))
 
-                if img.mode in ('RGBA', 'P'):
-                    img = img.convert('RGB')
-                
-                temp_buffer = os.path.join(upload_folder, 'temp_' + membro.foto_perfil)
-                img.save(temp_buffer, quality=COMPRESSION_QUALITY, optimize=True)
+    antigas = sum(1 for _, _, chave, _ in tarefas if chave is None)
+    click.echo(f'{len(fotos_em_uso)} fotos em uso: {prontas} já otimizadas, {antigas} antigas a converter, '
+               f'{len(tarefas) - antigas} a gerar de novo.')
+    if dry_run:
+        click.echo('ℹ️  Simulação (--dry-run): nenhuma foto foi alterada.')
+        return
+    if not tarefas:
+        manifesto.salvar()
+        click.echo('✅ Nada a otimizar.')
+        return
 
-                os.remove(filepath)
-                os.rename(temp_buffer, filepath)
+    bytes_origem = sum(os.path.getsize(origem) for _, origem, _, _ in tarefas)
+    otimizadas = 0
+    com_erro = 0
+    convertidas = []
 
-                membros_otimizados += 1
-                click.echo(f"Otimizado: {membro.nome_completo} ({membros_otimizados}/{total_membros})")
+    def salvar_progresso():
+        db.session.commit()
+        for foto in convertidas:
+            descartar_foto(foto)
+        convertidas.clear()
+        manifesto.salvar()
 
-            except Exception as e:
-                membros_com_erro += 1
-                click.echo(f"Erro ao otimizar foto de {membro.nome_completo}: {e}", err=True)
-    
+    inicio = time.perf_counter()
+    try:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            futuros = {
+                executor.submit(otimizar_foto, upload_folder, origem, chave, forcar): foto
+                for foto, origem, chave, forcar in tarefas
+            }
+            for concluidos, futuro in enumerate(as_completed(futuros), 1):
+                foto = futuros[futuro]
+                try:
+                    chave, _ = futuro.result()
+                except Exception as e:
+                    com_erro += 1
+                    manifesto.registrar(foto, status='erro', assinatura=assinatura, erro=str(e))
+                    click.echo(f"❌ Erro ao otimizar a foto '{foto}': {e}", err=True)
+                    continue
+
+                if chave != foto:
+                    db.session.execute(update(Membro).where(Membro.foto_perfil == foto).values(foto_perfil=chave))
+                    convertidas.append(foto)
+                    manifesto.entradas.pop(foto, None)
+                manifesto.registrar(chave, status='ok', assinatura=assinatura)
+                otimizadas += 1
+
+                if concluidos % LOTE_OTIMIZACAO == 0:
+                    salvar_progresso()
+                    click.echo(f'   {concluidos}/{len(tarefas)} fotos processadas...')
+    finally:
+        salvar_progresso()
+
+    duracao = max(time.perf_counter() - inicio, 1e-6)
     click.echo('---')
-    click.echo(f'Otimização concluída. {membros_otimizados} fotos otimizadas.')
-    if membros_com_erro > 0:
-        click.echo(f'{membros_com_erro} fotos apresentaram erros. Verifique os logs.')
+    click.echo(f'✅ Otimização concluída: {otimizadas} fotos em {duracao:.1f}s '
+               f'({otimizadas / duracao:.1f} fotos/s, {bytes_origem / duracao / 1024 / 1024:.1f} MB/s lidos).')
+    if com_erro > 0:
+        click.echo(f'❌ {com_erro} fotos apresentaram erros (registrados no manifesto); serão tentadas de novo na próxima execução.')
 
 @click.command('seed-plano-contas')
 @with_appcontext
@@ -312,4 +394,136 @@ def migrar_dados_antigos():
 
     except Exception as e:
         db.session.rollback()
-        click.echo(f"❌ Erro durante a migração: {e}")
\ No newline at end of file
+        click.echo(f"❌ Erro durante a migração: {e}")
+@click.command('reindexar-busca')
+@with_appcontext
+def reindexar_busca():
+    """
+    Recalcula os nomes normalizados (membros, áreas, setores e PGs) e recria o índice de busca de membros.
+
+    Uso: flask reindexar-busca
+    """
+    click.echo('Reindexando as buscas por nome...')
+    try:
+        total = reconstruir_busca(db.session)
+        db.session.commit()
+        click.echo(f'✅ {total} nomes normalizados.')
+    except Exception as e:
+        db.session.rollback()
+        click.echo(f'❌ Erro ao reindexar a busca: {e}')
+
+def _consultas_por_periodo(hoje):
+    """
+    (descrição, coluna de data, consulta atual, forma antiga) de cada uso de Periodo no sistema.
+    A forma antiga (quando havia) aplica funções à coluna ou usa o fim inclusivo, e serve de comparação.
+    """
+    mes = Periodo.mes_de(hoje)
+    janela = Periodo.ultimos_dias(JANELA_FREQUENCIA_DIAS, hoje)
+    ano = Periodo.ano(hoje.year)
+    mes_do_ano = (extract('year', Contribuicao.data_lanc) == hoje.year, extract('month', Contribuicao.data_lanc) == hoje.month)
+    membro_ids = select(Membro.id).order_by(Membro.id).limit(100)
+    meta = janelas_de_meta()
+
+    return [
+        ('Receitas do mês (resumo financeiro)', 'data_lanc',
+         select(func.sum(Contribuicao.valor)).where(mes.filtro(Contribuicao.data_lanc)),
+         select(func.sum(Contribuicao.valor)).where(*mes_do_ano)),
+        ('Despesas pagas no mês (resumo financeiro)', 'data_pagamento',
+         select(func.sum(Despesa.valor)).where(Despesa.pago == True, mes.filtro(Despesa.data_pagamento)),
+         select(func.sum(Despesa.valor)).where(
+             Despesa.pago == True, extract('year', Despesa.data_pagamento) == hoje.year,
+             extract('month', Despesa.data_pagamento) == hoje.month)),
+        ('Despesas a pagar no mês (resumo financeiro)', 'data_vencimento',
+         select(func.sum(Despesa.valor)).where(Despesa.pago == False, mes.filtro(Despesa.data_vencimento)), None),
+        ('Lançamentos de despesas entre datas (filtros e exportação)', 'data_lanc',
+         select(Despesa.id).where(Periodo.entre(mes.inicio, hoje).filtro(Despesa.data_lanc)), None),
+        ('Dízimo no mês atual (flags de membros)', 'data_lanc',
+         select(Contribuicao.membro_id).where(
+             Contribuicao.membro_id.in_(membro_ids), Contribuicao.tipo == 'Dízimo', mes.filtro(Contribuicao.data_lanc)
+         ).distinct(),
+         select(Contribuicao.membro_id).where(
+             Contribuicao.membro_id.in_(membro_ids), Contribuicao.tipo == 'Dízimo',
+             cast(Contribuicao.data_lanc, String).like(f'{hoje:%Y-%m}%')
+         ).distinct()),
+        (f'Dízimo nos últimos {JANELA_FREQUENCIA_DIAS} dias (indicadores)', 'data_lanc',
+         select(Contribuicao.membro_id).where(Contribuicao.tipo == 'Dízimo', janela.filtro(Contribuicao.data_lanc)).distinct(),
+         None),
+        (f'Presença no CTM nos últimos {JANELA_FREQUENCIA_DIAS} dias (indicadores)', 'data',
+         select(Presenca.membro_id).join(AulaRealizada).where(janela.filtro(AulaRealizada.data)).distinct(), None),
+        ('Recepções no ano (janela de meta)', 'data_recepcao',
+         select(func.count(Membro.id)).where(ano.filtro(Membro.data_recepcao)), None),
+        ('Encontros com Deus no ano (janela de meta)', 'data_evento',
+         select(Evento.id).where(Evento.tipo_evento == 'Encontro com Deus', ano.filtro(Evento.data_evento)), None),
+        ('Multiplicações na meta vigente de cada área', 'data_multiplicacao',
+         select(meta.c.area_id, func.count(PequenoGrupo.id))
+         .join(PequenoGrupo, Periodo.da_meta_vigente(meta).filtro(PequenoGrupo.data_multiplicacao))
+         .group_by(meta.c.area_id),
+         select(meta.c.area_id, func.count(PequenoGrupo.id))
+         .join(PequenoGrupo, PequenoGrupo.data_multiplicacao.between(meta.c.data_inicio, meta.c.data_fim))
+         .group_by(meta.c.area_id)),
+        ('Série histórica de indicadores', 'data',
+         select(IndicadorHistorico).where(
+             IndicadorHistorico.escopo == ESCOPO_GERAL, IndicadorHistorico.escopo_id == ESCOPO_GERAL_ID,
+             Periodo.ultimos_dias(90, hoje).filtro(IndicadorHistorico.data)), None),
+        ('Pontuação semanal do Eleve', 'data',
+         select(func.sum(RegistroPresenca.pontuacao_ganha)).where(
+             RegistroPresenca.membro_id == select(func.min(RegistroPresenca.membro_id)).scalar_subquery(),
+             Periodo.entre(hoje - timedelta(days=6), hoje).filtro(RegistroPresenca.data)), None),
+    ]
+
+
+def _plano_de_execucao(consulta):
+    """Linhas do plano do banco para a consulta (EXPLAIN QUERY PLAN no SQLite, EXPLAIN nos demais)."""
+    dialeto = db.engine.dialect
+    sql = consulta.compile(dialect=dialeto, compile_kwargs={'literal_binds': True})
+    comando = 'EXPLAIN QUERY PLAN' if dialeto.name == 'sqlite' else 'EXPLAIN'
+    return [linha[-1] for linha in db.session.connection().exec_driver_sql(f'{comando} {sql}')]
+
+
+def _busca_por_indice(plano, coluna):
+    """
+    Se o plano localiza as linhas por um índice com condição sobre a coluna (busca por faixa),
+    e não lendo a tabela ou o índice inteiro. Olha a condição da busca, não o nome do índice.
+    """
+    condicao = re.compile(rf'\b{coluna}\s*[<>=]')
+    return any(('SEARCH' in linha or 'Index Cond' in linha) and condicao.search(linha) for linha in plano)
+
+
+def _tempo_medio(consulta, repeticoes):
+    inicio = time.perf_counter()
+    for _ in range(repeticoes):
+        db.session.execute(consulta).all()
+    return (time.perf_counter() - inicio) / repeticoes * 1000
+
+
+@click.command('benchmark-periodos')
+@click.option('--repeticoes', type=int, default=20, show_default=True, help='Execuções de cada consulta na medição do tempo.')
+@with_appcontext
+def benchmark_periodos(repeticoes):
+    """
+    Mostra o plano de execução e o tempo das consultas filtradas por Periodo (e, quando havia, da forma antiga
+    com extract()/LIKE/fim inclusivo), conferindo se cada uma busca as linhas pelo índice da coluna de data.
+    Em tabelas pequenas o PostgreSQL pode preferir a leitura sequencial mesmo com o índice disponível.
+
+    Uso: flask benchmark-periodos [--repeticoes 50]
+    """
+    sem_indice = 0
+    for descricao, coluna, consulta, antiga in _consultas_por_periodo(date.today()):
+        plano = _plano_de_execucao(consulta)
+        usa_indice = _busca_por_indice(plano, coluna)
+        sem_indice += not usa_indice
+        click.echo(f'\n▸ {descricao}')
+        for linha in plano:
+            click.echo(f'    {linha}')
+        resumo = f'{"✅" if usa_indice else "❌"} {"busca" if usa_indice else "não busca"} pelo índice de {coluna}' \
+                 f' · {_tempo_medio(consulta, repeticoes):.2f} ms'
+        if antiga is not None:
+            plano_antigo = _plano_de_execucao(antiga)
+            resumo += f' (forma antiga: {_tempo_medio(antiga, repeticoes):.2f} ms, ' \
+                      f'{"com" if _busca_por_indice(plano_antigo, coluna) else "sem"} busca pelo índice)'
+        click.echo(f'  {resumo}')
+
+    if sem_indice:
+        click.echo(f'\n❌ {sem_indice} consulta(s) sem busca pelo índice da coluna de data.')
+    else:
+        click.echo('\n✅ Todas as consultas por período usam o índice da coluna de data.')
@@ -66,7 +66,7 @@ class AulaModelo(db.Model):
 
 class AulaRealizada(db.Model):
     id = db.Column(db.Integer, primary_key=True)
-    data = db.Column(db.Date, nullable=False)
+    data = db.Column(db.Date, nullable=False, index=True)
     chave = db.Column(db.String(10), nullable=False)
     aula_modelo_id = db.Column(db.Integer, db.ForeignKey('aula_modelo.id'), nullable=False)
     turma_id = db.Column(db.Integer, db.ForeignKey('turma_ctm.id'), nullable=False)
@@ -85,7 +85,7 @@ class AulaRealizada(db.Model):
 class Presenca(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     membro_id = db.Column(db.Integer, db.ForeignKey('membro.id'), nullable=False)
-    aula_realizada_id = db.Column(db.Integer, db.ForeignKey('aula_realizada.id'), nullable=False)
+    aula_realizada_id = db.Column(db.Integer, db.ForeignKey('aula_realizada.id'), nullable=False, index=True)
     avaliacao = db.Column(db.Integer)
 
     __table_args__ = (
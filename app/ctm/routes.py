@@ -1,16 +1,16 @@
-from flask import Blueprint, render_template, redirect, url_for, request, flash, jsonify, send_file
+from flask import Blueprint, render_template, redirect, url_for, request, flash, jsonify
 from flask_login import login_required, current_user
 from app.decorators import admin_required, group_permission_required, secretaria_or_admin_required
 from app.extensions import db
 from app.membresia.models import Membro
+from app.busca import buscar_membros as buscar_membros_indice
 from app.jornada.models import registrar_evento_jornada
 from .models import Presenca, AulaModelo, AulaRealizada, ClasseCTM, TurmaCTM, aluno_turma, ConclusaoCTM
 from .forms import PresencaForm, AulaModeloForm, AulaRealizadaForm, ClasseCTMForm, TurmaCTMForm, PresencaManualForm
 from datetime import date, datetime
 from sqlalchemy import and_, func
 from config import Config
-import pandas as pd
-import io
+from app.exportacao import Coluna, resposta_xlsx
 
 ctm_bp = Blueprint('ctm', __name__, url_prefix='/ctm')
 ano = Config.ANO_ATUAL
@@ -574,11 +574,7 @@ def remover_aluno(turma_id, membro_id):
 @ctm_bp.route('/buscar_membros')
 def buscar_membros():
     search_term = request.args.get('term', '')
-    query = Membro.query.filter(
-        Membro.nome_completo.ilike(f'%{search_term}%'),
-        Membro.ativo == True
-    )
-    membros = query.order_by(Membro.nome_completo).limit(20).all()
+    membros = buscar_membros_indice(search_term, limite=20)
     
     results = []
     for membro in membros:
@@ -816,50 +812,41 @@ def download_excel_relatorio():
         turma_selecionada = TurmaCTM.query.get_or_404(turma_id)
         query_membros = query_membros.filter(TurmaCTM.id == turma_id)
 
-    membros_para_relatorio = query_membros.all()
+    membros_para_relatorio = query_membros.with_entities(Membro.id, Membro.nome_completo).all()
     
     todas_aulas = []
     if turma_selecionada:
         todas_aulas = AulaRealizada.query.filter_by(turma_id=turma_selecionada.id).order_by(AulaRealizada.data).all()
 
+    colunas = [Coluna('Nome', largura=40)]
     relatorio_dados = []
     if todas_aulas:
+        datas_aulas = [aula.data for aula in todas_aulas]
+        colunas += [Coluna(f"{aula.data.strftime('%d/%m/%Y')} - {aula.aula_modelo.tema}") for aula in todas_aulas]
+        colunas += [Coluna('Faltas'), Coluna('% Presença')]
+
+        presencas_por_membro = {}
+        for membro_id, data_aula in db.session.query(Presenca.membro_id, AulaRealizada.data).join(AulaRealizada).filter(
+            Presenca.membro_id.in_([membro.id for membro in membros_para_relatorio]),
+            AulaRealizada.data.in_(datas_aulas)
+        ):
+            presencas_por_membro.setdefault(membro_id, set()).add(data_aula)
+
+        total_aulas_contadas = len(todas_aulas)
         for membro in membros_para_relatorio:
-            linha = {'Nome': membro.nome_completo}
-            total_presencas_membro = 0
-            presencas_datas_membro = {p.aula_realizada.data for p in membro.presencas}
-
-            for aula_realizada_obj in todas_aulas:
-                presente = aula_realizada_obj.data in presencas_datas_membro
-                linha[f"{aula_realizada_obj.data.strftime('%d/%m/%Y')} - {aula_realizada_obj.aula_modelo.tema}"] = '✔️' if presente else '❌'
-                if presente:
-                    total_presencas_membro += 1
-            
-            total_aulas_contadas = len(todas_aulas)
-            faltas = total_aulas_contadas - total_presencas_membro
-            linha['Faltas'] = faltas
-            linha['% Presença'] = f'{(total_presencas_membro / total_aulas_contadas) * 100:.0f}%' if total_aulas_contadas > 0 else '0%'
-            relatorio_dados.append(linha)
+            presencas_datas_membro = presencas_por_membro.get(membro.id, set())
+            presentes = [data in presencas_datas_membro for data in datas_aulas]
+            total_presencas_membro = sum(presentes)
+            percentual = round(total_presencas_membro / total_aulas_contadas * 100)
+            relatorio_dados.append(
+                [membro.nome_completo] + ['✔️' if presente else '❌' for presente in presentes]
+                + [total_aulas_contadas - total_presencas_membro, f'{percentual}%']
+            )
     
-    relatorio_dados.sort(key=lambda x: (-int(x['% Presença'].replace('%', '')), x['Faltas']))
+        relatorio_dados.sort(key=lambda linha: (-int(linha[-1].replace('%', '')), linha[-2]))
 
-    df_final = pd.DataFrame(relatorio_dados)
-    output = io.BytesIO()
-    with pd.ExcelWriter(output, engine='xlsxwriter') as writer:
-        df_final.to_excel(writer, index=False, sheet_name='Relatório de Presenças')
-        workbook = writer.book
-        worksheet = writer.sheets['Relatório de Presenças']
-        for i, col in enumerate(df_final.columns):
-            width = max(df_final[col].astype(str).map(len).max(), len(str(col))) + 2
-            worksheet.set_column(i, i, width)
-    output.seek(0)
-    
     turma_nome = turma_selecionada.nome if turma_selecionada else "geral"
-    filename = f"relatorio_presencas_{turma_nome}.xlsx"
-    return send_file(output,
-                     download_name=filename,
-                     as_attachment=True,
-                     mimetype='application/vnd.openxmlformats-officedocument.spreadsheetml.sheet')
+    return resposta_xlsx(f"relatorio_presencas_{turma_nome}", colunas, relatorio_dados, 'Relatório de Presenças')
 
 @ctm_bp.route('/classes')
 @login_required
@@ -1,6 +1,7 @@
 from functools import wraps
 from flask import flash, redirect, url_for
 from flask_login import current_user
+from app.auth.permissoes import indice_permissoes, TIPO_POR_TABELA
 
 def permission_required(permission_name):
     def decorator(f):
@@ -60,7 +61,7 @@ def group_permission_required(model, permission, relationship_name=None):
             if current_user.has_permission('secretaria'):
                 return f(*args, **kwargs)
 
-            if not current_user.membro:
+            if not current_user.membro_id:
                 flash(f'Você não tem permissão de {permission} neste grupo.', 'danger')
                 return redirect(url_for('main.index'))
             
@@ -79,29 +80,11 @@ def group_permission_required(model, permission, relationship_name=None):
                 flash('Não foi possível encontrar o ID do grupo.', 'danger')
                 return redirect(url_for('main.index'))
 
-            group_obj = model.query.get_or_404(group_id)
+            model.query.get_or_404(group_id)
 
-            def check_hierarchy(obj, user_membro):
-                if not obj:
-                    return False
-                
-                if obj.__tablename__ == 'pequeno_grupo':
-                    if user_membro.id == obj.facilitador_id or user_membro.id == obj.anfitriao_id:
-                        return True
-                    return check_hierarchy(obj.setor, user_membro)
-
-                elif obj.__tablename__ == 'setor':
-                    if user_membro in obj.supervisores:
-                        return True
-                    return check_hierarchy(obj.area, user_membro)
-
-                elif obj.__tablename__ == 'area':
-                    if user_membro in obj.supervisores:
-                        return True
-                
-                return False
-
-            if check_hierarchy(group_obj, current_user.membro):
+            # O acesso segue a hierarquia (área → setor → PG), independente da ação pedida.
+            indice = indice_permissoes(current_user.membro_id)
+            if indice.alcanca(TIPO_POR_TABELA[model.__tablename__], int(group_id)):
                 return f(*args, **kwargs)
             
             flash(f'Você não tem permissão de {permission} neste grupo.', 'danger')
@@ -9,7 +9,9 @@ from .forms import PilulaDiariaForm, RegistroPresencaDiariaForm
 from app.eleve.utils import calcular_monthly_pg_final, get_month_start_end
 from sqlalchemy import func
 from app.membresia.models import Membro
+from app.busca import buscar_membros
 from app.grupos.models import Setor 
+from app.grupos.escopos import ids_membros_do_escopo, ESCOPO_SETOR, PAPEIS_PG
 
 
 def save_quiz_from_form(pilula, form):
@@ -170,8 +172,8 @@ def search_membros():
     if len(query) < 3:
         return jsonify({'results': []})
         
-    # Busca por nome completo ou por parte do nome (ilike)
-    membros = Membro.query.filter(Membro.nome_completo.ilike(f'%{query}%')).limit(10).all()
+    # Busca por início das palavras do nome (sem diferenciar acentos), ativos ou não
+    membros = buscar_membros(query, limite=10, ativo=None)
     
     # É crucial que o 'id' seja o ID do Membro e 'text' seja o nome completo.
     results = [{'id': m.id, 'text': m.nome_completo} for m in membros]
@@ -546,12 +548,8 @@ def ver_ranking_mensal(setor_id, mes, ano):
     """
     setor = Setor.query.get_or_404(setor_id)
     
-    # 1. Obter membros pertencentes ao PG deste Setor (participantes, facilitador, anfitrião)
-    # Lista de IDs de membros no setor
-    membros_no_setor = set()
-    for pg in setor.pequenos_grupos:
-        membros_no_setor.update([m.id for m in pg.membros_completos])
-    
+    # 1. Obter membros pertencentes aos PGs deste Setor (participantes, facilitador, anfitrião)
+    membros_no_setor = ids_membros_do_escopo(ESCOPO_SETOR, [setor.id], papeis=PAPEIS_PG)
     membros = Membro.query.filter(Membro.id.in_(membros_no_setor)).all()
 
     # 2. Calcular o PG Final para cada membro
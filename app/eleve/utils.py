@@ -1,6 +1,7 @@
 from datetime import date, timedelta
 from app.extensions import db
 from .models import RegistroPresenca, PilulaDiaria
+from app.periodos import Periodo
 from calendar import monthrange
 from sqlalchemy import func
 
@@ -44,8 +45,7 @@ def calcular_multiplicador_fidelidade(membro_id: int, data_final: date) -> float
     pilulas_concluidas = RegistroPresenca.query.filter(
         RegistroPresenca.membro_id == membro_id,
         RegistroPresenca.tipo == 'Pilula',
-        RegistroPresenca.data >= data_inicial,
-        RegistroPresenca.data <= data_final
+        Periodo.entre(data_inicial, data_final).filtro(RegistroPresenca.data)
     ).all()
     
     # Contabiliza Pílulas Diárias Únicas (uma por dia)
@@ -93,8 +93,7 @@ def calcular_monthly_pg_final(membro_id: int, year: int, month: int) -> int:
         # 1. Obter a Pontuação Base (PG) acumulada nesta semana (week_start a week_end)
         pg_base_semanal = db.session.query(func.sum(RegistroPresenca.pontuacao_ganha)).filter(
             RegistroPresenca.membro_id == membro_id,
-            RegistroPresenca.data >= week_start,
-            RegistroPresenca.data <= week_end
+            Periodo.entre(week_start, week_end).filtro(RegistroPresenca.data)
         ).scalar() or 0
         
         # 2. Obter o Multiplicador de Fidelidade (baseado no final da semana)
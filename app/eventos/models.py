@@ -11,7 +11,7 @@ class Evento(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     nome = db.Column(db.String(150), nullable=False)
     tipo_evento = db.Column(db.String(50), nullable=False)
-    data_evento = db.Column(db.Date, nullable=False)
+    data_evento = db.Column(db.Date, nullable=False, index=True)
     observacoes = db.Column(db.Text, nullable=True)
     concluido = db.Column(db.Boolean, default=False)
     data_criacao = db.Column(db.DateTime, default=datetime.utcnow)
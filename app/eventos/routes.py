@@ -3,13 +3,14 @@ from flask import render_template, redirect, url_for, flash, request, jsonify, B
 from flask_login import login_required, current_user
 from app.extensions import db
 from app.decorators import admin_required, secretaria_or_admin_required
-from .models import Evento, InscricaoEvento, participantes_evento
+from .models import Evento, InscricaoEvento
 from .forms import EventoForm, ConclusaoRecepcaoForm, InscricaoMembrosForm
 from app.membresia.models import Membro
+from app.busca import buscar_membros
 from app.grupos.models import Area, Setor, PequenoGrupo
 from app.jornada.models import registrar_evento_jornada
 from app.membresia.forms import CadastrarNaoMembroForm 
-from app.membresia.routes import save_profile_picture
+from app.membresia.fotos import salvar_foto_perfil
 from datetime import date
 from config import Config
 
@@ -119,8 +120,7 @@ def cadastrar_e_inscrever(evento_id):
 
         # Lógica de salvar a foto (reutilizada do seu código de membresia)
         if form.foto_perfil.data and form.foto_perfil.data.filename:
-            # Certifique-se de que save_profile_picture está acessível ou importado
-            filename = save_profile_picture(form.foto_perfil.data)
+            filename = salvar_foto_perfil(form.foto_perfil.data)
             if filename:
                 novo_membro.foto_perfil = filename
             else:
@@ -241,24 +241,12 @@ def buscar_membros_ativos():
     tipo_evento = request.args.get('tipo_evento', '')
     evento_id = request.args.get('evento_id', type=int)
 
-    query = Membro.query.filter(Membro.ativo == True)
-    
-    if search_term:
-        query = query.filter(Membro.nome_completo.ilike(f'%{search_term}%'))
-
-    if tipo_evento == 'Recepção':
-        query = query.filter(Membro.status == 'Não-Membro')
-    elif tipo_evento == 'Encontro com Deus':
-        query = query.filter(Membro.participou_encontro_deus == False)
-
-    if evento_id:
-        from .models import participantes_evento
-        subquery = db.session.query(participantes_evento.c.membro_id).filter(
-            participantes_evento.c.evento_id == evento_id
-        )
-        query = query.filter(~Membro.id.in_(subquery))
-
-    membros = query.order_by(Membro.nome_completo).limit(20).all()
+    membros = buscar_membros(
+        search_term, limite=20,
+        status='Não-Membro' if tipo_evento == 'Recepção' else None,
+        sem_encontro_deus=tipo_evento == 'Encontro com Deus',
+        fora_do_evento=evento_id,
+    )
     
     results = [{'id': membro.id, 'text': membro.nome_completo} for membro in membros]
     
@@ -0,0 +1,161 @@
+from flask import Response, send_file, stream_with_context
+from datetime import date, datetime
+import csv
+import io
+import tempfile
+import xlsxwriter
+
+FORMATOS_EXPORTACAO = ('csv', 'xlsx')
+# Linhas trazidas do banco por vez (cursor do lado do servidor) e linhas por bloco enviado no CSV.
+LOTE_EXPORTACAO = 1000
+LINHAS_POR_BLOCO_CSV = 500
+
+MIMETYPE_XLSX = 'application/vnd.openxmlformats-officedocument.spreadsheetml.sheet'
+FORMATO_DATA = 'dd/mm/yyyy'
+FORMATO_MOEDA = '#,##0.00'
+# Dia zero do sistema de datas do Excel (1900, já considerando o 29/02/1900 inexistente).
+ORDINAL_EPOCA_EXCEL = date(1899, 12, 30).toordinal()
+
+
+class Coluna:
+    """
+    Coluna de uma exportação.
+
+    - titulo: cabeçalho da coluna.
+    - tipo: None (texto/número), 'data', 'moeda' ou 'booleano'.
+    - largura: largura da coluna no XLSX (em caracteres).
+    """
+    __slots__ = ('titulo', 'tipo', 'largura')
+
+    def __init__(self, titulo, tipo=None, largura=None):
+        self.titulo = titulo
+        self.tipo = tipo
+        self.largura = largura or max(len(titulo) + 2, 12)
+
+
+def linhas_em_lotes(consulta, tamanho_lote=LOTE_EXPORTACAO):
+    """
+    Itera as linhas da consulta com cursor do lado do servidor, trazendo `tamanho_lote` linhas por vez,
+    em vez de carregar o resultado inteiro. Use consultas de colunas (with_entities), não de entidades.
+    """
+    return consulta.yield_per(tamanho_lote)
+
+
+def _valor_csv(valor, tipo):
+    if valor is None:
+        return ''
+    if tipo == 'data' or isinstance(valor, (date, datetime)):
+        return valor.strftime('%d/%m/%Y')
+    if tipo == 'moeda':
+        return f'{valor:.2f}'.replace('.', ',')
+    if tipo == 'booleano':
+        return 'Sim' if valor else 'Não'
+    return valor
+
+
+def _gerar_csv(colunas, linhas):
+    """Gera o CSV em blocos de LINHAS_POR_BLOCO_CSV linhas (';' e BOM, como o Excel em português espera)."""
+    buffer = io.StringIO()
+    escritor = csv.writer(buffer, delimiter=';')
+    buffer.write('\ufeff')
+    escritor.writerow([coluna.titulo for coluna in colunas])
+    for numero, linha in enumerate(linhas, start=1):
+        escritor.writerow([_valor_csv(valor, coluna.tipo) for valor, coluna in zip(linha, colunas)])
+        if numero % LINHAS_POR_BLOCO_CSV == 0:
+            yield buffer.getvalue()
+            buffer.seek(0)
+            buffer.truncate()
+    yield buffer.getvalue()
+
+
+def resposta_csv(nome_arquivo, colunas, linhas):
+    """Resposta que envia o CSV à medida que as linhas são lidas do banco."""
+    return Response(
+        stream_with_context(_gerar_csv(colunas, linhas)),
+        mimetype='text/csv',
+        headers={'Content-Disposition': f'attachment; filename="{nome_arquivo}.csv"'},
+    )
+
+
+def _serial_excel(valor):
+    """Data (ou data e hora) no número de série usado pelo Excel."""
+    serial = valor.toordinal() - ORDINAL_EPOCA_EXCEL
+    if isinstance(valor, datetime):
+        serial += (valor.hour * 3600 + valor.minute * 60 + valor.second) / 86400
+    return serial
+
+
+def _escritor_xlsx(planilha, coluna, formatos):
+    """
+    Função que escreve uma célula da coluna. Escolhida uma vez por coluna para evitar, a cada célula,
+    a detecção de tipo de `write` e a conversão de datas do xlsxwriter (o que domina o tempo em exportações grandes).
+    """
+    if coluna.tipo == 'data':
+        return lambda linha, posicao, valor: planilha.write_number(linha, posicao, _serial_excel(valor), formatos['data'])
+    if coluna.tipo == 'moeda':
+        return lambda linha, posicao, valor: planilha.write_number(linha, posicao, valor, formatos['moeda'])
+    if coluna.tipo == 'booleano':
+        return lambda linha, posicao, valor: planilha.write_string(linha, posicao, 'Sim' if valor else 'Não')
+
+    def escrever(linha, posicao, valor):
+        if isinstance(valor, str):
+            planilha.write_string(linha, posicao, valor)
+        elif isinstance(valor, (int, float)):
+            planilha.write_number(linha, posicao, valor)
+        else:
+            planilha.write(linha, posicao, valor)
+    return escrever
+
+
+def gerar_xlsx(arquivo, colunas, linhas, nome_planilha='Dados'):
+    """
+    Escreve as linhas em um XLSX no modo constant_memory do xlsxwriter: cada linha vai para
+    disco assim que escrita, e a memória usada não cresce com o tamanho da exportação.
+
+    Returns:
+        Quantidade de linhas escritas (sem o cabeçalho).
+    """
+    livro = xlsxwriter.Workbook(arquivo, {
+        'constant_memory': True, 'tmpdir': tempfile.gettempdir(), 'strings_to_urls': False, 'strings_to_formulas': False,
+    })
+    try:
+        planilha = livro.add_worksheet(nome_planilha[:31])
+        negrito = livro.add_format({'bold': True, 'bg_color': '#F2F2F2', 'bottom': 1})
+        formatos = {
+            'data': livro.add_format({'num_format': FORMATO_DATA}),
+            'moeda': livro.add_format({'num_format': FORMATO_MOEDA}),
+        }
+        for posicao, coluna in enumerate(colunas):
+            planilha.set_column(posicao, posicao, coluna.largura)
+        planilha.write_row(0, 0, [coluna.titulo for coluna in colunas], negrito)
+        planilha.freeze_panes(1, 0)
+
+        escritores = [_escritor_xlsx(planilha, coluna, formatos) for coluna in colunas]
+        numero = 0
+        for numero, linha in enumerate(linhas, start=1):
+            for posicao, valor in enumerate(linha):
+                if valor is not None:
+                    escritores[posicao](numero, posicao, valor)
+        planilha.autofilter(0, 0, max(numero, 1), len(colunas) - 1)
+    finally:
+        livro.close()
+    return numero
+
+
+def resposta_xlsx(nome_arquivo, colunas, linhas, nome_planilha='Dados'):
+    """Monta o XLSX em um arquivo temporário (removido ao fim do envio) e o envia em partes."""
+    arquivo = tempfile.TemporaryFile()
+    try:
+        gerar_xlsx(arquivo, colunas, linhas, nome_planilha)
+    except Exception:
+        arquivo.close()
+        raise
+    arquivo.seek(0)
+    return send_file(arquivo, mimetype=MIMETYPE_XLSX, as_attachment=True, download_name=f'{nome_arquivo}.xlsx')
+
+
+def resposta_exportacao(formato, nome_arquivo, colunas, linhas, nome_planilha='Dados'):
+    """CSV ou XLSX conforme `formato` (um de FORMATOS_EXPORTACAO)."""
+    if formato == 'xlsx':
+        return resposta_xlsx(nome_arquivo, colunas, linhas, nome_planilha)
+    return resposta_csv(nome_arquivo, colunas, linhas)
@@ -0,0 +1,31 @@
+import click
+from flask.cli import with_appcontext
+from app.extensions import db
+from .resumo import reconstruir_resumo
+
+# ====================================================================
+# GRUPO DE COMANDOS CLI PARA O MÓDULO FINANCEIRO
+# ====================================================================
+
+@click.group()
+def financeiro():
+    """Comandos de manutenção do módulo financeiro."""
+    pass
+
+@financeiro.command('rebuild-resumo')
+@with_appcontext
+def rebuild_resumo():
+    """
+    Recalcula do zero a tabela resumo_financeiro_mensal (totais mensais do painel financeiro).
+    Necessário apenas após alterações feitas fora da aplicação (ex.: SQL direto ou inserts em massa).
+
+    Uso: flask financeiro rebuild-resumo
+    """
+    click.echo('Reconstruindo o resumo financeiro mensal...')
+    try:
+        total = reconstruir_resumo(db.session)
+        db.session.commit()
+        click.echo(f'✅ {total} linhas de resumo gravadas.')
+    except Exception as e:
+        db.session.rollback()
+        click.echo(f'❌ Erro ao reconstruir o resumo financeiro: {e}')
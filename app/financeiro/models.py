@@ -16,6 +16,13 @@ class Contribuicao(db.Model):
 
     created_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))
     updated_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc), onupdate=lambda: datetime.now(timezone.utc))
+
+    __table_args__ = (
+        # Contribuições de um grupo de membros em um período (flags de dízimo da listagem e do perfil).
+        db.Index('ix_contribuicao_membro_data_lanc', 'membro_id', 'data_lanc'),
+        # Contribuições de um tipo em um período (dízimo do mês e dos últimos 30 dias).
+        db.Index('ix_contribuicao_tipo_data_lanc', 'tipo', 'data_lanc'),
+    )
     
     def __repr__(self):
         return f'<Contribuicao Membro: {self.membro_id} Valor: {self.valor}>'
@@ -65,5 +72,37 @@ class Despesa(db.Model):
     created_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc))
     updated_at = db.Column(db.DateTime, default=lambda: datetime.now(timezone.utc), onupdate=lambda: datetime.now(timezone.utc))
 
+    __table_args__ = (
+        # Despesas pagas / a pagar em um período (resumo mensal e relatórios).
+        db.Index('ix_despesa_pago_data_pagamento', 'pago', 'data_pagamento'),
+        db.Index('ix_despesa_pago_data_vencimento', 'pago', 'data_vencimento'),
+    )
+
+    def __repr__(self):
+        return f'<Despesa {self.item.nome} Valor: {self.valor}>'
+
+class ResumoFinanceiroMensal(db.Model):
+    """
+    Totais mensais de receitas e despesas por centro de custo e tipo (receitas) ou categoria (despesas),
+    lidos pelo painel financeiro. O mês de referência é o do lançamento (receitas), do pagamento
+    (despesas pagas) ou do vencimento (despesas a pagar). Mantida por app.financeiro.resumo.
+    """
+    __tablename__ = 'resumo_financeiro_mensal'
+
+    id = db.Column(db.Integer, primary_key=True)
+    ano = db.Column(db.SmallInteger, nullable=False)
+    mes = db.Column(db.SmallInteger, nullable=False)
+    natureza = db.Column(db.String(10), nullable=False)  # 'receita' ou 'despesa'
+    centro_custo = db.Column(db.String(50), nullable=True)
+    tipo = db.Column(db.String(30), nullable=True)  # tipo da contribuição (receitas)
+    categoria_id = db.Column(db.Integer, db.ForeignKey('categoria_despesa.id', ondelete='CASCADE'), nullable=True)  # despesas
+    pago = db.Column(db.Boolean, nullable=False)
+    total = db.Column(db.Float, nullable=False, default=0)
+    quantidade = db.Column(db.Integer, nullable=False, default=0)
+
+    __table_args__ = (
+        db.Index('ix_resumo_financeiro_mensal_periodo', 'ano', 'mes', 'natureza'),
+    )
+
     def __repr__(self):
-        return f'<Despesa {self.item.nome} Valor: {self.valor}>'
\ No newline at end of file
+        return f'<ResumoFinanceiroMensal {self.ano}-{self.mes:02d} {self.natureza} {self.centro_custo} {self.total}>'
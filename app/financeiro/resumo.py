@@ -0,0 +1,167 @@
+from app.extensions import db
+from app.financeiro.models import Contribuicao, Despesa, ItemDespesa, ResumoFinanceiroMensal
+from app.periodos import Periodo
+from sqlalchemy import event, select, delete, insert, func, literal, true, extract, inspect
+from sqlalchemy.orm import Session
+from itertools import chain
+
+NATUREZA_RECEITA = 'receita'
+NATUREZA_DESPESA = 'despesa'
+
+CHAVE_MESES_PENDENTES = 'resumo_financeiro_pendente'
+# Marcador de "reconstruir tudo" entre os meses pendentes.
+TODOS_OS_MESES = 'todos'
+
+# Atributos que mudam o mês ou os totais do resumo.
+ATRIBUTOS_CONTRIBUICAO = ('data_lanc', 'valor', 'tipo', 'centro_custo')
+ATRIBUTOS_DESPESA = ('item_id', 'valor', 'pago', 'data_pagamento', 'data_vencimento', 'centro_custo')
+
+
+def _ano(coluna):
+    return extract('year', coluna)
+
+
+def _mes(coluna):
+    return extract('month', coluna)
+
+
+def _consultas(periodo_receita, periodo_paga, periodo_pendente):
+    """
+    SELECTs que produzem as linhas do resumo, no formato das colunas de ResumoFinanceiroMensal.
+    `periodo_*` filtram a coluna de data de referência de receitas, despesas pagas e despesas a pagar.
+    """
+    receitas = select(
+        _ano(Contribuicao.data_lanc), _mes(Contribuicao.data_lanc), literal(NATUREZA_RECEITA),
+        Contribuicao.centro_custo, Contribuicao.tipo, literal(None), literal(True),
+        func.sum(Contribuicao.valor), func.count(Contribuicao.id),
+    ).where(periodo_receita).group_by(
+        _ano(Contribuicao.data_lanc), _mes(Contribuicao.data_lanc), Contribuicao.centro_custo, Contribuicao.tipo
+    )
+
+    def despesas(coluna_data, pago, periodo):
+        return select(
+            _ano(coluna_data), _mes(coluna_data), literal(NATUREZA_DESPESA),
+            Despesa.centro_custo, literal(None), ItemDespesa.categoria_id, literal(pago),
+            func.sum(Despesa.valor), func.count(Despesa.id),
+        ).join(ItemDespesa, Despesa.item_id == ItemDespesa.id).where(
+            Despesa.pago == pago, periodo
+        ).group_by(_ano(coluna_data), _mes(coluna_data), Despesa.centro_custo, ItemDespesa.categoria_id)
+
+    return (
+        receitas,
+        despesas(Despesa.data_pagamento, True, periodo_paga),
+        despesas(Despesa.data_vencimento, False, periodo_pendente),
+    )
+
+
+def _inserir(sessao, consultas):
+    colunas = ['ano', 'mes', 'natureza', 'centro_custo', 'tipo', 'categoria_id', 'pago', 'total', 'quantidade']
+    for consulta in consultas:
+        sessao.execute(insert(ResumoFinanceiroMensal).from_select(colunas, consulta))
+
+
+def recalcular_meses(sessao, meses):
+    """Refaz as linhas do resumo dos meses (ano, mes) informados a partir dos lançamentos. Não faz commit."""
+    for ano, mes in sorted(meses):
+        periodo = Periodo.mes(ano, mes)
+        sessao.execute(delete(ResumoFinanceiroMensal).where(
+            ResumoFinanceiroMensal.ano == ano, ResumoFinanceiroMensal.mes == mes
+        ))
+        _inserir(sessao, _consultas(
+            periodo.filtro(Contribuicao.data_lanc),
+            periodo.filtro(Despesa.data_pagamento),
+            periodo.filtro(Despesa.data_vencimento),
+        ))
+
+
+def reconstruir_resumo(sessao=None):
+    """Recria todo o resumo financeiro mensal a partir dos lançamentos. Não faz commit."""
+    sessao = sessao or db.session
+    sessao.execute(delete(ResumoFinanceiroMensal))
+    _inserir(sessao, _consultas(
+        true(), Despesa.data_pagamento.isnot(None), Despesa.data_vencimento.isnot(None)
+    ))
+    return sessao.query(ResumoFinanceiroMensal).count()
+
+
+def resumo_do_ano(ano, mes=None, sessao=None):
+    """Linhas do resumo de um ano (ou só de um mês dele): poucas dezenas, uma por centro de custo e tipo/categoria."""
+    sessao = sessao or db.session
+    consulta = select(ResumoFinanceiroMensal).where(ResumoFinanceiroMensal.ano == ano)
+    if mes:
+        consulta = consulta.where(ResumoFinanceiroMensal.mes == mes)
+    return sessao.execute(consulta).scalars().all()
+
+
+def _pendentes(sessao):
+    return sessao.info.setdefault(CHAVE_MESES_PENDENTES, set())
+
+
+def marcar_meses(sessao, datas):
+    """Agenda o recálculo dos meses das datas informadas no próximo commit (ex.: após inserts ou updates em massa)."""
+    _pendentes(sessao).update((d.year, d.month) for d in datas if d is not None)
+
+
+def marcar_reconstrucao(sessao):
+    """Agenda a reconstrução de todo o resumo no próximo commit."""
+    _pendentes(sessao).add(TODOS_OS_MESES)
+
+
+def _datas(obj, atributos, incluir_anteriores):
+    """Valores atuais (e, se pedido, os anteriores à alteração) dos atributos de data do objeto."""
+    estado = inspect(obj)
+    datas = []
+    for nome in atributos:
+        datas.append(getattr(obj, nome))
+        if incluir_anteriores:
+            datas.extend(estado.attrs[nome].history.deleted)
+    return datas
+
+
+def _alterou(obj, atributos):
+    estado = inspect(obj)
+    return any(estado.attrs[nome].history.has_changes() for nome in atributos)
+
+
+def _carregar_valor_anterior(alvo, valor, anterior, iniciador):
+    pass
+
+
+# Com active_history, o valor anterior das datas é carregado ao alterá-las mesmo com o objeto expirado
+# (ex.: após um commit), e o mês antigo também é recalculado.
+for _atributo in (Contribuicao.data_lanc, Despesa.data_pagamento, Despesa.data_vencimento):
+    event.listen(_atributo, 'set', _carregar_valor_anterior, active_history=True)
+
+
+@event.listens_for(Session, 'after_flush')
+def _coletar_alteracoes(sessao, flush_context):
+    for obj in chain(sessao.new, sessao.dirty, sessao.deleted):
+        alterado = obj in sessao.dirty
+        if isinstance(obj, Contribuicao):
+            if alterado and not _alterou(obj, ATRIBUTOS_CONTRIBUICAO):
+                continue
+            marcar_meses(sessao, _datas(obj, ('data_lanc',), alterado))
+        elif isinstance(obj, Despesa):
+            if alterado and not _alterou(obj, ATRIBUTOS_DESPESA):
+                continue
+            marcar_meses(sessao, _datas(obj, ('data_pagamento', 'data_vencimento'), alterado))
+        elif isinstance(obj, ItemDespesa) and alterado and _alterou(obj, ('categoria_id',)):
+            # Mover um item de categoria afeta todos os meses das despesas dele
+            marcar_reconstrucao(sessao)
+
+
+@event.listens_for(Session, 'before_commit')
+def _aplicar_alteracoes(sessao):
+    sessao.flush()
+    meses = sessao.info.pop(CHAVE_MESES_PENDENTES, None)
+    if not meses:
+        return
+    if TODOS_OS_MESES in meses:
+        reconstruir_resumo(sessao)
+    else:
+        recalcular_meses(sessao, meses)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _descartar_alteracoes(sessao):
+    sessao.info.pop(CHAVE_MESES_PENDENTES, None)
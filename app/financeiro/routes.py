@@ -1,21 +1,24 @@
-from flask import Blueprint, render_template, redirect, url_for, request, flash, jsonify, send_file, make_response
+from flask import Blueprint, render_template, redirect, url_for, request, flash, jsonify, send_file, make_response, abort
 from flask_login import login_required, current_user
 from app.extensions import db
 from datetime import datetime, date
-from app.membresia.models import Membro
+from app.membresia.models import Membro, CARGO_FACILITADOR_PG, CARGOS_SUPERVISAO
 from app.grupos.models import PequenoGrupo, Setor, Area
 from .models import Contribuicao, CategoriaDespesa, ItemDespesa, Despesa
+from .resumo import resumo_do_ano, NATUREZA_RECEITA, NATUREZA_DESPESA
 from .forms import (
     ContribuicaoForm, ContribuicaoFilterForm, 
     CategoriaDespesaForm, ItemDespesaForm, DespesaForm, DespesaFilterForm
 )
 from config import Config
-from sqlalchemy import func, extract, and_, or_
+from sqlalchemy import func
 from app.jornada.models import registrar_evento_jornada, JornadaEvento
 from app.filters import format_currency
+from app.exportacao import Coluna, FORMATOS_EXPORTACAO, linhas_em_lotes, resposta_exportacao
+from app.periodos import Periodo
 import pandas as pd
 import io, random
-from unidecode import unidecode
+from app.busca import filtro_nome, normalizar, buscar_membros, indice_membros
 from weasyprint import HTML
 from app.decorators import admin_required, financeiro_required, group_permission_required
 
@@ -28,111 +31,52 @@ versao=Config.VERSAO_APP
 @login_required
 @financeiro_required
 def index():
-    mes_atual = datetime.now().month
-    ano_atual = datetime.now().year
+    hoje = date.today()
+    mes_atual = hoje.month
+    ano_atual = hoje.year
 
-    total_receitas_mes_query = db.session.query(func.sum(Contribuicao.valor)).filter(
-        and_(
-            extract('month', Contribuicao.data_lanc) == mes_atual,
-            extract('year', Contribuicao.data_lanc) == ano_atual
-        )
-    ).scalar()
-    total_receitas_mes = round(float(total_receitas_mes_query), 2) if total_receitas_mes_query else 0.0
+    # Poucas linhas por mês (centro de custo × tipo/categoria), mantidas por app.financeiro.resumo
+    resumo = resumo_do_ano(ano_atual)
+    resumo_mes = [linha for linha in resumo if linha.mes == mes_atual]
+    resumo_mes_ano_anterior = resumo_do_ano(ano_atual - 1, mes_atual)
 
-    num_contribuicoes_mes = db.session.query(Contribuicao).filter(
-        and_(
-            extract('month', Contribuicao.data_lanc) == mes_atual,
-            extract('year', Contribuicao.data_lanc) == ano_atual
-        )
-    ).count()
+    def somar(linhas, natureza, pago=True):
+        selecionadas = [linha for linha in linhas if linha.natureza == natureza and linha.pago == pago]
+        return round(sum(linha.total for linha in selecionadas), 2), sum(linha.quantidade for linha in selecionadas)
 
-    total_despesas_mes_query = db.session.query(func.sum(Despesa.valor)).filter(
-        and_(
-            extract('month', Despesa.data_pagamento) == mes_atual,
-            extract('year', Despesa.data_pagamento) == ano_atual,
-            Despesa.pago == True
-        )
-    ).scalar()
-    total_despesas_mes = round(float(total_despesas_mes_query), 2) if total_despesas_mes_query else 0.0
-
-    num_despesas_mes = db.session.query(Despesa).filter(
-        and_(
-            extract('month', Despesa.data_pagamento) == mes_atual,
-            extract('year', Despesa.data_pagamento) == ano_atual,
-            Despesa.pago == True
-        )
-    ).count()
-    
-    total_apagar_mes_query = db.session.query(func.sum(Despesa.valor)).filter(
-        and_(
-            extract('month', Despesa.data_vencimento) == mes_atual,
-            extract('year', Despesa.data_vencimento) == ano_atual,
-            Despesa.pago == False
-        )
-    ).scalar()
-    total_apagar_mes = round(float(total_apagar_mes_query), 2) if total_apagar_mes_query else 0.0
-    
-    num_apagar_mes = db.session.query(Despesa).filter(
-        and_(
-            extract('month', Despesa.data_vencimento) == mes_atual,
-            extract('year', Despesa.data_vencimento) == ano_atual,
-            Despesa.pago == False
-        )
-    ).count()
+    total_receitas_mes, num_contribuicoes_mes = somar(resumo_mes, NATUREZA_RECEITA)
+    total_despesas_mes, num_despesas_mes = somar(resumo_mes, NATUREZA_DESPESA)
+    total_apagar_mes, num_apagar_mes = somar(resumo_mes, NATUREZA_DESPESA, pago=False)
+    total_receitas_mes_ano_anterior, _ = somar(resumo_mes_ano_anterior, NATUREZA_RECEITA)
+    total_despesas_mes_ano_anterior, _ = somar(resumo_mes_ano_anterior, NATUREZA_DESPESA)
 
     saldo_executado = total_receitas_mes - total_despesas_mes
     
     saldo_projetado = total_receitas_mes - (total_despesas_mes + total_apagar_mes)
 
+    nomes_categorias = dict(db.session.query(CategoriaDespesa.id, CategoriaDespesa.nome))
     meses_presentes = set()
-    
-    receitas_cc_query = db.session.query(
-        Contribuicao.centro_custo,
-        extract('month', Contribuicao.data_lanc).label('mes'),
-        func.sum(Contribuicao.valor).label('total_valor')
-    ).filter(
-        extract('year', Contribuicao.data_lanc) == ano_atual,
-        Contribuicao.centro_custo.isnot(None)
-    ).group_by(Contribuicao.centro_custo, 'mes').all()
-    
     dados_receitas_cc = {}
-    for cc, mes, total in receitas_cc_query:
-        meses_presentes.add(int(mes))
-        if cc not in dados_receitas_cc: dados_receitas_cc[cc] = {}
-        dados_receitas_cc[cc][int(mes)] = round(float(total), 2)
-
-    despesas_cc_query = db.session.query(
-        Despesa.centro_custo,
-        extract('month', Despesa.data_pagamento).label('mes'),
-        func.sum(Despesa.valor).label('total_valor')
-    ).filter(
-        extract('year', Despesa.data_pagamento) == ano_atual,
-        Despesa.centro_custo.isnot(None),
-        Despesa.pago == True
-    ).group_by(Despesa.centro_custo, 'mes').all()
-
     dados_despesas_cc = {}
-    for cc, mes, total in despesas_cc_query:
-        meses_presentes.add(int(mes))
-        if cc not in dados_despesas_cc: dados_despesas_cc[cc] = {}
-        dados_despesas_cc[cc][int(mes)] = round(float(total), 2)
-
-    despesas_cat_query = db.session.query(
-        CategoriaDespesa.nome,
-        extract('month', Despesa.data_pagamento).label('mes'),
-        func.sum(Despesa.valor).label('total_valor')
-    ).join(ItemDespesa, Despesa.item_id == ItemDespesa.id)\
-     .join(CategoriaDespesa, ItemDespesa.categoria_id == CategoriaDespesa.id)\
-     .filter(
-        extract('year', Despesa.data_pagamento) == ano_atual,
-        Despesa.pago == True
-    ).group_by(CategoriaDespesa.nome, 'mes').all()
-    
     dados_despesas_cat = {}
-    for cat, mes, total in despesas_cat_query:
-        meses_presentes.add(int(mes))
-        if cat not in dados_despesas_cat: dados_despesas_cat[cat] = {}
-        dados_despesas_cat[cat][int(mes)] = round(float(total), 2)
+    for linha in resumo:
+        if not linha.pago:
+            continue
+        if linha.natureza == NATUREZA_RECEITA:
+            agrupamentos = [(dados_receitas_cc, linha.centro_custo)] if linha.centro_custo else []
+        else:
+            agrupamentos = [(dados_despesas_cat, nomes_categorias.get(linha.categoria_id))]
+            if linha.centro_custo:
+                agrupamentos.append((dados_despesas_cc, linha.centro_custo))
+        for dados, chave in agrupamentos:
+            meses_presentes.add(linha.mes)
+            por_mes = dados.setdefault(chave, {})
+            por_mes[linha.mes] = por_mes.get(linha.mes, 0) + linha.total
+
+    for dados in (dados_receitas_cc, dados_despesas_cc, dados_despesas_cat):
+        for por_mes in dados.values():
+            for mes, total in por_mes.items():
+                por_mes[mes] = round(total, 2)
 
     meses_ordenados_nomes_map = {
         1: 'Jan', 2: 'Fev', 3: 'Mar', 4: 'Abr', 5: 'Mai', 6: 'Jun',
@@ -172,6 +116,9 @@ def index():
         total_apagar_mes=total_apagar_mes, num_apagar_mes=num_apagar_mes,
         saldo_executado=saldo_executado,
         saldo_projetado=saldo_projetado,
+        ano_anterior=ano_atual - 1,
+        total_receitas_mes_ano_anterior=total_receitas_mes_ano_anterior,
+        total_despesas_mes_ano_anterior=total_despesas_mes_ano_anterior,
         # Gráficos
         chart_labels_meses=chart_labels_meses,
         chart_datasets_receitas_cc=chart_datasets_receitas_cc,
@@ -240,6 +187,50 @@ def nova_contribuicao():
     return render_template('financeiro/registro_receita.html',
                             form=form, ano=ano, versao=versao, Config=Config)
 
+def _flash_erros_filtro(filter_form):
+    for field_name, errors in filter_form.errors.items():
+        for error in errors:
+            if field_name != 'csrf_token':
+                field_obj = getattr(filter_form, field_name, None)
+                field_label = field_obj.label.text if field_obj and hasattr(field_obj, 'label') else field_name
+                flash(f"Erro no filtro '{field_label}': {error}", 'danger')
+
+def _filtrar_contribuicoes(query, filter_form):
+    """Aplica os filtros (já validados) do ContribuicaoFilterForm a uma consulta de Contribuicao com join em Membro."""
+    if filter_form.busca_nome.data:
+        query = query.filter(filtro_nome(Membro, filter_form.busca_nome.data))
+    if filter_form.tipo_filtro.data:
+        query = query.filter(Contribuicao.tipo == filter_form.tipo_filtro.data)
+    if filter_form.centro_custo_filtro.data:
+        query = query.filter(Contribuicao.centro_custo == filter_form.centro_custo_filtro.data)
+    status_filtro = filter_form.status_filtro.data
+    if status_filtro:
+        if status_filtro == 'Facilitador':
+            query = query.filter(Membro.com_cargo(CARGO_FACILITADOR_PG))
+        elif status_filtro == 'Supervisor':
+            query = query.filter(Membro.com_cargo(CARGOS_SUPERVISAO))
+        else:
+            query = query.filter(Membro.status == status_filtro)
+    if filter_form.data_inicial.data or filter_form.data_final.data:
+        periodo = Periodo.entre(filter_form.data_inicial.data, filter_form.data_final.data)
+        query = query.filter(periodo.filtro(Contribuicao.data_lanc))
+    return query
+
+def _filtrar_despesas(query, filter_form):
+    """Aplica os filtros (já validados) do DespesaFilterForm a uma consulta de Despesa com join em ItemDespesa."""
+    if filter_form.categoria_filtro.data:
+        query = query.filter(ItemDespesa.categoria_id == filter_form.categoria_filtro.data)
+    if filter_form.item_filtro.data:
+        query = query.filter(Despesa.item_id == filter_form.item_filtro.data)
+    if filter_form.recorrencia_filtro.data:
+        query = query.filter(Despesa.recorrencia == filter_form.recorrencia_filtro.data)
+    if filter_form.centro_custo_filtro.data:
+        query = query.filter(Despesa.centro_custo == filter_form.centro_custo_filtro.data)
+    if filter_form.data_inicial.data or filter_form.data_final.data:
+        periodo = Periodo.entre(filter_form.data_inicial.data, filter_form.data_final.data)
+        query = query.filter(periodo.filtro(Despesa.data_lanc))
+    return query
+
 @financeiro_bp.route('/lancamentos_receitas')
 @login_required
 @financeiro_required
@@ -266,32 +257,9 @@ def lancamentos_receitas():
         data_inicial = filter_form.data_inicial.data
         data_final = filter_form.data_final.data
 
-        if busca_nome:
-            busca_normalizada = unidecode(busca_nome).lower()
-            busca_db = f'%{busca_normalizada}%'
-            query = query.filter(func.lower(func.unidecode(Membro.nome_completo)).like(busca_db))
-        if tipo_filtro:
-            query = query.filter(Contribuicao.tipo == tipo_filtro)
-        if centro_custo_filtro:
-            query = query.filter(Contribuicao.centro_custo == centro_custo_filtro)
-        if status_filtro:
-            if status_filtro == 'Facilitador':
-                query = query.filter(Membro.pgs_facilitados.any())
-            elif status_filtro == 'Supervisor':
-                query = query.filter(or_(Membro.setores_supervisionados.any(), Membro.areas_supervisionadas.any()))
-            else:
-                query = query.filter(Membro.status == status_filtro)
-        if data_inicial:
-            query = query.filter(Contribuicao.data_lanc >= data_inicial)
-        if data_final:
-            query = query.filter(Contribuicao.data_lanc <= data_final)
+        query = _filtrar_contribuicoes(query, filter_form)
     else:
-        for field_name, errors in filter_form.errors.items():
-            for error in errors:
-                if field_name != 'csrf_token':
-                    field_obj = getattr(filter_form, field_name, None)
-                    field_label = field_obj.label.text if field_obj and hasattr(field_obj, 'label') else field_name
-                    flash(f"Erro no filtro '{field_label}': {error}", 'danger')
+        _flash_erros_filtro(filter_form)
 
     soma_valores_query = query.with_entities(func.sum(Contribuicao.valor)).scalar()
     soma_valores = round(float(soma_valores_query), 2) if soma_valores_query else 0.0
@@ -322,6 +290,29 @@ def lancamentos_receitas():
         data_final=data_final
     )
 
+@financeiro_bp.route('/lancamentos_receitas/exportar/<formato>')
+@login_required
+@financeiro_required
+def exportar_receitas(formato):
+    if formato not in FORMATOS_EXPORTACAO:
+        abort(404)
+
+    filter_form = ContribuicaoFilterForm(request.args, meta={'csrf': False})
+    if not filter_form.validate():
+        _flash_erros_filtro(filter_form)
+        return redirect(url_for('financeiro.lancamentos_receitas'))
+
+    query = _filtrar_contribuicoes(Contribuicao.query.join(Membro), filter_form).with_entities(
+        Contribuicao.data_lanc, Membro.nome_completo, Membro.campus, Contribuicao.tipo, Contribuicao.forma,
+        Contribuicao.centro_custo, Contribuicao.valor, Contribuicao.observacoes
+    ).order_by(Contribuicao.data_lanc, Contribuicao.id)
+
+    colunas = [
+        Coluna('Data', 'data'), Coluna('Membro', largura=40), Coluna('Campus', largura=18), Coluna('Tipo'),
+        Coluna('Forma'), Coluna('Centro de Custo', largura=20), Coluna('Valor', 'moeda'), Coluna('Observações', largura=40),
+    ]
+    return resposta_exportacao(formato, f"Receitas_{date.today():%Y-%m-%d}", colunas, linhas_em_lotes(query), 'Receitas')
+
 @financeiro_bp.route('download_receitas_pdf')
 @login_required
 @financeiro_required
@@ -337,9 +328,7 @@ def download_receitas_pdf():
     filtros_texto = []
 
     if busca_nome:
-        busca_normalizada = unidecode(busca_nome).lower()
-        busca_db = f'%{busca_normalizada}%'
-        query = query.filter(func.lower(func.unidecode(Membro.nome_completo)).like(busca_db))
+        query = query.filter(filtro_nome(Membro, busca_nome))
         filtros_texto.append(f"Nome: {busca_nome}")
     if tipo_filtro:
         query = query.filter(Contribuicao.tipo == tipo_filtro)
@@ -349,23 +338,24 @@ def download_receitas_pdf():
         filtros_texto.append(f"Centro de Custo: {centro_custo_filtro}")
     if status_filtro:
         if status_filtro == 'Facilitador':
-            query = query.filter(Membro.pgs_facilitados.any())
+            query = query.filter(Membro.com_cargo(CARGO_FACILITADOR_PG))
         elif status_filtro == 'Supervisor':
-            query = query.filter(or_(Membro.setores_supervisionados.any(), Membro.areas_supervisionadas.any()))
+            query = query.filter(Membro.com_cargo(CARGOS_SUPERVISAO))
         else:
             query = query.filter(Membro.status == status_filtro)
         filtros_texto.append(f"Perfil: {status_filtro}")
         
+    data_inicial = None
+    data_final = None
     if data_inicial_str:
         try:
             data_inicial = datetime.strptime(data_inicial_str, '%Y-%m-%d').date()
-            query = query.filter(Contribuicao.data_lanc >= data_inicial)
         except: pass
     if data_final_str:
         try:
             data_final = datetime.strptime(data_final_str, '%Y-%m-%d').date()
-            query = query.filter(Contribuicao.data_lanc <= data_final)
         except: pass
+    query = query.filter(Periodo.entre(data_inicial, data_final).filtro(Contribuicao.data_lanc))
 
     receitas = query.order_by(Contribuicao.data_lanc.asc(), Membro.nome_completo).all()
     
@@ -435,13 +425,12 @@ def download_despesas_pdf():
     if data_inicial_str:
         try:
             data_inicial = datetime.strptime(data_inicial_str, '%Y-%m-%d').date()
-            query = query.filter(campo_data >= data_inicial)
         except: pass
     if data_final_str:
         try:
             data_final = datetime.strptime(data_final_str, '%Y-%m-%d').date()
-            query = query.filter(campo_data <= data_final)
         except: pass
+    query = query.filter(Periodo.entre(data_inicial, data_final).filtro(campo_data))
 
     despesas = query.all()
     total_valor = sum(d.valor for d in despesas)
@@ -551,16 +540,8 @@ def editar_contribuicao(id):
 def buscar_membros_financeiro():
     search_term = request.args.get('term', '')
     results = []
-    busca_normalizada = unidecode(search_term).lower()
-    busca_db = f'%{busca_normalizada}%'
 
-    membros_ativos_query = Membro.query.filter(
-        func.lower(func.unidecode(Membro.nome_completo)).like(busca_db),
-        Membro.ativo==True,
-        Membro.id != Config.ID_OFERTA_ANONIMA 
-    )
-    
-    membros_ativos = membros_ativos_query.order_by(Membro.nome_completo).limit(50).all()
+    membros_ativos = buscar_membros(search_term, limite=50, excluir_ids=[Config.ID_OFERTA_ANONIMA])
     
     for membro in membros_ativos:
         results.append({
@@ -569,10 +550,10 @@ def buscar_membros_financeiro():
             'campus': membro.campus
         })
 
-    membro_anonimo = Membro.query.get(Config.ID_OFERTA_ANONIMA)
+    membro_anonimo = indice_membros().por_id.get(Config.ID_OFERTA_ANONIMA)
     if membro_anonimo:
-        anonimo_full_name = unidecode(membro_anonimo.nome_completo).lower()
-        if not search_term or busca_normalizada in anonimo_full_name:
+        anonimo_full_name = normalizar(membro_anonimo.nome_completo)
+        if normalizar(search_term) in anonimo_full_name:
             results.insert(0, {
                 'id': membro_anonimo.id,
                 'text': membro_anonimo.nome_completo,
@@ -744,25 +725,9 @@ def lancamentos_despesas():
         data_inicial = filter_form.data_inicial.data
         data_final = filter_form.data_final.data
 
-        if categoria_filtro:
-            query = query.filter(ItemDespesa.categoria_id == categoria_filtro)
-        if item_filtro:
-            query = query.filter(Despesa.item_id == item_filtro)
-        if recorrencia_filtro:
-            query = query.filter(Despesa.recorrencia == recorrencia_filtro)
-        if centro_custo_filtro:
-            query = query.filter(Despesa.centro_custo == centro_custo_filtro)
-        if data_inicial:
-            query = query.filter(Despesa.data_lanc >= data_inicial)
-        if data_final:
-            query = query.filter(Despesa.data_lanc <= data_final)
+        query = _filtrar_despesas(query, filter_form)
     else:
-        for field_name, errors in filter_form.errors.items():
-            for error in errors:
-                if field_name != 'csrf_token':
-                    field_obj = getattr(filter_form, field_name, None)
-                    field_label = field_obj.label.text if field_obj and hasattr(field_obj, 'label') else field_name
-                    flash(f"Erro no filtro '{field_label}': {error}", 'danger')
+        _flash_erros_filtro(filter_form)
 
     pendentes_query = query.filter(Despesa.pago == False).order_by(Despesa.data_vencimento.asc())
     despesas_pendentes = pendentes_query.all()
@@ -801,6 +766,32 @@ def lancamentos_despesas():
         now=datetime.now()
     )
 
+@financeiro_bp.route('/lancamentos_despesas/exportar/<formato>')
+@login_required
+@financeiro_required
+def exportar_despesas(formato):
+    if formato not in FORMATOS_EXPORTACAO:
+        abort(404)
+
+    filter_form = DespesaFilterForm(request.args, meta={'csrf': False})
+    if not filter_form.validate():
+        _flash_erros_filtro(filter_form)
+        return redirect(url_for('financeiro.lancamentos_despesas'))
+
+    query = _filtrar_despesas(Despesa.query.join(ItemDespesa).join(CategoriaDespesa), filter_form).with_entities(
+        Despesa.data_lanc, Despesa.data_vencimento, Despesa.data_pagamento, Despesa.pago, CategoriaDespesa.nome,
+        ItemDespesa.nome, ItemDespesa.tipo_fixa_variavel, Despesa.recorrencia, Despesa.centro_custo,
+        Despesa.valor, Despesa.observacoes
+    ).order_by(Despesa.data_lanc, Despesa.id)
+
+    colunas = [
+        Coluna('Lançamento', 'data'), Coluna('Vencimento', 'data'), Coluna('Pagamento', 'data'), Coluna('Pago', 'booleano'),
+        Coluna('Categoria', largura=25), Coluna('Item', largura=30), Coluna('Fixa/Variável', largura=14),
+        Coluna('Recorrência', largura=14), Coluna('Centro de Custo', largura=20), Coluna('Valor', 'moeda'),
+        Coluna('Observações', largura=40),
+    ]
+    return resposta_exportacao(formato, f"Despesas_{date.today():%Y-%m-%d}", colunas, linhas_em_lotes(query), 'Despesas')
+
 @financeiro_bp.route('/delete_contribuicao/<int:id>', methods=['POST'])
 @login_required
 @admin_required
@@ -0,0 +1,92 @@
+import click
+from flask.cli import with_appcontext
+from app.extensions import db
+from .escopos import reconstruir_escopos
+from .indicadores import reconstruir_indicadores, registrar_snapshot
+from .manutencao import limpar_membros_presos
+
+# ====================================================================
+# GRUPO DE COMANDOS CLI PARA O MÓDULO DE GRUPOS
+# ====================================================================
+
+@click.group()
+def grupos():
+    """Comandos de manutenção da hierarquia de Áreas, Setores e PGs."""
+    pass
+
+@grupos.command('rebuild-escopos')
+@with_appcontext
+def rebuild_escopos():
+    """
+    Recria do zero a tabela membro_escopo (quem pertence a qual PG/setor/área).
+
+    Uso: flask grupos rebuild-escopos
+    """
+    click.echo('Reconstruindo a tabela de escopos da hierarquia...')
+    try:
+        total = reconstruir_escopos(db.session)
+        db.session.commit()
+        click.echo(f'✅ {total} vínculos membro/escopo gravados.')
+    except Exception as e:
+        db.session.rollback()
+        click.echo(f'❌ Erro ao reconstruir escopos: {e}')
+
+@grupos.command('rebuild-indicadores')
+@with_appcontext
+def rebuild_indicadores():
+    """
+    Recalcula do zero a tabela scope_indicators (indicadores por área, setor, PG e geral).
+
+    Uso: flask grupos rebuild-indicadores
+    """
+    click.echo('Recalculando os indicadores materializados...')
+    try:
+        total = reconstruir_indicadores(db.session)
+        db.session.commit()
+        click.echo(f'✅ {total} escopos atualizados.')
+    except Exception as e:
+        db.session.rollback()
+        click.echo(f'❌ Erro ao recalcular indicadores: {e}')
+
+@grupos.command('snapshot-indicadores')
+@with_appcontext
+def snapshot_indicadores():
+    """
+    Grava a foto diária dos indicadores de todas as áreas, setores e PGs (histórico para gráficos de tendência).
+    Deve ser agendado uma vez por noite (ex.: cron).
+
+    Uso: flask grupos snapshot-indicadores
+    """
+    click.echo('Gravando o histórico diário dos indicadores...')
+    try:
+        total = registrar_snapshot(db.session)
+        db.session.commit()
+        click.echo(f'✅ {total} escopos registrados no histórico.')
+    except Exception as e:
+        db.session.rollback()
+        click.echo(f'❌ Erro ao gravar o histórico: {e}')
+
+@grupos.command('limpar-membros-presos')
+@click.option('--dry-run', is_flag=True, help='Apenas mostra quantos membros seriam desvinculados em cada PG.')
+@with_appcontext
+def limpar_membros_presos_cmd(dry_run):
+    """
+    Desvincula os membros que continuam ligados a PGs inativos (fechados ou multiplicados).
+    Pode ser agendado (ex.: cron) no lugar da tela de limpeza.
+
+    Uso: flask grupos limpar-membros-presos [--dry-run]
+    """
+    try:
+        relatorio = limpar_membros_presos(db.session, dry_run=dry_run)
+        for _, pg_nome, num_membros in relatorio:
+            click.echo(f'  {pg_nome}: {num_membros} membro(s)')
+        total = sum(num_membros for _, _, num_membros in relatorio)
+        if dry_run:
+            db.session.rollback()
+            click.echo(f'ℹ️ Dry-run: {total} membros seriam desvinculados de {len(relatorio)} PGs inativos.')
+        else:
+            db.session.commit()
+            click.echo(f'✅ {total} membros desvinculados de {len(relatorio)} PGs inativos.')
+    except Exception as e:
+        db.session.rollback()
+        click.echo(f'❌ Erro na limpeza de membros presos: {e}')
@@ -0,0 +1,296 @@
+from app.extensions import db
+from app.cache import incrementar_versao, VERSAO_HIERARQUIA
+from app.grupos.models import Area, Setor, PequenoGrupo, MembroEscopo, area_supervisores, setor_supervisores
+from app.membresia.models import (
+    Membro, CARGO_SUPERVISOR_AREA, CARGO_SUPERVISOR_SETOR, CARGO_FACILITADOR_PG, CARGO_ANFITRIAO_PG, nome_cargo_principal
+)
+from sqlalchemy import event, select, delete, insert, update, union, literal, inspect
+from sqlalchemy.orm import Session
+from itertools import chain
+
+ESCOPO_AREA = 'area'
+ESCOPO_SETOR = 'setor'
+ESCOPO_PG = 'pg'
+ESCOPOS = (ESCOPO_AREA, ESCOPO_SETOR, ESCOPO_PG)
+# Pseudo-escopo com todos os membros de PGs ativos (id sempre 0), usado nos painéis gerais.
+ESCOPO_GERAL = 'geral'
+ESCOPO_GERAL_ID = 0
+
+PAPEL_PARTICIPANTE = 'participante'
+PAPEL_FACILITADOR = 'facilitador'
+PAPEL_ANFITRIAO = 'anfitriao'
+PAPEL_SUPERVISOR_SETOR = 'supervisor_setor'
+PAPEL_SUPERVISOR_AREA = 'supervisor_area'
+PAPEIS_PG = (PAPEL_PARTICIPANTE, PAPEL_FACILITADOR, PAPEL_ANFITRIAO)
+
+CHAVE_PENDENCIAS = 'escopos_pendentes'
+# Escopos cujo conjunto de membros mudou no commit corrente (lido pelos indicadores materializados).
+CHAVE_ESCOPOS_ALTERADOS = 'escopos_alterados'
+TAMANHO_LOTE = 500
+
+# Atributos de Membro que alteram a posição dele na hierarquia.
+ATRIBUTOS_MEMBRO = ('pg_id', 'pg_participante', 'areas_supervisionadas', 'setores_supervisionados',
+                    'pgs_facilitados', 'pgs_anfitriados')
+
+
+def _fontes(membro_ids=None, escopo=None, escopo_ids=None):
+    """
+    União (membro_id, escopo, escopo_id, area_id, papel) calculada a partir das tabelas de origem.
+    PGs inativos contam apenas no próprio escopo de PG; setores e áreas consideram só os PGs ativos.
+    Com `escopo`/`escopo_ids`, só entram os ramos daquele escopo, já filtrados pelos ids (sem ler a hierarquia inteira).
+    """
+    def incluir(escopo_ramo):
+        return escopo is None or escopo_ramo == escopo
+
+    def filtrar(consulta, chave):
+        if escopo_ids is not None:
+            consulta = consulta.where(chave.in_(escopo_ids))
+        return consulta
+
+    pg_ativo = PequenoGrupo.ativo == True
+    papeis_pg = [
+        (Membro.id, PAPEL_PARTICIPANTE),
+        (PequenoGrupo.facilitador_id, PAPEL_FACILITADOR),
+        (PequenoGrupo.anfitriao_id, PAPEL_ANFITRIAO),
+    ]
+
+    consultas = []
+    for coluna_membro, papel in papeis_pg:
+        for escopo_ramo, chave, filtro in (
+            (ESCOPO_PG, PequenoGrupo.id, None),
+            (ESCOPO_SETOR, Setor.id, pg_ativo),
+            (ESCOPO_AREA, Setor.area_id, pg_ativo),
+        ):
+            if not incluir(escopo_ramo):
+                continue
+            consulta = select(
+                coluna_membro.label('membro_id'),
+                literal(escopo_ramo).label('escopo'),
+                chave.label('escopo_id'),
+                Setor.area_id.label('area_id'),
+                literal(papel).label('papel'),
+            )
+            if papel == PAPEL_PARTICIPANTE:
+                consulta = consulta.select_from(Membro).join(PequenoGrupo, Membro.pg_id == PequenoGrupo.id)
+            else:
+                consulta = consulta.select_from(PequenoGrupo).where(coluna_membro.isnot(None))
+            consulta = consulta.join(Setor, PequenoGrupo.setor_id == Setor.id)
+            if filtro is not None:
+                consulta = consulta.where(filtro)
+            if membro_ids is not None:
+                consulta = consulta.where(coluna_membro.in_(membro_ids))
+            consultas.append(filtrar(consulta, chave))
+
+    for escopo_ramo, chave in ((ESCOPO_SETOR, Setor.id), (ESCOPO_AREA, Setor.area_id)):
+        if not incluir(escopo_ramo):
+            continue
+        consulta = select(
+            setor_supervisores.c.supervisor_id.label('membro_id'),
+            literal(escopo_ramo).label('escopo'),
+            chave.label('escopo_id'),
+            Setor.area_id.label('area_id'),
+            literal(PAPEL_SUPERVISOR_SETOR).label('papel'),
+        ).join(Setor, setor_supervisores.c.setor_id == Setor.id)
+        if membro_ids is not None:
+            consulta = consulta.where(setor_supervisores.c.supervisor_id.in_(membro_ids))
+        consultas.append(filtrar(consulta, chave))
+
+    if incluir(ESCOPO_AREA):
+        consulta = select(
+            area_supervisores.c.supervisor_id.label('membro_id'),
+            literal(ESCOPO_AREA).label('escopo'),
+            area_supervisores.c.area_id.label('escopo_id'),
+            area_supervisores.c.area_id.label('area_id'),
+            literal(PAPEL_SUPERVISOR_AREA).label('papel'),
+        )
+        if membro_ids is not None:
+            consulta = consulta.where(area_supervisores.c.supervisor_id.in_(membro_ids))
+        consultas.append(filtrar(consulta, area_supervisores.c.area_id))
+
+    return union(*consultas)
+
+
+def _inserir_fontes(executar, membro_ids=None):
+    fontes = _fontes(membro_ids).subquery('fontes')
+    executar(insert(MembroEscopo).from_select(
+        ['membro_id', 'escopo', 'escopo_id', 'area_id', 'papel'],
+        select(fontes.c.membro_id, fontes.c.escopo, fontes.c.escopo_id, fontes.c.area_id, fontes.c.papel)
+    ))
+
+
+def atualizar_cargos(sessao, membro_ids=None):
+    """
+    Recalcula Membro.cargos_mask e Membro.cargo_principal dos membros informados
+    (ou de todos, se membro_ids for None) a partir das tabelas da hierarquia.
+    Só altera as linhas cujo resumo mudou.
+    """
+    fontes = (
+        (CARGO_SUPERVISOR_AREA, area_supervisores.c.supervisor_id),
+        (CARGO_SUPERVISOR_SETOR, setor_supervisores.c.supervisor_id),
+        (CARGO_FACILITADOR_PG, PequenoGrupo.facilitador_id),
+        (CARGO_ANFITRIAO_PG, PequenoGrupo.anfitriao_id),
+    )
+    mascaras = {}
+    for bit, coluna in fontes:
+        consulta = select(coluna).where(coluna.isnot(None)).distinct()
+        if membro_ids is not None:
+            consulta = consulta.where(coluna.in_(membro_ids))
+        for membro_id in sessao.execute(consulta).scalars():
+            mascaras[membro_id] = mascaras.get(membro_id, 0) | bit
+
+    sem_cargo = update(Membro).where(Membro.cargos_mask != 0).values(cargos_mask=0, cargo_principal=None)
+    if membro_ids is not None:
+        sem_cargo = sem_cargo.where(Membro.id.in_([m for m in membro_ids if m not in mascaras]))
+    else:
+        # Subconsulta sobre as mesmas fontes, em vez de um parâmetro por líder
+        com_cargo = union(*[select(coluna).where(coluna.isnot(None)) for _, coluna in fontes])
+        sem_cargo = sem_cargo.where(Membro.id.not_in(com_cargo))
+    sessao.execute(sem_cargo, execution_options={'synchronize_session': False})
+
+    por_mascara = {}
+    for membro_id, mascara in mascaras.items():
+        por_mascara.setdefault(mascara, []).append(membro_id)
+    for mascara, ids in por_mascara.items():
+        for inicio in range(0, len(ids), TAMANHO_LOTE):
+            sessao.execute(
+                update(Membro)
+                .where(Membro.id.in_(ids[inicio:inicio + TAMANHO_LOTE]), Membro.cargos_mask != mascara)
+                .values(cargos_mask=mascara, cargo_principal=nome_cargo_principal(mascara)),
+                execution_options={'synchronize_session': False}
+            )
+
+
+def reconstruir_escopos(sessao=None):
+    """Recria toda a tabela membro_escopo (e o resumo de cargos dos membros) a partir das tabelas de origem. Não faz commit."""
+    sessao = sessao or db.session
+    sessao.execute(delete(MembroEscopo))
+    _inserir_fontes(sessao.execute)
+    atualizar_cargos(sessao)
+    incrementar_versao(sessao, VERSAO_HIERARQUIA)
+    return sessao.query(MembroEscopo).count()
+
+
+def atualizar_escopos(sessao, membro_ids=(), escopos=()):
+    """
+    Recalcula as linhas de membro_escopo dos membros informados e de todos os membros
+    que pertenciam (ou passaram a pertencer) aos escopos informados.
+    Retorna os pares (escopo, escopo_id) que esses membros ocupavam antes ou ocupam depois.
+
+    Args:
+        membro_ids: ids de membros alterados.
+        escopos: pares (escopo, escopo_id) alterados.
+    """
+    afetados = {m for m in membro_ids if m is not None}
+
+    por_escopo = {}
+    for escopo, escopo_id in escopos:
+        if escopo_id is not None:
+            por_escopo.setdefault(escopo, set()).add(escopo_id)
+
+    # Mudar um setor de área altera o area_id de todos os PGs dele, inclusive os inativos.
+    if por_escopo.get(ESCOPO_SETOR):
+        pgs_do_setor = select(PequenoGrupo.id).where(PequenoGrupo.setor_id.in_(por_escopo[ESCOPO_SETOR]))
+        por_escopo.setdefault(ESCOPO_PG, set()).update(sessao.execute(pgs_do_setor).scalars())
+
+    for escopo, ids in por_escopo.items():
+        atuais = select(MembroEscopo.membro_id)\
+            .where(MembroEscopo.escopo == escopo, MembroEscopo.escopo_id.in_(ids))
+        afetados.update(sessao.execute(atuais).scalars())
+
+        fontes = _fontes(escopo=escopo, escopo_ids=ids).subquery('fontes')
+        afetados.update(sessao.execute(select(fontes.c.membro_id)).scalars())
+
+    afetados.discard(None)
+    afetados = sorted(afetados)
+    alterados = set()
+    for inicio in range(0, len(afetados), TAMANHO_LOTE):
+        lote = afetados[inicio:inicio + TAMANHO_LOTE]
+        alterados.update(_escopos_dos_membros(sessao, lote))
+        sessao.execute(delete(MembroEscopo).where(MembroEscopo.membro_id.in_(lote)))
+        _inserir_fontes(sessao.execute, lote)
+        atualizar_cargos(sessao, lote)
+        alterados.update(_escopos_dos_membros(sessao, lote))
+
+    return alterados
+
+
+def _escopos_dos_membros(sessao, membro_ids):
+    consulta = select(MembroEscopo.escopo, MembroEscopo.escopo_id)\
+        .where(MembroEscopo.membro_id.in_(membro_ids))\
+        .distinct()
+    return {tuple(linha) for linha in sessao.execute(consulta)}
+
+
+def escopos_dos_membros(sessao, membro_ids):
+    """Pares (escopo, escopo_id) aos quais os membros informados pertencem atualmente."""
+    membro_ids = sorted({m for m in membro_ids if m is not None})
+    escopos = set()
+    for inicio in range(0, len(membro_ids), TAMANHO_LOTE):
+        escopos.update(_escopos_dos_membros(sessao, membro_ids[inicio:inicio + TAMANHO_LOTE]))
+    return escopos
+
+
+def _pendencias(sessao):
+    return sessao.info.setdefault(CHAVE_PENDENCIAS, {'membros': set(), 'escopos': set()})
+
+
+def marcar_membros(sessao, membro_ids):
+    """Agenda o recálculo da hierarquia dos membros informados no próximo commit (ex.: após updates em massa)."""
+    _pendencias(sessao)['membros'].update(membro_ids)
+
+
+def marcar_escopo(sessao, escopo, escopo_id):
+    """Agenda o recálculo de um PG, setor ou área no próximo commit (ex.: após updates em massa)."""
+    _pendencias(sessao)['escopos'].add((escopo, escopo_id))
+
+
+def _alterou(obj, atributos):
+    estado = inspect(obj)
+    return any(estado.attrs[nome].history.has_changes() for nome in atributos)
+
+
+@event.listens_for(Session, 'after_flush')
+def _coletar_alteracoes(sessao, flush_context):
+    pendencias = None
+
+    for obj in chain(sessao.new, sessao.dirty, sessao.deleted):
+        if isinstance(obj, Membro):
+            if obj in sessao.dirty and not _alterou(obj, ATRIBUTOS_MEMBRO):
+                continue
+            pendencias = pendencias or _pendencias(sessao)
+            pendencias['membros'].add(obj.id)
+        elif isinstance(obj, PequenoGrupo):
+            pendencias = pendencias or _pendencias(sessao)
+            pendencias['escopos'].add((ESCOPO_PG, obj.id))
+            pendencias['membros'].update((obj.facilitador_id, obj.anfitriao_id))
+        elif isinstance(obj, Setor):
+            pendencias = pendencias or _pendencias(sessao)
+            pendencias['escopos'].add((ESCOPO_SETOR, obj.id))
+        elif isinstance(obj, Area):
+            pendencias = pendencias or _pendencias(sessao)
+            pendencias['escopos'].add((ESCOPO_AREA, obj.id))
+
+
+@event.listens_for(Session, 'before_commit')
+def _aplicar_alteracoes(sessao):
+    sessao.flush()
+    pendencias = sessao.info.pop(CHAVE_PENDENCIAS, None)
+    if pendencias and (pendencias['membros'] or pendencias['escopos']):
+        alterados = atualizar_escopos(sessao, pendencias['membros'], pendencias['escopos'])
+        sessao.info.setdefault(CHAVE_ESCOPOS_ALTERADOS, set()).update(alterados | pendencias['escopos'])
+        incrementar_versao(sessao, VERSAO_HIERARQUIA)
+
+
+@event.listens_for(Session, 'after_rollback')
+def _descartar_alteracoes(sessao):
+    sessao.info.pop(CHAVE_PENDENCIAS, None)
+    sessao.info.pop(CHAVE_ESCOPOS_ALTERADOS, None)
+
+
+def ids_membros_do_escopo(escopo, escopo_ids, papeis=None):
+    """Select com os ids distintos dos membros de um ou mais escopos."""
+    consulta = select(MembroEscopo.membro_id)\
+        .where(MembroEscopo.escopo == escopo, MembroEscopo.escopo_id.in_(list(escopo_ids)))
+    if papeis:
+        consulta = consulta.where(MembroEscopo.papel.in_(papeis))
+    return consulta.distinct()
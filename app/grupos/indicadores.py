@@ -0,0 +1,471 @@
+from flask import current_app
+from app.extensions import db
+from app.grupos.models import Area, Setor, PequenoGrupo, AreaMetaVigente, MembroEscopo, IndicadorEscopo, IndicadorHistorico
+from app.grupos.escopos import ESCOPO_AREA, ESCOPO_SETOR, ESCOPO_PG, ESCOPO_GERAL, ESCOPO_GERAL_ID, ESCOPOS, PAPEIS_PG, \
+    CHAVE_ESCOPOS_ALTERADOS, escopos_dos_membros
+from app.membresia.models import Membro, JANELA_FREQUENCIA_DIAS
+from app.financeiro.models import Contribuicao
+from app.ctm.models import Presenca, AulaRealizada
+from app.eventos.models import Evento, participantes_evento
+from app.periodos import Periodo
+from sqlalchemy import select, delete, insert, func, case, and_, or_, exists, true, literal, null, event, inspect, Date
+from sqlalchemy.orm import Session, aliased
+from datetime import date, datetime
+from itertools import chain
+
+INICIO_SEM_META = date.min
+FIM_SEM_META = date.max
+
+
+class Indicador:
+    """
+    Definição única de um indicador dos grupos.
+
+    - base 'membro': conta os membros do escopo que satisfazem a condição.
+    - base 'pg': conta os PGs do escopo que satisfazem a condição.
+
+    A condição recebe a janela da meta vigente (um Periodo com limites em SQL)
+    e devolve uma expressão SQL booleana.
+    """
+    def __init__(self, nome, rotulo, base, condicao):
+        self.nome = nome
+        self.rotulo = rotulo
+        self.base = base
+        self.condicao = condicao
+
+    def __repr__(self):
+        return f'<Indicador {self.nome} ({self.base})>'
+
+
+def _janela_frequencia():
+    return Periodo.ultimos_dias(JANELA_FREQUENCIA_DIAS)
+
+def _presente_ctm(janela):
+    presentes = select(Presenca.membro_id)\
+        .join(AulaRealizada, Presenca.aula_realizada_id == AulaRealizada.id)\
+        .where(_janela_frequencia().filtro(AulaRealizada.data))
+    return Membro.id.in_(presentes)
+
+def _dizimista(janela):
+    dizimistas = select(Contribuicao.membro_id)\
+        .where(Contribuicao.tipo == 'Dízimo', _janela_frequencia().filtro(Contribuicao.data_lanc))
+    return Membro.id.in_(dizimistas)
+
+def _batizado_aclamado(janela):
+    return and_(
+        janela.filtro(Membro.data_recepcao),
+        or_(Membro.status != 'Não-Membro', Membro.batizado_aclamado == True)
+    )
+
+def _encontro_com_deus(janela):
+    return exists().where(
+        participantes_evento.c.membro_id == Membro.id,
+        participantes_evento.c.evento_id == Evento.id,
+        Evento.tipo_evento == 'Encontro com Deus',
+        Evento.concluido == True,
+        janela.filtro(Evento.data_evento)
+    )
+
+def _multiplicado_na_janela(janela):
+    return and_(
+        PequenoGrupo.data_multiplicacao.isnot(None),
+        janela.filtro(PequenoGrupo.data_multiplicacao)
+    )
+
+
+INDICADORES = {i.nome: i for i in [
+    Indicador('membros', 'Membros', 'membro', lambda janela: true()),
+    Indicador('facilitadores_treinamento', 'Facilitadores em Treinamento', 'membro',
+              lambda janela: Membro.status_treinamento_pg == 'Facilitador em Treinamento'),
+    Indicador('anfitrioes_treinamento', 'Anfitriões em Treinamento', 'membro',
+              lambda janela: Membro.status_treinamento_pg == 'Anfitrião em Treinamento'),
+    Indicador('ctm_participantes', 'Participantes frequentes no CTM', 'membro', _presente_ctm),
+    Indicador('dizimistas_30d', 'Dizimistas (últimos 30 dias)', 'membro', _dizimista),
+    Indicador('batizados_aclamados', 'Batizados/ Aclamados', 'membro', _batizado_aclamado),
+    Indicador('encontro_deus_participantes', 'Encontro com Deus', 'membro', _encontro_com_deus),
+    Indicador('pgs_ativos', 'PGs Ativos', 'pg', lambda janela: PequenoGrupo.ativo == True),
+    Indicador('multiplicacoes_pg', 'Multiplicações de PG', 'pg', _multiplicado_na_janela),
+    Indicador('pgs_multiplicados', 'PGs Multiplicados', 'pg',
+              lambda janela: and_(PequenoGrupo.ativo == False, PequenoGrupo.data_multiplicacao.isnot(None))),
+]}
+
+# Indicadores que possuem meta correspondente em AreaMetaVigente (meta_<nome>_pg).
+INDICADORES_COM_META = [
+    'facilitadores_treinamento', 'anfitrioes_treinamento', 'ctm_participantes',
+    'encontro_deus_participantes', 'batizados_aclamados', 'multiplicacoes_pg',
+]
+
+
+def membros_do_escopo(escopo, ids):
+    """
+    Select (escopo_id, area_id, membro_id) com todos os membros dos escopos informados:
+    supervisores, líderes e participantes dos PGs ativos abaixo de cada escopo.
+    """
+    if escopo == ESCOPO_GERAL:
+        # Membros de PGs ativos; sem área de referência, os indicadores com janela usam o período aberto.
+        return select(literal(ESCOPO_GERAL_ID).label('escopo_id'), null().label('area_id'), MembroEscopo.membro_id)\
+            .where(MembroEscopo.escopo == ESCOPO_AREA, MembroEscopo.papel.in_(PAPEIS_PG))\
+            .distinct()
+    if escopo not in ESCOPOS:
+        raise ValueError(f'Escopo desconhecido: {escopo}')
+
+    return select(MembroEscopo.escopo_id, MembroEscopo.area_id, MembroEscopo.membro_id)\
+        .where(MembroEscopo.escopo == escopo, MembroEscopo.escopo_id.in_(ids))\
+        .distinct()
+
+
+def pgs_do_escopo(escopo, ids):
+    """Select (escopo_id, area_id, pg_id) com todos os PGs (ativos ou não) dos escopos informados."""
+    if escopo == ESCOPO_GERAL:
+        return select(literal(ESCOPO_GERAL_ID).label('escopo_id'), null().label('area_id'), PequenoGrupo.id.label('pg_id'))
+    if escopo == ESCOPO_PG:
+        chave = PequenoGrupo.id
+    elif escopo == ESCOPO_SETOR:
+        chave = PequenoGrupo.setor_id
+    elif escopo == ESCOPO_AREA:
+        chave = Setor.area_id
+    else:
+        raise ValueError(f'Escopo desconhecido: {escopo}')
+
+    return select(chave.label('escopo_id'), Setor.area_id.label('area_id'), PequenoGrupo.id.label('pg_id'))\
+        .join(Setor, PequenoGrupo.setor_id == Setor.id)\
+        .where(chave.in_(ids))
+
+
+def janelas_de_meta():
+    """Subquery (area_id, data_inicio, data_fim) com a meta mais recente de cada área."""
+    recente = aliased(AreaMetaVigente)
+    ultima_meta_id = select(recente.id)\
+        .where(recente.area_id == AreaMetaVigente.area_id)\
+        .order_by(recente.data_inicio.desc(), recente.id.desc())\
+        .limit(1)\
+        .scalar_subquery()
+
+    return select(AreaMetaVigente.area_id, AreaMetaVigente.data_inicio, AreaMetaVigente.data_fim)\
+        .where(AreaMetaVigente.id == ultima_meta_id)\
+        .subquery('meta')
+
+
+def _janela_padrao(meta):
+    """Período da meta de cada área (fim exclusivo), aberto para áreas sem meta."""
+    return Periodo.da_meta_vigente(meta, INICIO_SEM_META, FIM_SEM_META)
+
+
+def _somatorios(indicadores, janela):
+    return [func.coalesce(func.sum(case((ind.condicao(janela), 1), else_=0)), 0).label(ind.nome) for ind in indicadores]
+
+
+def calcular_indicadores(escopo, ids, nomes=None, conexao=None):
+    """
+    Calcula os indicadores para vários escopos do mesmo tipo de uma só vez.
+
+    Executa no máximo duas consultas agrupadas (uma para indicadores de membros e
+    outra para indicadores de PGs), independente da quantidade de escopos.
+
+    Returns:
+        dict: {escopo_id: {nome_indicador: valor}}
+    """
+    ids = list({int(i) for i in ids})
+    nomes = list(nomes or INDICADORES.keys())
+    resultado = {escopo_id: {nome: 0 for nome in nomes} for escopo_id in ids}
+    if not ids:
+        return resultado
+
+    executar = conexao.execute if conexao is not None else db.session.execute
+    meta = janelas_de_meta()
+
+    por_base = {'membro': [], 'pg': []}
+    for nome in nomes:
+        indicador = INDICADORES[nome]
+        por_base[indicador.base].append(indicador)
+
+    if por_base['membro']:
+        escopo_membros = membros_do_escopo(escopo, ids).subquery('escopo_membros')
+        consulta = select(
+                escopo_membros.c.escopo_id,
+                *_somatorios(por_base['membro'], _janela_padrao(meta))
+            )\
+            .select_from(escopo_membros)\
+            .join(Membro, Membro.id == escopo_membros.c.membro_id)\
+            .outerjoin(meta, meta.c.area_id == escopo_membros.c.area_id)\
+            .where(Membro.ativo == True)\
+            .group_by(escopo_membros.c.escopo_id)
+        for linha in executar(consulta).mappings():
+            resultado[linha['escopo_id']].update({ind.nome: int(linha[ind.nome]) for ind in por_base['membro']})
+
+    if por_base['pg']:
+        escopo_pgs = pgs_do_escopo(escopo, ids).subquery('escopo_pgs')
+        consulta = select(
+                escopo_pgs.c.escopo_id,
+                *_somatorios(por_base['pg'], _janela_padrao(meta))
+            )\
+            .select_from(escopo_pgs)\
+            .join(PequenoGrupo, PequenoGrupo.id == escopo_pgs.c.pg_id)\
+            .outerjoin(meta, meta.c.area_id == escopo_pgs.c.area_id)\
+            .group_by(escopo_pgs.c.escopo_id)
+        for linha in executar(consulta).mappings():
+            resultado[linha['escopo_id']].update({ind.nome: int(linha[ind.nome]) for ind in por_base['pg']})
+
+    return resultado
+
+
+def membros_com_indicadores(escopo, escopo_id, nomes):
+    """
+    Lista os membros ativos de um escopo com as flags dos indicadores informados.
+
+    Returns:
+        list: [(Membro, {nome_indicador: bool})] ordenada pelo nome do membro.
+    """
+    escopo_membros = membros_do_escopo(escopo, [escopo_id]).subquery('escopo_membros')
+    meta = janelas_de_meta()
+    janela = _janela_padrao(meta)
+    flags = [case((INDICADORES[nome].condicao(janela), True), else_=False).label(nome) for nome in nomes]
+
+    consulta = db.session.query(Membro, *flags)\
+        .join(escopo_membros, escopo_membros.c.membro_id == Membro.id)\
+        .outerjoin(meta, meta.c.area_id == escopo_membros.c.area_id)\
+        .filter(Membro.ativo == True)\
+        .order_by(Membro.nome_completo)
+
+    return [(linha[0], {nome: bool(valor) for nome, valor in zip(nomes, linha[1:])}) for linha in consulta.all()]
+
+
+def montar_metricas(valores, meta_vigente, num_pgs_ativos, sufixo=''):
+    """
+    Monta o dicionário usado nos templates de detalhes (meta_* e num_*_atuais<sufixo>).
+    As metas da área são definidas por PG e multiplicadas pelo número de PGs ativos.
+    """
+    metricas = {}
+    for nome in INDICADORES_COM_META:
+        meta_por_pg = (getattr(meta_vigente, f'meta_{nome}_pg') or 0) if meta_vigente else 0
+        metricas[f'meta_{nome}'] = meta_por_pg * num_pgs_ativos
+        metricas[f'num_{nome}_atuais{sufixo}'] = valores.get(nome, 0)
+    return metricas
+
+
+# ====================================================================
+# INDICADORES MATERIALIZADOS (scope_indicators)
+# ====================================================================
+
+CHAVE_PENDENCIAS = 'indicadores_pendentes'
+
+# Atributos de Membro que alteram algum indicador (a posição na hierarquia é tratada em escopos).
+ATRIBUTOS_MEMBRO = ('ativo', 'status', 'status_treinamento_pg', 'data_recepcao', 'batizado_aclamado', 'eventos_inscritos')
+
+
+def gravar_indicadores(sessao, escopo, ids):
+    """
+    Recalcula e grava (substituindo) as linhas de scope_indicators dos escopos informados. Não faz commit.
+    `sessao` pode ser uma Session ou uma Connection.
+    """
+    ids = sorted({i for i in ids if i is not None})
+    if not ids:
+        return {}
+
+    valores = calcular_indicadores(escopo, ids, conexao=sessao)
+    hoje = date.today()
+    agora = datetime.utcnow()
+
+    sessao.execute(delete(IndicadorEscopo).where(IndicadorEscopo.escopo == escopo, IndicadorEscopo.escopo_id.in_(ids)))
+    sessao.execute(insert(IndicadorEscopo), [
+        dict(escopo=escopo, escopo_id=escopo_id, data_referencia=hoje, atualizado_em=agora, **valores[escopo_id])
+        for escopo_id in ids
+    ])
+    return valores
+
+
+def reconstruir_indicadores(sessao=None):
+    """Recalcula todas as linhas de scope_indicators. Não faz commit."""
+    sessao = sessao or db.session
+    sessao.execute(delete(IndicadorEscopo))
+
+    total = 0
+    for escopo, modelo in ((ESCOPO_AREA, Area), (ESCOPO_SETOR, Setor), (ESCOPO_PG, PequenoGrupo)):
+        ids = sessao.execute(select(modelo.id)).scalars().all()
+        total += len(gravar_indicadores(sessao, escopo, ids))
+    total += len(gravar_indicadores(sessao, ESCOPO_GERAL, [ESCOPO_GERAL_ID]))
+    return total
+
+
+def obter_indicadores(escopo, ids):
+    """
+    Lê os indicadores materializados de um ou mais escopos.
+
+    Linhas ausentes ou calculadas em dias anteriores (as janelas de 30 dias andam
+    com o calendário) são recalculadas e gravadas na hora, em uma conexão própria:
+    a sessão da requisição não é commitada (nem dispara os listeners de commit).
+
+    Returns:
+        dict: {escopo_id: {nome_indicador: valor}}
+    """
+    ids = list({int(i) for i in ids})
+    if not ids:
+        return {}
+
+    with db.session.no_autoflush:
+        linhas = IndicadorEscopo.query.filter(IndicadorEscopo.escopo == escopo, IndicadorEscopo.escopo_id.in_(ids)).all()
+    hoje = date.today()
+    resultado = {
+        linha.escopo_id: {nome: getattr(linha, nome) for nome in INDICADORES}
+        for linha in linhas if linha.data_referencia == hoje
+    }
+
+    desatualizados = [i for i in ids if i not in resultado]
+    if desatualizados:
+        try:
+            with db.engine.begin() as conexao:
+                resultado.update(gravar_indicadores(conexao, escopo, desatualizados))
+        except Exception as e:
+            current_app.logger.error(f'Erro ao atualizar indicadores de {escopo}: {e}')
+            resultado.update(calcular_indicadores(escopo, desatualizados))
+
+    return resultado
+
+
+def registrar_snapshot(sessao=None):
+    """
+    Recalcula todos os indicadores e grava a foto do dia em indicador_historico.
+    Rodar de novo no mesmo dia substitui a foto. Não faz commit.
+    """
+    sessao = sessao or db.session
+    hoje = date.today()
+    colunas = list(INDICADORES)
+
+    reconstruir_indicadores(sessao)
+    sessao.execute(delete(IndicadorHistorico).where(IndicadorHistorico.data == hoje))
+    sessao.execute(insert(IndicadorHistorico).from_select(
+        ['escopo', 'escopo_id', 'data', *colunas],
+        select(IndicadorEscopo.escopo, IndicadorEscopo.escopo_id, literal(hoje, Date), *[getattr(IndicadorEscopo, c) for c in colunas])
+    ))
+    return sessao.query(IndicadorHistorico).filter(IndicadorHistorico.data == hoje).count()
+
+
+def serie_historica(escopo, escopo_id, inicio, fim, nomes=None):
+    """
+    Série diária dos indicadores de um escopo entre inicio e fim (inclusive), lida de indicador_historico.
+
+    Returns:
+        dict: {'labels': [datas ISO], 'series': {nome: [valores]}, 'rotulos': {nome: rótulo}}
+    """
+    nomes = list(nomes or INDICADORES)
+    linhas = db.session.query(IndicadorHistorico.data, *[getattr(IndicadorHistorico, nome) for nome in nomes])\
+        .filter(IndicadorHistorico.escopo == escopo,
+                IndicadorHistorico.escopo_id == escopo_id,
+                Periodo.entre(inicio, fim).filtro(IndicadorHistorico.data))\
+        .order_by(IndicadorHistorico.data)\
+        .all()
+
+    return {
+        'labels': [linha[0].isoformat() for linha in linhas],
+        'series': {nome: [linha[i + 1] for linha in linhas] for i, nome in enumerate(nomes)},
+        'rotulos': {nome: INDICADORES[nome].rotulo for nome in nomes},
+    }
+
+
+def _pendencias(sessao):
+    return sessao.info.setdefault(CHAVE_PENDENCIAS, {'membros': set(), 'escopos': set(), 'areas_completas': set(), 'removidos': set()})
+
+
+def marcar_indicadores_membros(sessao, membro_ids):
+    """Agenda a atualização dos indicadores dos escopos desses membros (ex.: após updates em massa)."""
+    _pendencias(sessao)['membros'].update(membro_ids)
+
+
+def _historico(obj, atributo):
+    historico = inspect(obj).attrs[atributo].history
+    return list(historico.added or ()) + list(historico.deleted or ())
+
+
+@event.listens_for(Session, 'before_flush')
+def _coletar_participantes_removidos(sessao, flush_context, instancias):
+    # As inscrições de um evento excluído somem no flush; os participantes precisam ser lidos antes.
+    for obj in sessao.deleted:
+        if isinstance(obj, Evento):
+            participantes = select(participantes_evento.c.membro_id).where(participantes_evento.c.evento_id == obj.id)
+            _pendencias(sessao)['membros'].update(sessao.execute(participantes).scalars())
+
+
+@event.listens_for(Session, 'after_flush')
+def _coletar_alteracoes(sessao, flush_context):
+    pendencias = None
+
+    for obj in chain(sessao.new, sessao.dirty, sessao.deleted):
+        removido = obj in sessao.deleted
+        if isinstance(obj, Membro):
+            if obj not in sessao.dirty or any(inspect(obj).attrs[nome].history.has_changes() for nome in ATRIBUTOS_MEMBRO):
+                pendencias = pendencias or _pendencias(sessao)
+                pendencias['membros'].add(obj.id)
+        elif isinstance(obj, (Contribuicao, Presenca)):
+            pendencias = pendencias or _pendencias(sessao)
+            pendencias['membros'].add(obj.membro_id)
+            pendencias['membros'].update(_historico(obj, 'membro_id'))
+        elif isinstance(obj, AulaRealizada):
+            pendencias = pendencias or _pendencias(sessao)
+            presentes = select(Presenca.membro_id).where(Presenca.aula_realizada_id == obj.id)
+            pendencias['membros'].update(sessao.execute(presentes).scalars())
+        elif isinstance(obj, Evento) and not removido:
+            pendencias = pendencias or _pendencias(sessao)
+            participantes = select(participantes_evento.c.membro_id).where(participantes_evento.c.evento_id == obj.id)
+            pendencias['membros'].update(sessao.execute(participantes).scalars())
+            pendencias['membros'].update(m.id for m in _historico(obj, 'participantes'))
+        elif isinstance(obj, AreaMetaVigente):
+            pendencias = pendencias or _pendencias(sessao)
+            pendencias['areas_completas'].update([obj.area_id] + _historico(obj, 'area_id'))
+        elif isinstance(obj, PequenoGrupo):
+            pendencias = pendencias or _pendencias(sessao)
+            pendencias['removidos' if removido else 'escopos'].add((ESCOPO_PG, obj.id))
+            pendencias['escopos'].update((ESCOPO_SETOR, setor_id) for setor_id in [obj.setor_id] + _historico(obj, 'setor_id'))
+        elif isinstance(obj, Setor):
+            pendencias = pendencias or _pendencias(sessao)
+            pendencias['removidos' if removido else 'escopos'].add((ESCOPO_SETOR, obj.id))
+            pendencias['escopos'].update((ESCOPO_AREA, area_id) for area_id in [obj.area_id] + _historico(obj, 'area_id'))
+        elif isinstance(obj, Area) and removido:
+            pendencias = pendencias or _pendencias(sessao)
+            pendencias['removidos'].add((ESCOPO_AREA, obj.id))
+
+
+def _escopos_a_atualizar(sessao, pendencias, alterados):
+    escopos = set(alterados or ()) | pendencias['escopos']
+    escopos.update(escopos_dos_membros(sessao, pendencias['membros']))
+
+    # Um setor alterado muda também a área a que pertence.
+    setor_ids = {i for e, i in escopos if e == ESCOPO_SETOR and i is not None}
+    if setor_ids:
+        escopos.update((ESCOPO_AREA, i) for i in sessao.execute(select(Setor.area_id).where(Setor.id.in_(setor_ids))).scalars())
+
+    # Metas valem para a área inteira: setores e PGs abaixo dela usam a mesma janela.
+    area_ids = {i for i in pendencias['areas_completas'] if i is not None}
+    if area_ids:
+        escopos.update((ESCOPO_AREA, i) for i in area_ids)
+        escopos.update((ESCOPO_SETOR, i) for i in sessao.execute(select(Setor.id).where(Setor.area_id.in_(area_ids))).scalars())
+        pgs = select(PequenoGrupo.id).join(Setor, PequenoGrupo.setor_id == Setor.id).where(Setor.area_id.in_(area_ids))
+        escopos.update((ESCOPO_PG, i) for i in sessao.execute(pgs).scalars())
+
+    return escopos - pendencias['removidos']
+
+
+@event.listens_for(Session, 'before_commit')
+def _aplicar_alteracoes(sessao):
+    # Executa depois do listener de app.grupos.escopos (registrado antes), com membro_escopo já atualizado.
+    sessao.flush()
+    pendencias = sessao.info.pop(CHAVE_PENDENCIAS, None)
+    alterados = sessao.info.pop(CHAVE_ESCOPOS_ALTERADOS, None)
+    if not pendencias and not alterados:
+        return
+    pendencias = pendencias or {'membros': set(), 'escopos': set(), 'areas_completas': set(), 'removidos': set()}
+
+    escopos = _escopos_a_atualizar(sessao, pendencias, alterados)
+
+    for escopo, escopo_id in pendencias['removidos']:
+        sessao.execute(delete(IndicadorEscopo).where(IndicadorEscopo.escopo == escopo, IndicadorEscopo.escopo_id == escopo_id))
+
+    for escopo in ESCOPOS:
+        gravar_indicadores(sessao, escopo, [i for e, i in escopos if e == escopo])
+
+    # O escopo geral percorre todos os membros; é apenas invalidado e recalculado na próxima leitura.
+    sessao.execute(delete(IndicadorEscopo).where(IndicadorEscopo.escopo == ESCOPO_GERAL))
+
+
+@event.listens_for(Session, 'after_rollback')
+def _descartar_alteracoes(sessao):
+    sessao.info.pop(CHAVE_PENDENCIAS, None)
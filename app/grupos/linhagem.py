@@ -0,0 +1,98 @@
+from app.extensions import db
+from app.grupos.models import PequenoGrupo
+from sqlalchemy import select, func, literal
+from sqlalchemy.orm import aliased
+
+# Proteção contra ciclos acidentais em pg_origem_id.
+LIMITE_GERACOES = 100
+
+
+def _cte_ancestrais(pg_id):
+    """CTE recursiva (id, pg_origem_id, distancia) do próprio PG (distância 0) até o fundador."""
+    pai = aliased(PequenoGrupo)
+    base = select(PequenoGrupo.id, PequenoGrupo.pg_origem_id, literal(0).label('distancia'))\
+        .where(PequenoGrupo.id == pg_id)\
+        .cte('ancestrais', recursive=True)
+    return base.union_all(
+        select(pai.id, pai.pg_origem_id, base.c.distancia + 1)
+        .where(pai.id == base.c.pg_origem_id, base.c.distancia < LIMITE_GERACOES)
+    )
+
+
+def _cte_descendentes(pg_id):
+    """CTE recursiva (id, pg_origem_id, geracao) do próprio PG (geração 0) e de todos os PGs derivados dele."""
+    filho = aliased(PequenoGrupo)
+    base = select(PequenoGrupo.id, PequenoGrupo.pg_origem_id, literal(0).label('geracao'))\
+        .where(PequenoGrupo.id == pg_id)\
+        .cte('descendentes', recursive=True)
+    return base.union_all(
+        select(filho.id, filho.pg_origem_id, base.c.geracao + 1)
+        .where(filho.pg_origem_id == base.c.id, base.c.geracao < LIMITE_GERACOES)
+    )
+
+
+def ancestrais(pg_id):
+    """PGs dos quais o PG descende, do pai ao fundador: lista de dicts com id, nome e distancia (1 = pai)."""
+    cte = _cte_ancestrais(pg_id)
+    consulta = select(PequenoGrupo.id, PequenoGrupo.nome, PequenoGrupo.ativo, cte.c.distancia)\
+        .join(cte, cte.c.id == PequenoGrupo.id)\
+        .where(cte.c.distancia > 0)\
+        .order_by(cte.c.distancia)
+    return [
+        {'id': id, 'nome': nome, 'ativo': bool(ativo), 'distancia': distancia}
+        for id, nome, ativo, distancia in db.session.execute(consulta)
+    ]
+
+
+def descendentes(pg_id):
+    """Todos os PGs derivados do PG: lista de dicts com id, nome, pg_origem_id e geracao (1 = filhos)."""
+    cte = _cte_descendentes(pg_id)
+    consulta = select(PequenoGrupo.id, PequenoGrupo.nome, PequenoGrupo.ativo, PequenoGrupo.pg_origem_id, cte.c.geracao)\
+        .join(cte, cte.c.id == PequenoGrupo.id)\
+        .where(cte.c.geracao > 0)\
+        .order_by(cte.c.geracao, PequenoGrupo.nome)
+    return [
+        {'id': id, 'nome': nome, 'ativo': bool(ativo), 'pg_origem_id': pg_origem_id, 'geracao': geracao}
+        for id, nome, ativo, pg_origem_id, geracao in db.session.execute(consulta)
+    ]
+
+
+def profundidade(pg_id):
+    """Geração do PG na sua árvore (0 para PGs fundadores)."""
+    cte = _cte_ancestrais(pg_id)
+    return db.session.execute(select(func.max(cte.c.distancia))).scalar() or 0
+
+
+def resumo_subarvore(pg_id):
+    """
+    Números da árvore abaixo do PG, em uma única consulta:
+    total de descendentes, PGs ativos entre eles, multiplicações (PGs da árvore que geraram filhos)
+    e a geração mais profunda.
+    """
+    cte = _cte_descendentes(pg_id)
+    descendente = cte.c.geracao > 0
+    consulta = select(
+        func.count(PequenoGrupo.id).filter(descendente),
+        func.count(PequenoGrupo.id).filter(descendente, PequenoGrupo.ativo == True),
+        func.count(func.distinct(cte.c.pg_origem_id)).filter(descendente),
+        func.max(cte.c.geracao),
+    ).join(cte, cte.c.id == PequenoGrupo.id)
+    total, ativos, multiplicacoes, geracoes = db.session.execute(consulta).one()
+    return {
+        'descendentes': total or 0,
+        'descendentes_ativos': ativos or 0,
+        'multiplicacoes': multiplicacoes or 0,
+        'geracoes': geracoes or 0,
+    }
+
+
+def linhagem(pg_id):
+    """Dados completos da genealogia de um PG (usado pelo endpoint JSON)."""
+    lista_ancestrais = ancestrais(pg_id)
+    return {
+        'pg_id': pg_id,
+        'geracao': len(lista_ancestrais),
+        'ancestrais': lista_ancestrais,
+        'descendentes': descendentes(pg_id),
+        'subarvore': resumo_subarvore(pg_id),
+    }
@@ -0,0 +1,82 @@
+from app.extensions import db
+from app.grupos.models import PequenoGrupo
+from app.grupos.escopos import marcar_membros
+from app.membresia.models import Membro
+from app.jornada.models import registrar_eventos_jornada
+from sqlalchemy import select, update, func
+
+# Valores padrão de participante aplicados aos membros desvinculados (como na multiplicação/fechamento).
+VALORES_MEMBRO_LIBERADO = {
+    'pg_id': None,
+    'status_treinamento_pg': 'Participante',
+    'participou_ctm': False,
+    'participou_encontro_deus': False,
+    'batizado_aclamado': False,
+}
+
+
+def _pgs_inativos():
+    return select(PequenoGrupo.id).where(PequenoGrupo.ativo == False)
+
+
+def membros_presos_por_pg(sessao=None):
+    """Lista (pg_id, pg_nome, num_membros) dos PGs inativos que ainda têm membros vinculados."""
+    sessao = sessao or db.session
+    consulta = select(PequenoGrupo.id, PequenoGrupo.nome, func.count(Membro.id))\
+        .join(Membro, Membro.pg_id == PequenoGrupo.id)\
+        .where(PequenoGrupo.ativo == False)\
+        .group_by(PequenoGrupo.id, PequenoGrupo.nome)\
+        .order_by(PequenoGrupo.nome)
+    return [tuple(linha) for linha in sessao.execute(consulta)]
+
+
+def membros_presos(sessao=None):
+    """Lista (membro_id, nome, pg_nome) dos membros vinculados a PGs inativos."""
+    sessao = sessao or db.session
+    consulta = select(Membro.id, Membro.nome_completo, PequenoGrupo.nome)\
+        .join(PequenoGrupo, Membro.pg_id == PequenoGrupo.id)\
+        .where(PequenoGrupo.ativo == False)\
+        .order_by(Membro.nome_completo)
+    return [tuple(linha) for linha in sessao.execute(consulta)]
+
+
+def limpar_membros_presos(sessao=None, usuario_executor=None, dry_run=False):
+    """
+    Desvincula de uma só vez todos os membros presos a PGs inativos e registra um evento
+    de jornada por PG. Não faz commit.
+
+    Args:
+        dry_run: se True, apenas retorna o relatório, sem alterar nada.
+
+    Returns:
+        Lista (pg_id, pg_nome, num_membros) com o impacto por PG.
+    """
+    sessao = sessao or db.session
+    relatorio = membros_presos_por_pg(sessao)
+    if dry_run or not relatorio:
+        return relatorio
+
+    vinculos = sessao.execute(
+        select(Membro.pg_id, Membro.id).where(Membro.pg_id.in_(_pgs_inativos()))
+    ).all()
+    membros_por_pg = {}
+    for pg_id, membro_id in vinculos:
+        membros_por_pg.setdefault(pg_id, []).append(membro_id)
+
+    sessao.execute(
+        update(Membro).where(Membro.pg_id.in_(_pgs_inativos())).values(**VALORES_MEMBRO_LIBERADO)
+    )
+    marcar_membros(sessao, [membro_id for _, membro_id in vinculos])
+
+    nomes_pgs = {pg_id: nome for pg_id, nome, _ in relatorio}
+    registrar_eventos_jornada([
+        {
+            'tipo_acao': 'MEMBROS_DESVINCULADOS_PG_INATIVO',
+            'descricao_detalhada': f'{len(membro_ids)} membro(s) desvinculado(s) do PG inativo "{nomes_pgs.get(pg_id, pg_id)}" pela limpeza de vínculos.',
+            'pgs': [pg_id],
+            'membros': membro_ids,
+        }
+        for pg_id, membro_ids in membros_por_pg.items()
+    ], usuario_executor, commit=False)
+
+    return relatorio
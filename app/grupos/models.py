@@ -30,6 +30,7 @@ class AreaMetaVigente(db.Model):
 class Area(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     nome = db.Column(db.String(80), unique=True, nullable=False)
+    nome_normalizado = db.Column(db.String(80), index=True)
     data_criacao = db.Column(db.DateTime, default=datetime.utcnow)
 
     supervisores = relationship('Membro', secondary=area_supervisores, back_populates='areas_supervisionadas')
@@ -44,7 +45,8 @@ class Area(db.Model):
 class Setor(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     nome = db.Column(db.String(80), unique=True, nullable=False)
-    area_id = db.Column(db.Integer, db.ForeignKey('area.id'), nullable=False)
+    nome_normalizado = db.Column(db.String(80), index=True)
+    area_id = db.Column(db.Integer, db.ForeignKey('area.id'), nullable=False, index=True)
     data_criacao = db.Column(db.DateTime, default=datetime.utcnow)
 
     supervisores = relationship('Membro', secondary=setor_supervisores, back_populates='setores_supervisionados')
@@ -58,14 +60,17 @@ class PequenoGrupo(db.Model):
 
     id = db.Column(db.Integer, primary_key=True)
     nome = db.Column(db.String(100), unique=True, nullable=False)
+    nome_normalizado = db.Column(db.String(100), index=True)
     facilitador_id = db.Column(db.Integer, db.ForeignKey('membro.id'), nullable=False)
     anfitriao_id = db.Column(db.Integer, db.ForeignKey('membro.id'), nullable=False)
-    setor_id = db.Column(db.Integer, db.ForeignKey('setor.id'), nullable=False)
+    setor_id = db.Column(db.Integer, db.ForeignKey('setor.id'), nullable=False, index=True)
     dia_reuniao = db.Column(db.String(20), nullable=False)
     horario_reuniao = db.Column(db.String(10), nullable=False)
-    data_multiplicacao = db.Column(db.DateTime, nullable=True)
+    data_multiplicacao = db.Column(db.DateTime, nullable=True, index=True)
     autorizacao_multiplicacao = db.Column(db.Boolean, default=False)
     ativo = db.Column(db.Boolean, default=True)
+    # PG que foi multiplicado para dar origem a este (None para PGs fundadores).
+    pg_origem_id = db.Column(db.Integer, db.ForeignKey('pequeno_grupo.id', ondelete='SET NULL'), nullable=True, index=True)
 
     @property
     def membros_para_indicadores(self):
@@ -88,6 +93,71 @@ class PequenoGrupo(db.Model):
     facilitador = db.relationship('Membro', foreign_keys=[facilitador_id], back_populates='pgs_facilitados')
     anfitriao = db.relationship('Membro', foreign_keys=[anfitriao_id], back_populates='pgs_anfitriados')
     participantes = db.relationship('Membro', foreign_keys='Membro.pg_id', back_populates='pg_participante', lazy='dynamic')
+    pg_origem = db.relationship('PequenoGrupo', remote_side=[id], backref=db.backref('pgs_derivados', lazy='dynamic'))
     
     def __repr__(self):
         return f'<PG: {self.nome} | Facilitador: {self.facilitador.nome_completo}>'
+
+class MembroEscopo(db.Model):
+    """
+    Tabela de fechamento da hierarquia: indica a qual PG, setor e área cada membro
+    pertence e com qual papel. Mantida por app.grupos.escopos.
+    """
+    __tablename__ = 'membro_escopo'
+
+    escopo = db.Column(db.String(10), primary_key=True)
+    escopo_id = db.Column(db.Integer, primary_key=True)
+    membro_id = db.Column(db.Integer, db.ForeignKey('membro.id', ondelete='CASCADE'), primary_key=True, index=True)
+    papel = db.Column(db.String(20), primary_key=True)
+    area_id = db.Column(db.Integer, nullable=False)
+
+    def __repr__(self):
+        return f'<MembroEscopo {self.escopo}:{self.escopo_id} membro={self.membro_id} ({self.papel})>'
+
+class IndicadorEscopo(db.Model):
+    """
+    Indicadores materializados por escopo (área, setor, PG ou geral), com uma linha por escopo.
+    Mantida por app.grupos.indicadores.
+    """
+    __tablename__ = 'scope_indicators'
+
+    escopo = db.Column(db.String(10), primary_key=True)
+    escopo_id = db.Column(db.Integer, primary_key=True)
+    data_referencia = db.Column(db.Date, nullable=False, default=date.today)
+    atualizado_em = db.Column(db.DateTime, nullable=False, default=datetime.utcnow)
+
+    membros = db.Column(db.Integer, nullable=False, default=0)
+    facilitadores_treinamento = db.Column(db.Integer, nullable=False, default=0)
+    anfitrioes_treinamento = db.Column(db.Integer, nullable=False, default=0)
+    ctm_participantes = db.Column(db.Integer, nullable=False, default=0)
+    dizimistas_30d = db.Column(db.Integer, nullable=False, default=0)
+    batizados_aclamados = db.Column(db.Integer, nullable=False, default=0)
+    encontro_deus_participantes = db.Column(db.Integer, nullable=False, default=0)
+    pgs_ativos = db.Column(db.Integer, nullable=False, default=0)
+    multiplicacoes_pg = db.Column(db.Integer, nullable=False, default=0)
+    pgs_multiplicados = db.Column(db.Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f'<IndicadorEscopo {self.escopo}:{self.escopo_id} em {self.data_referencia}>'
+
+class IndicadorHistorico(db.Model):
+    """Foto diária dos indicadores de cada escopo, gravada por `flask grupos snapshot-indicadores`."""
+    __tablename__ = 'indicador_historico'
+
+    escopo = db.Column(db.String(10), primary_key=True)
+    escopo_id = db.Column(db.Integer, primary_key=True)
+    data = db.Column(db.Date, primary_key=True)
+
+    membros = db.Column(db.Integer, nullable=False, default=0)
+    facilitadores_treinamento = db.Column(db.Integer, nullable=False, default=0)
+    anfitrioes_treinamento = db.Column(db.Integer, nullable=False, default=0)
+    ctm_participantes = db.Column(db.Integer, nullable=False, default=0)
+    dizimistas_30d = db.Column(db.Integer, nullable=False, default=0)
+    batizados_aclamados = db.Column(db.Integer, nullable=False, default=0)
+    encontro_deus_participantes = db.Column(db.Integer, nullable=False, default=0)
+    pgs_ativos = db.Column(db.Integer, nullable=False, default=0)
+    multiplicacoes_pg = db.Column(db.Integer, nullable=False, default=0)
+    pgs_multiplicados = db.Column(db.Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f'<IndicadorHistorico {self.escopo}:{self.escopo_id} em {self.data}>'
@@ -0,0 +1,96 @@
+from app.extensions import db
+from app.grupos.models import Setor, PequenoGrupo
+from app.membresia.models import Membro
+from sqlalchemy import select, func, case, union
+from sqlalchemy.orm import aliased
+
+STATUS_FACILITADOR_TREINAMENTO = 'Facilitador em Treinamento'
+STATUS_ANFITRIAO_TREINAMENTO = 'Anfitrião em Treinamento'
+
+
+class ProntidaoPG:
+    """Situação de um PG para a multiplicação (uma linha da consulta agregada)."""
+    def __init__(self, linha):
+        self.id = linha.id
+        self.nome = linha.nome
+        self.setor_id = linha.setor_id
+        self.area_id = linha.area_id
+        self.ativo = bool(linha.ativo)
+        self.autorizacao_multiplicacao = bool(linha.autorizacao_multiplicacao)
+        self.facilitador_nome = linha.facilitador_nome
+        self.anfitriao_nome = linha.anfitriao_nome
+        self.num_facilitadores_treinamento_atuais = linha.num_facilitadores_treinamento or 0
+        self.num_anfitrioes_treinamento_atuais = linha.num_anfitrioes_treinamento or 0
+
+    @property
+    def pronto_para_multiplicar(self):
+        return (
+            self.num_facilitadores_treinamento_atuais > 0 and
+            self.num_anfitrioes_treinamento_atuais > 0 and
+            self.autorizacao_multiplicacao
+        )
+
+    def to_dict(self):
+        return {
+            'id': self.id,
+            'nome': self.nome,
+            'setor_id': self.setor_id,
+            'area_id': self.area_id,
+            'ativo': self.ativo,
+            'facilitador': self.facilitador_nome,
+            'anfitriao': self.anfitriao_nome,
+            'autorizacao_multiplicacao': self.autorizacao_multiplicacao,
+            'facilitadores_treinamento': self.num_facilitadores_treinamento_atuais,
+            'anfitrioes_treinamento': self.num_anfitrioes_treinamento_atuais,
+            'pronto_para_multiplicar': self.pronto_para_multiplicar,
+        }
+
+
+def _membros_dos_pgs(pg_ids):
+    """
+    Select (pg_id, membro_id) com os mesmos membros de PequenoGrupo.membros_para_indicadores:
+    participantes e o anfitrião (quando não é o próprio facilitador).
+    """
+    participantes = select(Membro.pg_id.label('pg_id'), Membro.id.label('membro_id'))\
+        .where(Membro.pg_id.in_(pg_ids))
+    anfitrioes = select(PequenoGrupo.id.label('pg_id'), PequenoGrupo.anfitriao_id.label('membro_id'))\
+        .where(PequenoGrupo.id.in_(pg_ids), PequenoGrupo.anfitriao_id != PequenoGrupo.facilitador_id)
+    return union(participantes, anfitrioes).subquery('membros_pg')
+
+
+def prontidao_multiplicacao(setor_id=None, area_id=None):
+    """
+    Contagem de facilitadores/anfitriões em treinamento e prontidão para multiplicar
+    de todos os PGs de um setor ou de uma área, em uma única consulta agregada.
+    """
+    if (setor_id is None) == (area_id is None):
+        raise ValueError('Informe setor_id ou area_id.')
+
+    pg_ids = select(PequenoGrupo.id).join(Setor, PequenoGrupo.setor_id == Setor.id)
+    pg_ids = pg_ids.where(PequenoGrupo.setor_id == setor_id) if setor_id is not None else pg_ids.where(Setor.area_id == area_id)
+
+    membros_pg = _membros_dos_pgs(pg_ids)
+    membro = aliased(Membro)
+    facilitador = aliased(Membro)
+    anfitriao = aliased(Membro)
+
+    def contar(status):
+        return func.count(case((membro.status_treinamento_pg == status, membro.id)))
+
+    consulta = select(
+        PequenoGrupo.id, PequenoGrupo.nome, PequenoGrupo.setor_id, Setor.area_id,
+        PequenoGrupo.ativo, PequenoGrupo.autorizacao_multiplicacao,
+        facilitador.nome_completo.label('facilitador_nome'),
+        anfitriao.nome_completo.label('anfitriao_nome'),
+        contar(STATUS_FACILITADOR_TREINAMENTO).label('num_facilitadores_treinamento'),
+        contar(STATUS_ANFITRIAO_TREINAMENTO).label('num_anfitrioes_treinamento'),
+    ).join(Setor, PequenoGrupo.setor_id == Setor.id)\
+        .outerjoin(facilitador, PequenoGrupo.facilitador_id == facilitador.id)\
+        .outerjoin(anfitriao, PequenoGrupo.anfitriao_id == anfitriao.id)\
+        .outerjoin(membros_pg, membros_pg.c.pg_id == PequenoGrupo.id)\
+        .outerjoin(membro, membro.id == membros_pg.c.membro_id)\
+        .where(PequenoGrupo.id.in_(pg_ids))\
+        .group_by(PequenoGrupo.id, Setor.area_id, facilitador.nome_completo, anfitriao.nome_completo)\
+        .order_by(PequenoGrupo.nome)
+
+    return [ProntidaoPG(linha) for linha in db.session.execute(consulta)]
@@ -1,41 +1,47 @@
 from flask import Blueprint, render_template, redirect, url_for, flash, request, current_app, jsonify
 from flask_login import login_required, current_user
 from app.extensions import db
-from app.grupos.models import Area, Setor, PequenoGrupo, AreaMetaVigente, setor_supervisores
+from app.grupos.models import Area, Setor, PequenoGrupo, AreaMetaVigente
 from app.grupos.forms import AreaForm, SetorForm, PequenoGrupoForm, AreaMetasForm, MultiplicacaoForm
-from app.eventos.models import Evento, participantes_evento
+from app.grupos.multiplicacao import prontidao_multiplicacao
+from app.grupos.manutencao import limpar_membros_presos, membros_presos
+from app.grupos.linhagem import linhagem
+from app.grupos.indicadores import obter_indicadores, membros_com_indicadores, membros_do_escopo, montar_metricas, serie_historica, INDICADORES, \
+    ESCOPO_AREA, ESCOPO_SETOR, ESCOPO_PG, ESCOPO_GERAL, ESCOPO_GERAL_ID
 from app.membresia.models import Membro
-from app.financeiro.models import Contribuicao
+from app.membresia.painel import aniversariantes, aniversariantes_json, DIAS_ANIVERSARIANTES, MAX_DIAS_ANIVERSARIANTES
 from app.auth.models import User
-from app.jornada.models import registrar_evento_jornada, JornadaEvento
+from app.jornada.models import registrar_evento_jornada, registrar_eventos_jornada, JornadaEvento
+from app.grupos.escopos import marcar_escopo
 from config import Config
 from app.decorators import admin_required, group_permission_required, leader_required, secretaria_or_admin_required
-from sqlalchemy import or_, and_, func
-from sqlalchemy.orm import joinedload
+from app.auth.permissoes import indice_permissoes
+from app.cache import CacheVersionado, VERSAO_HIERARQUIA
+from app.paginacao import paginar_keyset
+from sqlalchemy import and_, func, select, update
+from sqlalchemy.orm import joinedload, selectinload
 from app.ctm.models import TurmaCTM, AulaRealizada, Presenca, ConclusaoCTM
 from datetime import date, datetime, timedelta
-from unidecode import unidecode
+from app.busca import filtro_nome, buscar_membros
 
 grupos_bp = Blueprint('grupos', __name__, template_folder='templates')
 ano=Config.ANO_ATUAL
 versao=Config.VERSAO_APP
 
+POR_PAGINA_LISTAGEM = 30
+PALETA_AREAS = ['#0d6efd', '#20c997', '#198754', '#dc3545', '#ffc107', '#0dcaf0', '#6610f2', '#fd7e14']
+_cache_filtros = CacheVersionado(VERSAO_HIERARQUIA, tamanho_maximo=1)
+
 def is_supervisor_do_setor(user_membro_id, pg):
     """Verifica se o usuário é supervisor do setor do PG."""
-    if not pg.setor:
-        return False
-    membro = Membro.query.get(user_membro_id)
-    if not membro:
+    if not pg.setor_id or not user_membro_id:
         return False
-    return pg.setor in membro.setores_supervisionados
+    return indice_permissoes(user_membro_id).supervisiona('setor', pg.setor_id)
 
 def is_supervisor_da_area(user_membro_id, pg):
-    if not pg.setor or not pg.setor.area:
-        return False
-    membro = Membro.query.get(user_membro_id)
-    if not membro:
+    if not pg.setor or not user_membro_id:
         return False
-    return pg.setor.area in membro.areas_supervisionadas
+    return indice_permissoes(user_membro_id).supervisiona('area', pg.setor.area_id)
 
 def is_pg_facilitator(user_membro_id, pg):
     return pg.facilitador_id == user_membro_id
@@ -45,32 +51,23 @@ def is_pg_facilitator(user_membro_id, pg):
 @login_required
 @secretaria_or_admin_required
 def dashboard():
-    total_areas = Area.query.count()
-    total_setores = Setor.query.count()
-    
-    total_pgs_ativos = PequenoGrupo.query.filter_by(ativo=True).count()
+    areas = db.session.query(Area.id, Area.nome).all()
+    setores = db.session.query(Setor.id, Setor.nome, Area.nome).join(Area, Setor.area_id == Area.id).all()
+    total_areas = len(areas)
+    total_setores = len(setores)
 
-    total_pgs_multiplicados = PequenoGrupo.query.filter(
-        and_(PequenoGrupo.ativo == False, PequenoGrupo.data_multiplicacao.isnot(None))
-    ).count()
-    
-    total_membros_em_pg = Membro.query.join(PequenoGrupo, or_(
-        Membro.pg_id == PequenoGrupo.id,
-        PequenoGrupo.facilitador_id == Membro.id,
-        PequenoGrupo.anfitriao_id == Membro.id
-    )).filter(
-        Membro.ativo == True,
-        PequenoGrupo.ativo == True
-    ).distinct().count()
+    indicadores_gerais = obter_indicadores(ESCOPO_GERAL, [ESCOPO_GERAL_ID])[ESCOPO_GERAL_ID]
+    total_pgs_ativos = indicadores_gerais['pgs_ativos']
+    total_pgs_multiplicados = indicadores_gerais['pgs_multiplicados']
+    total_membros_em_pg = indicadores_gerais['membros']
 
     palette = ['#0d6efd', '#20c997', '#198754', '#dc3545', '#ffc107', '#0dcaf0', '#6610f2', '#fd7e14']
-    
-    pgs_por_area_query = db.session.query(Area.nome, func.count(PequenoGrupo.id))\
-        .join(Setor, Setor.area_id == Area.id)\
-        .join(PequenoGrupo, PequenoGrupo.setor_id == Setor.id)\
-        .filter(PequenoGrupo.ativo == True)\
-        .group_by(Area.nome)\
-        .order_by(func.count(PequenoGrupo.id).desc()).all()
+
+    indicadores_areas = obter_indicadores(ESCOPO_AREA, [area_id for area_id, _ in areas])
+    pgs_por_area = sorted(
+        [(area_nome, indicadores_areas[area_id]['pgs_ativos']) for area_id, area_nome in areas if indicadores_areas[area_id]['pgs_ativos']],
+        key=lambda x: x[1], reverse=True
+    )
     
     labels_pgs_area = []
     data_pgs_area = []
@@ -78,7 +75,7 @@ def dashboard():
     
     area_color_map = {}
 
-    for i, (area_nome, count) in enumerate(pgs_por_area_query):
+    for i, (area_nome, count) in enumerate(pgs_por_area):
         labels_pgs_area.append(area_nome)
         data_pgs_area.append(count)
         
@@ -86,18 +83,17 @@ def dashboard():
         colors_pgs_area.append(cor)
         area_color_map[area_nome] = cor
 
-    pgs_por_setor_query = db.session.query(Setor.nome, func.count(PequenoGrupo.id), Area.nome)\
-        .join(PequenoGrupo, PequenoGrupo.setor_id == Setor.id)\
-        .join(Area, Setor.area_id == Area.id)\
-        .filter(PequenoGrupo.ativo == True)\
-        .group_by(Setor.nome, Area.nome)\
-        .order_by(func.count(PequenoGrupo.id).desc()).all()
+    indicadores_setores = obter_indicadores(ESCOPO_SETOR, [setor_id for setor_id, _, _ in setores])
+    pgs_por_setor = sorted(
+        [(setor_nome, indicadores_setores[setor_id]['pgs_ativos'], area_nome) for setor_id, setor_nome, area_nome in setores if indicadores_setores[setor_id]['pgs_ativos']],
+        key=lambda x: x[1], reverse=True
+    )
         
     labels_pgs_setor = []
     data_pgs_setor = []
     colors_pgs_setor = []
 
-    for setor_nome, count, area_nome in pgs_por_setor_query:
+    for setor_nome, count, area_nome in pgs_por_setor:
         labels_pgs_setor.append(setor_nome)
         data_pgs_setor.append(count)
         
@@ -133,78 +129,71 @@ def listar_grupos_unificada():
     tipo_selecionado = request.args.get('tipo', 'pgs')
     status_pg = request.args.get('status_pg', 'ativos')
 
+    apos = request.args.get('apos')
+    antes = request.args.get('antes')
+
+    if tipo_selecionado not in ('pgs', 'setores', 'areas'):
+        tipo_selecionado = 'pgs'
+
     if current_user.has_permission('admin') or current_user.has_permission('secretaria'):
-        areas_query = Area.query
-        setores_query = Setor.query
-        pgs_query = PequenoGrupo.query
-    elif current_user.membro:
-        membro_logado = current_user.membro
-        areas_do_lider = Area.query.filter(Area.supervisores.any(id=membro_logado.id)).all()
-        area_ids_lider = [a.id for a in areas_do_lider]
-        
-        setores_do_lider = Setor.query.filter(
-            db.or_(Setor.supervisores.any(id=membro_logado.id), Setor.area_id.in_(area_ids_lider))
-        ).all()
-        setor_ids_lider = [s.id for s in setores_do_lider]
-
-        areas_query = Area.query.filter(Area.id.in_(area_ids_lider))
-        setores_query = Setor.query.filter(Setor.id.in_(setor_ids_lider))
-        pgs_query = PequenoGrupo.query.filter(
-            db.or_(
-                PequenoGrupo.facilitador_id == membro_logado.id,
-                PequenoGrupo.anfitriao_id == membro_logado.id,
-                PequenoGrupo.setor_id.in_(setor_ids_lider)
-            )
-        )
+        restricao = None
+    elif current_user.membro_id:
+        restricao = indice_permissoes(current_user.membro_id).grupos
     else:
         flash('Você não tem permissão para visualizar grupos.', 'danger')
         return redirect(url_for('main.index'))
 
+    # Só a aba selecionada é consultada; as demais são renderizadas vazias.
     if tipo_selecionado == 'pgs':
+        query = PequenoGrupo.query.options(
+            joinedload(PequenoGrupo.facilitador),
+            joinedload(PequenoGrupo.anfitriao),
+            joinedload(PequenoGrupo.setor),
+        )
+        if restricao is not None:
+            query = query.filter(PequenoGrupo.id.in_(list(restricao['pg'])))
         if status_pg == 'ativos':
-            pgs_query = pgs_query.filter_by(ativo=True)
+            query = query.filter_by(ativo=True)
         elif status_pg == 'multiplicados':
-            pgs_query = pgs_query.filter(db.and_(PequenoGrupo.ativo == False, PequenoGrupo.data_multiplicacao.isnot(None)))
+            query = query.filter(db.and_(PequenoGrupo.ativo == False, PequenoGrupo.data_multiplicacao.isnot(None)))
         elif status_pg == 'inativos':
-            pgs_query = pgs_query.filter(db.and_(PequenoGrupo.ativo == False, PequenoGrupo.data_multiplicacao.is_(None)))
-    
-    if busca:
-        busca_normalizada = unidecode(busca).lower()
-        busca_db = f'%{busca_normalizada}%' 
-        if tipo_selecionado == 'areas':
-            areas_query = areas_query.filter(func.lower(func.unidecode(Area.nome)).ilike(busca_db))
-        elif tipo_selecionado == 'setores':
-            setores_query = setores_query.filter(func.lower(func.unidecode(Setor.nome)).ilike(busca_db))
-        elif tipo_selecionado == 'pgs':
-            pgs_query = pgs_query.filter(func.lower(func.unidecode(PequenoGrupo.nome)).ilike(busca_db))
-
-    if area_filtro:
-        if tipo_selecionado == 'setores':
-            setores_query = setores_query.filter(Setor.area_id == area_filtro)
-        elif tipo_selecionado == 'pgs':
-            pgs_query = pgs_query.filter(PequenoGrupo.setor.has(Setor.area_id == area_filtro))
-    
-    if setor_filtro:
-        if tipo_selecionado == 'pgs':
-            pgs_query = pgs_query.filter(PequenoGrupo.setor_id == setor_filtro)
+            query = query.filter(db.and_(PequenoGrupo.ativo == False, PequenoGrupo.data_multiplicacao.is_(None)))
+        if busca:
+            query = query.filter(filtro_nome(PequenoGrupo, busca))
+        if area_filtro:
+            query = query.filter(PequenoGrupo.setor_id.in_(select(Setor.id).where(Setor.area_id == area_filtro)))
+        if setor_filtro:
+            query = query.filter(PequenoGrupo.setor_id == setor_filtro)
+        colunas = (PequenoGrupo.nome, PequenoGrupo.id)
+    elif tipo_selecionado == 'setores':
+        query = Setor.query.options(joinedload(Setor.area), selectinload(Setor.supervisores))
+        if restricao is not None:
+            query = query.filter(Setor.id.in_(list(restricao['setor'])))
+        if busca:
+            query = query.filter(filtro_nome(Setor, busca))
+        if area_filtro:
+            query = query.filter(Setor.area_id == area_filtro)
+        colunas = (Setor.nome, Setor.id)
+    else:
+        query = Area.query.options(selectinload(Area.supervisores))
+        if restricao is not None:
+            query = query.filter(Area.id.in_(list(restricao['area'])))
+        if busca:
+            query = query.filter(filtro_nome(Area, busca))
+        colunas = (Area.nome, Area.id)
 
-    areas = areas_query.order_by(Area.nome).all()
-    setores = setores_query.order_by(Setor.nome).all()
-    pgs = pgs_query.order_by(PequenoGrupo.nome).all()
+    pagina = paginar_keyset(query, colunas, apos=apos, antes=antes, por_pagina=POR_PAGINA_LISTAGEM)
+    areas = pagina.itens if tipo_selecionado == 'areas' else []
+    setores = pagina.itens if tipo_selecionado == 'setores' else []
+    pgs = pagina.itens if tipo_selecionado == 'pgs' else []
 
-    todas_areas = Area.query.order_by(Area.nome).all()
-    todos_setores = Setor.query.order_by(Setor.nome).all()
-    
-    palette = ['#0d6efd', '#20c997', '#198754', '#dc3545', '#ffc107', '#0dcaf0', '#6610f2', '#fd7e14']
-    
-    area_colors = {}
-    for i, area in enumerate(todas_areas):
-        area_colors[area.id] = palette[i % len(palette)]
+    todas_areas, todos_setores, area_colors = opcoes_filtro_grupos()
 
     return render_template('grupos/listagem_unificada.html',
                            areas=areas,
                            setores=setores,
                            pgs=pgs,
+                           pagina=pagina,
                            tipo_selecionado=tipo_selecionado,
                            status_pg=status_pg,
                            busca=busca,
@@ -216,6 +205,18 @@ def listar_grupos_unificada():
                            ano=ano, versao=versao,
                            config=Config)
 
+def opcoes_filtro_grupos():
+    """
+    Opções dos filtros da listagem (áreas e setores como tuplas id/nome) e a cor de cada área.
+    Mantidas em memória até a próxima alteração da hierarquia.
+    """
+    def montar():
+        todas_areas = tuple(db.session.execute(select(Area.id, Area.nome).order_by(Area.nome)).all())
+        todos_setores = tuple(db.session.execute(select(Setor.id, Setor.nome).order_by(Setor.nome)).all())
+        area_colors = {area.id: PALETA_AREAS[i % len(PALETA_AREAS)] for i, area in enumerate(todas_areas)}
+        return todas_areas, todos_setores, area_colors
+    return _cache_filtros.obter('listagem', montar)
+
 @grupos_bp.route('/areas')
 @login_required
 @admin_required
@@ -264,182 +265,38 @@ def detalhes_area(area_id):
     area = Area.query.get_or_404(area_id)
     jornada_eventos = area.jornada_eventos_area.order_by(JornadaEvento.data_evento.desc()).all()
 
-    meta_vigente = area.meta_vigente
-    data_inicio_meta = meta_vigente.data_inicio if meta_vigente else date.min
-    data_fim_meta = meta_vigente.data_fim if meta_vigente else date.max
-
-    setor_ids = [s.id for s in area.setores]
-    
-    pg_ids_ativos_query = db.session.query(PequenoGrupo.id)\
-                              .filter(PequenoGrupo.setor_id.in_(setor_ids), 
-                                      PequenoGrupo.ativo == True)
-    
-    pg_ids_ativos = [id[0] for id in pg_ids_ativos_query.all()]
-    num_pgs_ativos = len(pg_ids_ativos)
-
-    membro_ids_supervisores_area = {s.id for s in area.supervisores}
-    
-    membro_ids_supervisores_setor_query = db.session.query(setor_supervisores.c.supervisor_id)\
-                                              .filter(setor_supervisores.c.setor_id.in_(setor_ids))
-    membro_ids_supervisores_setor = {id[0] for id in membro_ids_supervisores_setor_query.all()}
-
-    membro_ids_pgs_query = db.session.query(Membro.id)\
-                               .filter(Membro.pg_id.in_(pg_ids_ativos))
-    membro_ids_pgs = {id[0] for id in membro_ids_pgs_query.all()}
-
-    facilitador_ids_query = db.session.query(PequenoGrupo.facilitador_id).filter(PequenoGrupo.id.in_(pg_ids_ativos))
-    anfitriao_ids_query = db.session.query(PequenoGrupo.anfitriao_id).filter(PequenoGrupo.id.in_(pg_ids_ativos))
-
-    membro_ids_lideres_pg = {id[0] for id in facilitador_ids_query.all()}
-    membro_ids_lideres_pg.update({id[0] for id in anfitriao_ids_query.all()})
+    valores_area = obter_indicadores(ESCOPO_AREA, [area.id])[area.id]
+    num_pgs_ativos = valores_area['pgs_ativos']
 
-    membro_ids_da_area = (membro_ids_supervisores_area | 
-                          membro_ids_supervisores_setor | 
-                          membro_ids_pgs | 
-                          membro_ids_lideres_pg)
-    
-    if not membro_ids_da_area:
-        membro_ids_da_area = []
-
-    metricas_area = {}
-    
+    metricas_area = montar_metricas(valores_area, area.meta_vigente, num_pgs_ativos, sufixo='_agregado')
     metricas_area['num_pequenos_grupos_ativos'] = num_pgs_ativos
 
-    if meta_vigente:
-        metricas_area['meta_facilitadores_treinamento'] = meta_vigente.meta_facilitadores_treinamento_pg * num_pgs_ativos
-        metricas_area['meta_anfitrioes_treinamento'] = meta_vigente.meta_anfitrioes_treinamento_pg * num_pgs_ativos
-        metricas_area['meta_ctm_participantes'] = meta_vigente.meta_ctm_participantes_pg * num_pgs_ativos
-        metricas_area['meta_encontro_deus_participantes'] = meta_vigente.meta_encontro_deus_participantes_pg * num_pgs_ativos
-        metricas_area['meta_batizados_aclamados'] = meta_vigente.meta_batizados_aclamados_pg * num_pgs_ativos
-        metricas_area['meta_multiplicacoes_pg'] = meta_vigente.meta_multiplicacoes_pg_pg * num_pgs_ativos
-    else:
-        metricas_area['meta_facilitadores_treinamento'] = 0
-        metricas_area['meta_anfitrioes_treinamento'] = 0
-        metricas_area['meta_ctm_participantes'] = 0
-        metricas_area['meta_encontro_deus_participantes'] = 0
-        metricas_area['meta_batizados_aclamados'] = 0
-        metricas_area['meta_multiplicacoes_pg'] = 0
-
-    trinta_dias_atras = date.today() - timedelta(days=35)
-    
-    # Subquery para presenças no CTM nos últimos 30 dias
-    subquery_ctm_presentes = db.session.query(Presenca.membro_id)\
-        .join(AulaRealizada)\
-        .filter(AulaRealizada.data >= trinta_dias_atras)\
-        .distinct()
-
-    # Query principal de membros
-    query_membros_indicadores = db.session.query(
-        Membro.status_treinamento_pg,
-        Membro.batizado_aclamado,
-        Membro.data_recepcao,
-        Membro.status,
-        Membro.id.in_(subquery_ctm_presentes).label('presente_ctm_30d')
-    ).filter(Membro.id.in_(membro_ids_da_area)).all()
-
-    metricas_area['num_facilitadores_treinamento_atuais_agregado'] = 0
-    metricas_area['num_anfitrioes_treinamento_atuais_agregado'] = 0
-    metricas_area['num_ctm_participantes_atuais_agregado'] = 0
-    metricas_area['num_batizados_aclamados_atuais_agregado'] = 0
-
-    for membro_indicador in query_membros_indicadores:
-        if membro_indicador.status_treinamento_pg == 'Facilitador em Treinamento':
-            metricas_area['num_facilitadores_treinamento_atuais_agregado'] += 1
-        if membro_indicador.status_treinamento_pg == 'Anfitrião em Treinamento':
-            metricas_area['num_anfitrioes_treinamento_atuais_agregado'] += 1
-        if membro_indicador.presente_ctm_30d:
-            metricas_area['num_ctm_participantes_atuais_agregado'] += 1
-        
-        if membro_indicador.data_recepcao and data_inicio_meta <= membro_indicador.data_recepcao <= data_fim_meta:
-            if membro_indicador.status == 'Não-Membro' and membro_indicador.batizado_aclamado:
-                metricas_area['num_batizados_aclamados_atuais_agregado'] += 1
-            elif membro_indicador.status != 'Não-Membro':
-                metricas_area['num_batizados_aclamados_atuais_agregado'] += 1
-    
-    eventos_encontro_ids = db.session.query(Evento.id).filter(
-        Evento.tipo_evento == 'Encontro com Deus',
-        Evento.concluido == True,
-        Evento.data_evento.between(data_inicio_meta, data_fim_meta)
-    ).all()
-
-    if eventos_encontro_ids:
-        metricas_area['num_encontro_deus_participantes_atuais_agregado'] = db.session.query(participantes_evento)\
-            .filter(participantes_evento.c.evento_id.in_([e_id[0] for e_id in eventos_encontro_ids]),
-                    participantes_evento.c.membro_id.in_(membro_ids_da_area))\
-            .count()
-    else:
-        metricas_area['num_encontro_deus_participantes_atuais_agregado'] = 0
-
-    metricas_area['num_multiplicacoes_pg_atuais_agregado'] = PequenoGrupo.query\
-        .filter(PequenoGrupo.setor_id.in_(setor_ids),
-                PequenoGrupo.data_multiplicacao.isnot(None),
-                PequenoGrupo.data_multiplicacao.between(data_inicio_meta, data_fim_meta))\
-        .count()
+    setores = area.setores.order_by(Setor.nome).all()
+    valores_setores = obter_indicadores(ESCOPO_SETOR, [s.id for s in setores])
 
     dizimistas_por_setor_chart = { 'labels': [], 'dizimistas': [], 'nao_dizimistas': [] }
     ctm_por_setor = []
     membros_por_setor = []
     pgs_ativos_por_setor = []
 
-    trinta_dias_atras_contrib = date.today() - timedelta(days=35)
-
-    pgs_ativos_por_setor_query = db.session.query(Setor.id, func.count(PequenoGrupo.id))\
-        .join(PequenoGrupo, PequenoGrupo.setor_id == Setor.id)\
-        .filter(Setor.area_id == area_id, PequenoGrupo.ativo == True)\
-        .group_by(Setor.id).all()
-    pgs_ativos_por_setor_dict = dict(pgs_ativos_por_setor_query)
-
-    for setor in area.setores:
-        membro_ids_setor_query = db.session.query(Membro.id)\
-            .join(PequenoGrupo, Membro.pg_id == PequenoGrupo.id, isouter=True)\
-            .filter(PequenoGrupo.setor_id == setor.id, Membro.ativo == True)
-        
-        membro_ids_setor = {m[0] for m in membro_ids_setor_query.all()}
-        
-        lideres_pgs_setor_query = db.session.query(PequenoGrupo.facilitador_id, PequenoGrupo.anfitriao_id)\
-            .filter(PequenoGrupo.setor_id == setor.id, PequenoGrupo.ativo == True)
-        for f_id, a_id in lideres_pgs_setor_query.all():
-            membro_ids_setor.add(f_id)
-            membro_ids_setor.add(a_id)
-
-        for supervisor in setor.supervisores:
-             membro_ids_setor.add(supervisor.id)
-
-        num_membros_setor = len(membro_ids_setor)
-        membros_por_setor.append({'setor_nome': setor.nome, 'count': num_membros_setor})
+    for setor in setores:
+        valores_setor = valores_setores[setor.id]
 
+        membros_por_setor.append({'setor_nome': setor.nome, 'count': valores_setor['membros']})
         pgs_ativos_por_setor.append({
             'id': setor.id,
             'nome': setor.nome,
-            'pgs_ativos': pgs_ativos_por_setor_dict.get(setor.id, 0)
+            'pgs_ativos': valores_setor['pgs_ativos']
         })
 
-        if num_membros_setor > 0:
-            dizimistas_30d_setor = db.session.query(func.count(Contribuicao.membro_id.distinct()))\
-                .filter(Contribuicao.membro_id.in_(membro_ids_setor),
-                        Contribuicao.tipo == 'Dízimo',
-                        Contribuicao.data_lanc >= trinta_dias_atras_contrib)\
-                .scalar() or 0
-            
-            ctm_frequentes_setor = db.session.query(func.count(Presenca.membro_id.distinct()))\
-                .join(AulaRealizada)\
-                .filter(Presenca.membro_id.in_(membro_ids_setor),
-                        AulaRealizada.data >= trinta_dias_atras)\
-                .scalar() or 0
-        else:
-            dizimistas_30d_setor = 0
-            ctm_frequentes_setor = 0
-
         dizimistas_por_setor_chart['labels'].append(setor.nome)
-        dizimistas_por_setor_chart['dizimistas'].append(dizimistas_30d_setor)
-        dizimistas_por_setor_chart['nao_dizimistas'].append(num_membros_setor - dizimistas_30d_setor)
-        
+        dizimistas_por_setor_chart['dizimistas'].append(valores_setor['dizimistas_30d'])
+        dizimistas_por_setor_chart['nao_dizimistas'].append(valores_setor['membros'] - valores_setor['dizimistas_30d'])
+
         ctm_por_setor.append({
             'setor_nome': setor.nome,
-            'count': ctm_frequentes_setor
+            'count': valores_setor['ctm_participantes']
         })
-    
-    pgs_ativos_por_setor.sort(key=lambda x: x['nome'])
 
     return render_template('grupos/areas/detalhes.html',
                            area=area,
@@ -451,6 +308,38 @@ def detalhes_area(area_id):
                            pgs_ativos_por_setor=pgs_ativos_por_setor,
                            config=Config, ano=ano, versao=versao)
 
+def _resposta_tendencia(escopo, escopo_id, area):
+    """JSON com a série histórica do escopo; por padrão cobre a janela da meta vigente da área (ou os últimos 90 dias)."""
+    hoje = date.today()
+    meta_vigente = area.meta_vigente if area else None
+    if meta_vigente:
+        inicio, fim = meta_vigente.data_inicio, min(meta_vigente.data_fim, hoje)
+    else:
+        inicio, fim = hoje - timedelta(days=90), hoje
+
+    try:
+        if request.args.get('inicio'):
+            inicio = datetime.strptime(request.args['inicio'], '%Y-%m-%d').date()
+        if request.args.get('fim'):
+            fim = datetime.strptime(request.args['fim'], '%Y-%m-%d').date()
+    except ValueError:
+        return jsonify({'success': False, 'message': 'Datas devem estar no formato AAAA-MM-DD.'}), 400
+
+    nomes = request.args.getlist('indicador') or None
+    if nomes and any(nome not in INDICADORES for nome in nomes):
+        return jsonify({'success': False, 'message': 'Indicador desconhecido.'}), 400
+
+    serie = serie_historica(escopo, escopo_id, inicio, fim, nomes)
+    serie.update(inicio=inicio.isoformat(), fim=fim.isoformat())
+    return jsonify(serie)
+
+@grupos_bp.route('/areas/<int:area_id>/tendencia')
+@login_required
+@group_permission_required(Area, 'view', 'supervisores')
+def tendencia_area(area_id):
+    area = Area.query.get_or_404(area_id)
+    return _resposta_tendencia(ESCOPO_AREA, area.id, area)
+
 @grupos_bp.route('/areas/editar/<int:area_id>', methods=['GET', 'POST'])
 @login_required
 @group_permission_required(Area, 'edit', 'supervisores')
@@ -585,17 +474,12 @@ def detalhes_setor(setor_id):
     setor = Setor.query.get_or_404(setor_id)
     jornada_eventos = setor.jornada_eventos_setor.order_by(JornadaEvento.data_evento.desc()).all()
 
-    meta_vigente = setor.area.meta_vigente
-    data_inicio_meta = meta_vigente.data_inicio if meta_vigente else date.min
-    data_fim_meta = meta_vigente.data_fim if meta_vigente else date.max
-
     pgs_ativos_query = setor.pequenos_grupos.filter(
         PequenoGrupo.ativo == True,
         PequenoGrupo.data_multiplicacao.is_(None)
     )
     pgs_ativos = pgs_ativos_query.order_by(PequenoGrupo.nome).all()
-    pgs_ativos_ids = [pg.id for pg in pgs_ativos]
-    num_pgs_ativos = len(pgs_ativos_ids)
+    num_pgs_ativos = len(pgs_ativos)
 
     pgs_multiplicados = setor.pequenos_grupos.filter(
         db.and_(
@@ -604,135 +488,26 @@ def detalhes_setor(setor_id):
         )
     ).order_by(PequenoGrupo.nome).all()
 
-    membro_ids_supervisores_setor = {s.id for s in setor.supervisores}
-    
-    membro_ids_pgs_query = db.session.query(Membro.id)\
-                               .filter(Membro.pg_id.in_(pgs_ativos_ids))
-    membro_ids_pgs = {id[0] for id in membro_ids_pgs_query.all()}
-    
-    facilitador_ids_query = db.session.query(PequenoGrupo.facilitador_id).filter(PequenoGrupo.id.in_(pgs_ativos_ids))
-    anfitriao_ids_query = db.session.query(PequenoGrupo.anfitriao_id).filter(PequenoGrupo.id.in_(pgs_ativos_ids))
-    
-    membro_ids_lideres_pg = {id[0] for id in facilitador_ids_query.all()}
-    membro_ids_lideres_pg.update({id[0] for id in anfitriao_ids_query.all()})
-
-    membro_ids_do_setor = (membro_ids_supervisores_setor | 
-                           membro_ids_pgs | 
-                           membro_ids_lideres_pg)
-    
-    if not membro_ids_do_setor:
-        membro_ids_do_setor = []
-
-    num_participantes_totais = len(membro_ids_do_setor)
-    
-    metricas_setor = {}
-    
-    if meta_vigente:
-        metricas_setor['meta_facilitadores_treinamento'] = meta_vigente.meta_facilitadores_treinamento_pg * num_pgs_ativos
-        metricas_setor['meta_anfitrioes_treinamento'] = meta_vigente.meta_anfitrioes_treinamento_pg * num_pgs_ativos
-        metricas_setor['meta_ctm_participantes'] = meta_vigente.meta_ctm_participantes_pg * num_pgs_ativos
-        metricas_setor['meta_encontro_deus_participantes'] = meta_vigente.meta_encontro_deus_participantes_pg * num_pgs_ativos
-        metricas_setor['meta_batizados_aclamados'] = meta_vigente.meta_batizados_aclamados_pg * num_pgs_ativos
-        metricas_setor['meta_multiplicacoes_pg'] = meta_vigente.meta_multiplicacoes_pg_pg * num_pgs_ativos
-    else:
-        metricas_setor['meta_facilitadores_treinamento'] = 0
-        metricas_setor['meta_anfitrioes_treinamento'] = 0
-        metricas_setor['meta_ctm_participantes'] = 0
-        metricas_setor['meta_encontro_deus_participantes'] = 0
-        metricas_setor['meta_batizados_aclamados'] = 0
-        metricas_setor['meta_multiplicacoes_pg'] = 0
-
-    trinta_dias_atras = date.today() - timedelta(days=35)
-    
-    subquery_ctm_presentes = db.session.query(Presenca.membro_id)\
-        .join(AulaRealizada)\
-        .filter(AulaRealizada.data >= trinta_dias_atras)\
-        .distinct()
-
-    query_membros_indicadores = db.session.query(
-        Membro.status_treinamento_pg,
-        Membro.batizado_aclamado,
-        Membro.data_recepcao,
-        Membro.status,
-        Membro.id.in_(subquery_ctm_presentes).label('presente_ctm_30d')
-    ).filter(Membro.id.in_(membro_ids_do_setor)).all()
-
-    metricas_setor['num_facilitadores_treinamento_atuais_agregado'] = 0
-    metricas_setor['num_anfitrioes_treinamento_atuais_agregado'] = 0
-    metricas_setor['num_ctm_participantes_atuais_agregado'] = 0
-    metricas_setor['num_batizados_aclamados_atuais_agregado'] = 0
-    
-    for membro_indicador in query_membros_indicadores:
-        if membro_indicador.status_treinamento_pg == 'Facilitador em Treinamento':
-            metricas_setor['num_facilitadores_treinamento_atuais_agregado'] += 1
-        if membro_indicador.status_treinamento_pg == 'Anfitrião em Treinamento':
-            metricas_setor['num_anfitrioes_treinamento_atuais_agregado'] += 1
-        if membro_indicador.presente_ctm_30d:
-            metricas_setor['num_ctm_participantes_atuais_agregado'] += 1
-        
-        if membro_indicador.data_recepcao and data_inicio_meta <= membro_indicador.data_recepcao <= data_fim_meta:
-            if membro_indicador.status == 'Não-Membro' and membro_indicador.batizado_aclamado:
-                metricas_setor['num_batizados_aclamados_atuais_agregado'] += 1
-            elif membro_indicador.status != 'Não-Membro':
-                metricas_setor['num_batizados_aclamados_atuais_agregado'] += 1
-
-    eventos_encontro_ids = db.session.query(Evento.id).filter(
-        Evento.tipo_evento == 'Encontro com Deus',
-        Evento.concluido == True,
-        Evento.data_evento.between(data_inicio_meta, data_fim_meta)
-    ).all()
-    
-    if eventos_encontro_ids:
-        metricas_setor['num_encontro_deus_participantes_atuais_agregado'] = db.session.query(participantes_evento)\
-            .filter(participantes_evento.c.evento_id.in_([e_id[0] for e_id in eventos_encontro_ids]),
-                    participantes_evento.c.membro_id.in_(membro_ids_do_setor))\
-            .count()
-    else:
-        metricas_setor['num_encontro_deus_participantes_atuais_agregado'] = 0
-
-    metricas_setor['num_multiplicacoes_pg_atuais_agregado'] = pgs_multiplicados_count = PequenoGrupo.query\
-        .filter(PequenoGrupo.setor_id == setor_id,
-                PequenoGrupo.data_multiplicacao.isnot(None),
-                PequenoGrupo.data_multiplicacao.between(data_inicio_meta, data_fim_meta))\
-        .count()
-
-    trinta_dias_atras_contrib = datetime.now() - timedelta(days=35)
-    
-    membros_do_setor = Membro.query.filter(Membro.id.in_(membro_ids_do_setor)).all()
-    
-    ids_dizimistas_30d_setor = {r[0] for r in db.session.query(Contribuicao.membro_id.distinct())\
-        .filter(Contribuicao.membro_id.in_(membro_ids_do_setor),
-                Contribuicao.tipo == 'Dízimo',
-                Contribuicao.data_lanc >= trinta_dias_atras_contrib)\
-        .all()}
-
-    ids_ctm_frequentes_setor = {r[0] for r in db.session.query(Presenca.membro_id.distinct())\
-        .join(AulaRealizada)\
-        .filter(Presenca.membro_id.in_(membro_ids_do_setor),
-                AulaRealizada.data >= trinta_dias_atras)\
-        .all()}
+    valores_setor = obter_indicadores(ESCOPO_SETOR, [setor.id])[setor.id]
+    metricas_setor = montar_metricas(valores_setor, setor.area.meta_vigente, num_pgs_ativos, sufixo='_agregado')
+    num_participantes_totais = valores_setor['membros']
 
     lista_dizimistas = []
     lista_nao_dizimistas = []
     lista_ctm_frequentes = []
     lista_nao_ctm_frequentes = []
-    
-    for membro in membros_do_setor:
-        if membro.id in ids_dizimistas_30d_setor:
+
+    for membro, flags in membros_com_indicadores(ESCOPO_SETOR, setor.id, ['dizimistas_30d', 'ctm_participantes']):
+        if flags['dizimistas_30d']:
             lista_dizimistas.append(membro)
         else:
             lista_nao_dizimistas.append(membro)
-            
-        if membro.id in ids_ctm_frequentes_setor:
+
+        if flags['ctm_participantes']:
             lista_ctm_frequentes.append(membro)
         else:
             lista_nao_ctm_frequentes.append(membro)
 
-    lista_dizimistas.sort(key=lambda m: m.nome_completo)
-    lista_nao_dizimistas.sort(key=lambda m: m.nome_completo)
-    lista_ctm_frequentes.sort(key=lambda m: m.nome_completo)
-    lista_nao_ctm_frequentes.sort(key=lambda m: m.nome_completo)
-
     distribuicao_dizimistas_30d = {
         'dizimistas': len(lista_dizimistas),
         'nao_dizimistas': len(lista_nao_dizimistas)
@@ -757,31 +532,19 @@ def detalhes_setor(setor_id):
                            distribuicao_frequencia_ctm=distribuicao_frequencia_ctm,
                            config=Config, ano=ano, versao=versao)
 
+@grupos_bp.route('/setores/<int:setor_id>/tendencia')
+@login_required
+@group_permission_required(Setor, 'view', 'supervisores')
+def tendencia_setor(setor_id):
+    setor = Setor.query.get_or_404(setor_id)
+    return _resposta_tendencia(ESCOPO_SETOR, setor.id, setor.area)
+
 @grupos_bp.route('/setores/<int:setor_id>/multiplicar_pgs', methods=['GET'])
 @login_required
 @group_permission_required(Setor, 'edit', 'supervisores')
 def tela_multiplicacao_pgs(setor_id):
     setor = Setor.query.get_or_404(setor_id)
-    pgs_do_setor = setor.pequenos_grupos.all()
-
-    for pg in pgs_do_setor:
-        pg.num_facilitadores_treinamento_atuais = 0
-        pg.num_anfitrioes_treinamento_atuais = 0
-        
-        # Usamos a propriedade 'membros_para_indicadores' do model (app/grupos/models.py)
-        # para incluir participantes e o anfitrião na contagem.
-        for membro in pg.membros_para_indicadores:
-            if membro.status_treinamento_pg == 'Facilitador em Treinamento':
-                pg.num_facilitadores_treinamento_atuais += 1
-            if membro.status_treinamento_pg == 'Anfitrião em Treinamento':
-                pg.num_anfitrioes_treinamento_atuais += 1
-        
-        # O template também usa 'pronto_para_multiplicar' para habilitar o botão
-        pg.pronto_para_multiplicar = (
-            pg.num_facilitadores_treinamento_atuais > 0 and
-            pg.num_anfitrioes_treinamento_atuais > 0 and
-            pg.autorizacao_multiplicacao
-        )
+    pgs_do_setor = prontidao_multiplicacao(setor_id=setor.id)
 
     form_multiplicacao = MultiplicacaoForm()
 
@@ -821,6 +584,53 @@ def tela_multiplicacao_pgs(setor_id):
                            ano=ano,
                            versao=versao)
 
+@grupos_bp.route('/setores/<int:setor_id>/prontidao_multiplicacao')
+@login_required
+@group_permission_required(Setor, 'view', 'supervisores')
+def prontidao_multiplicacao_setor(setor_id):
+    setor = Setor.query.get_or_404(setor_id)
+    return jsonify(pgs=[pg.to_dict() for pg in prontidao_multiplicacao(setor_id=setor.id)])
+
+@grupos_bp.route('/areas/<int:area_id>/prontidao_multiplicacao')
+@login_required
+@group_permission_required(Area, 'view', 'supervisores')
+def prontidao_multiplicacao_area(area_id):
+    area = Area.query.get_or_404(area_id)
+    return jsonify(pgs=[pg.to_dict() for pg in prontidao_multiplicacao(area_id=area.id)])
+
+def _aniversariantes_do_grupo(escopo, grupo_id):
+    dias = max(0, min(request.args.get('dias', DIAS_ANIVERSARIANTES, type=int), MAX_DIAS_ANIVERSARIANTES))
+    membros = aniversariantes(dias, escopo=escopo, escopo_ids=[grupo_id]).all()
+    return jsonify(dias=dias, aniversariantes=aniversariantes_json(membros))
+
+@grupos_bp.route('/areas/<int:area_id>/aniversariantes')
+@login_required
+@group_permission_required(Area, 'view', 'supervisores')
+def aniversariantes_area(area_id):
+    area = Area.query.get_or_404(area_id)
+    return _aniversariantes_do_grupo(ESCOPO_AREA, area.id)
+
+@grupos_bp.route('/setores/<int:setor_id>/aniversariantes')
+@login_required
+@group_permission_required(Setor, 'view', 'supervisores')
+def aniversariantes_setor(setor_id):
+    setor = Setor.query.get_or_404(setor_id)
+    return _aniversariantes_do_grupo(ESCOPO_SETOR, setor.id)
+
+@grupos_bp.route('/pgs/<int:pg_id>/aniversariantes')
+@login_required
+@group_permission_required(PequenoGrupo, 'view')
+def aniversariantes_pg(pg_id):
+    pg = PequenoGrupo.query.get_or_404(pg_id)
+    return _aniversariantes_do_grupo(ESCOPO_PG, pg.id)
+
+@grupos_bp.route('/pgs/<int:pg_id>/linhagem')
+@login_required
+@group_permission_required(PequenoGrupo, 'view')
+def linhagem_pg(pg_id):
+    pg = PequenoGrupo.query.get_or_404(pg_id)
+    return jsonify(linhagem(pg.id))
+
 @grupos_bp.route('/pgs/<int:pg_id>/autorizar_multiplicacao', methods=['POST'])
 @login_required
 @group_permission_required(PequenoGrupo, 'supervisores')
@@ -888,7 +698,8 @@ def processar_multiplicacao(pg_id):
             setor_id=form.pg1.setor.data,
             dia_reuniao=form.pg1.dia_reuniao.data,
             horario_reuniao=form.pg1.horario_reuniao.data,
-            autorizacao_multiplicacao=False
+            autorizacao_multiplicacao=False,
+            pg_origem_id=pg_antigo.id
         )
         novo_pg2 = PequenoGrupo(
             nome=form.pg2.nome.data,
@@ -897,52 +708,49 @@ def processar_multiplicacao(pg_id):
             setor_id=form.pg2.setor.data,
             dia_reuniao=form.pg2.dia_reuniao.data,
             horario_reuniao=form.pg2.horario_reuniao.data,
-            autorizacao_multiplicacao=False
+            autorizacao_multiplicacao=False,
+            pg_origem_id=pg_antigo.id
         )
 
-        db.session.add_all([novo_pg1, novo_pg2])
-        db.session.add(pg_antigo)
-
-        for membro in pg_antigo.participantes.all():
-            membro.pg_id = None
-            db.session.add(membro)
-        
         try:
-            db.session.commit()
-            
-            registrar_evento_jornada(
-                tipo_acao='PG_MULTIPLICADO',
-                descricao_detalhada=f'PG {nome_antigo_original} foi multiplicado, originando os PGs "{novo_pg1.nome}" e "{novo_pg2.nome}".',
-                usuario_executor=current_user,
-                pgs=[pg_antigo]
-            )
-            
-            registrar_evento_jornada(
-                tipo_acao='PG_MULTIPLICADO',
-                descricao_detalhada=f'Nasceu da multiplicação do PG "{pg_antigo.nome}".',
-                usuario_executor=current_user,
-                pgs=[novo_pg1, novo_pg2]
+            db.session.add_all([novo_pg1, novo_pg2])
+            db.session.execute(
+                update(Membro).where(Membro.pg_id == pg_antigo.id).values(pg_id=None)
             )
-                        
-            registrar_evento_jornada(
-                tipo_acao='PG_MULTIPLICADO',
-                descricao_detalhada=f'O PG "{pg_antigo.nome}" foi multiplicado, gerando os novos PGs: "{novo_pg1.nome}" e "{novo_pg2.nome}".',
-                usuario_executor=current_user,
-                setores=[pg_antigo.setor]
-            )
-            
+            marcar_escopo(db.session, ESCOPO_PG, pg_antigo.id)
+            db.session.flush()
+
+            registrar_eventos_jornada([
+                {
+                    'tipo_acao': 'PG_MULTIPLICADO',
+                    'descricao_detalhada': f'PG {nome_antigo_original} foi multiplicado, originando os PGs "{novo_pg1.nome}" e "{novo_pg2.nome}".',
+                    'pgs': [pg_antigo],
+                },
+                {
+                    'tipo_acao': 'PG_MULTIPLICADO',
+                    'descricao_detalhada': f'Nasceu da multiplicação do PG "{pg_antigo.nome}".',
+                    'pgs': [novo_pg1, novo_pg2],
+                },
+                {
+                    'tipo_acao': 'PG_MULTIPLICADO',
+                    'descricao_detalhada': f'O PG "{pg_antigo.nome}" foi multiplicado, gerando os novos PGs: "{novo_pg1.nome}" e "{novo_pg2.nome}".',
+                    'setores': [pg_antigo.setor],
+                },
+            ], usuario_executor=current_user, commit=False)
+
+            db.session.commit()
             flash(f'PG {pg_antigo.nome} multiplicado com sucesso! Os novos PGs foram criados e os membros devem ser adicionados manualmente.', 'success')
             return redirect(url_for('grupos.detalhes_setor', setor_id=pg_antigo.setor_id))
         except Exception as e:
-                    db.session.rollback()
-                    flash(f'Erro ao processar a multiplicação: {e}', 'danger')
-                    return redirect(url_for('grupos.tela_multiplicacao_pgs', setor_id=setor.id))
+            db.session.rollback()
+            flash(f'Erro ao processar a multiplicação: {e}', 'danger')
+            return redirect(url_for('grupos.tela_multiplicacao_pgs', setor_id=setor.id))
 
     for field, errors in form.errors.items():
         for error in errors:
             flash(f"Erro no campo {field}: {error}", 'danger')
 
-    pgs_do_setor = setor.pequenos_grupos.all()
+    pgs_do_setor = prontidao_multiplicacao(setor_id=setor.id)
     hoje = date.today().strftime('%Y-%m-%d')
     return render_template('grupos/setores/multiplicar_pg.html',
                         setor=setor,
@@ -1016,7 +824,7 @@ def multiplicar_pgs_setor(setor_id):
     setor = Setor.query.get_or_404(setor_id)
     
     if request.method == 'GET':
-        pgs_do_setor = setor.pequenos_grupos.all()
+        pgs_do_setor = prontidao_multiplicacao(setor_id=setor.id)
         return render_template('grupos/setores/multiplicar_pg.html', setor=setor, pgs=pgs_do_setor, ano=ano, versao=versao)
     
     if request.method == 'POST':
@@ -1136,84 +944,9 @@ def detalhes_pg(pg_id):
                                ano=ano, 
                                versao=versao)
     
-    meta_vigente = pg.setor.area.meta_vigente
-    data_inicio_meta = meta_vigente.data_inicio if meta_vigente else date.min
-    data_fim_meta = meta_vigente.data_fim if meta_vigente else date.max
-    
-    membro_ids_pgs_query = db.session.query(Membro.id)\
-                               .filter(Membro.pg_id == pg_id, Membro.ativo == True)
-    
-    membro_ids_pgs = {id[0] for id in membro_ids_pgs_query.all()}
-    
-    if pg.facilitador_id:
-        membro_ids_pgs.add(pg.facilitador_id)
-    if pg.anfitriao_id:
-        membro_ids_pgs.add(pg.anfitriao_id)
-        
-    if not membro_ids_pgs:
-        membro_ids_pgs = []
-
-    metricas_pg = {}
-    
-    if meta_vigente:
-        metricas_pg['meta_facilitadores_treinamento'] = meta_vigente.meta_facilitadores_treinamento_pg
-        metricas_pg['meta_anfitrioes_treinamento'] = meta_vigente.meta_anfitrioes_treinamento_pg
-        metricas_pg['meta_ctm_participantes'] = meta_vigente.meta_ctm_participantes_pg
-        metricas_pg['meta_encontro_deus_participantes'] = meta_vigente.meta_encontro_deus_participantes_pg
-        metricas_pg['meta_batizados_aclamados'] = meta_vigente.meta_batizados_aclamados_pg
-    else:
-        metricas_pg['meta_facilitadores_treinamento'] = 0
-        metricas_pg['meta_anfitrioes_treinamento'] = 0
-        metricas_pg['meta_ctm_participantes'] = 0
-        metricas_pg['meta_encontro_deus_participantes'] = 0
-        metricas_pg['meta_batizados_aclamados'] = 0
-    
-    trinta_dias_atras = date.today() - timedelta(days=35)
-
-    subquery_ctm_presentes = db.session.query(Presenca.membro_id)\
-        .join(AulaRealizada)\
-        .filter(AulaRealizada.data >= trinta_dias_atras)\
-        .distinct()
-
-    query_membros_indicadores = db.session.query(
-        Membro.status_treinamento_pg,
-        Membro.batizado_aclamado,
-        Membro.data_recepcao,
-        Membro.status,
-        Membro.id.in_(subquery_ctm_presentes).label('presente_ctm_30d')
-    ).filter(Membro.id.in_(membro_ids_pgs)).all()
-    
-    metricas_pg['num_facilitadores_treinamento_atuais'] = 0
-    metricas_pg['num_anfitrioes_treinamento_atuais'] = 0
-    metricas_pg['num_ctm_participantes_atuais'] = 0
-    metricas_pg['num_batizados_aclamados_atuais'] = 0
-
-    for membro_indicador in query_membros_indicadores:
-        if membro_indicador.status_treinamento_pg == 'Facilitador em Treinamento':
-            metricas_pg['num_facilitadores_treinamento_atuais'] += 1
-        if membro_indicador.status_treinamento_pg == 'Anfitrião em Treinamento':
-            metricas_pg['num_anfitrioes_treinamento_atuais'] += 1
-        if membro_indicador.presente_ctm_30d:
-            metricas_pg['num_ctm_participantes_atuais'] += 1
-        
-        if membro_indicador.data_recepcao and data_inicio_meta <= membro_indicador.data_recepcao <= data_fim_meta:
-            if (membro_indicador.status == 'Não-Membro' and membro_indicador.batizado_aclamado) or \
-               (membro_indicador.status != 'Não-Membro'):
-                metricas_pg['num_batizados_aclamados_atuais'] += 1
-
-    eventos_encontro_ids = db.session.query(Evento.id).filter(
-        Evento.tipo_evento == 'Encontro com Deus',
-        Evento.concluido == True,
-        Evento.data_evento.between(data_inicio_meta, data_fim_meta)
-    ).all()
-    
-    if eventos_encontro_ids:
-        metricas_pg['num_encontro_deus_participantes_atuais'] = db.session.query(participantes_evento)\
-            .filter(participantes_evento.c.evento_id.in_([e_id[0] for e_id in eventos_encontro_ids]),
-                    participantes_evento.c.membro_id.in_(membro_ids_pgs))\
-            .count()
-    else:
-        metricas_pg['num_encontro_deus_participantes_atuais'] = 0
+    valores_pg = obter_indicadores(ESCOPO_PG, [pg.id])[pg.id]
+    metricas_pg = montar_metricas(valores_pg, pg.setor.area.meta_vigente, 1)
+    membro_ids_pgs = select(membros_do_escopo(ESCOPO_PG, [pg.id]).subquery().c.membro_id)
 
     ctm_dados_alunos = db.session.query(
         Membro,
@@ -1268,6 +1001,13 @@ def detalhes_pg(pg_id):
                            jornada_eventos=jornada_eventos,
                            config=Config, ano=ano, versao=versao)
 
+@grupos_bp.route('/pgs/<int:pg_id>/tendencia')
+@login_required
+@group_permission_required(PequenoGrupo, 'view')
+def tendencia_pg(pg_id):
+    pg = PequenoGrupo.query.get_or_404(pg_id)
+    return _resposta_tendencia(ESCOPO_PG, pg.id, pg.setor.area)
+
 @grupos_bp.route('/pgs/editar/<int:pg_id>', methods=['GET', 'POST'])
 @login_required
 @group_permission_required(PequenoGrupo, 'edit')
@@ -1435,17 +1175,7 @@ def adicionar_participante(pg_id):
 @login_required
 def buscar_membros_pgs():
     term = request.args.get('term', '')
-    busca_normalizada = unidecode(term).lower()
-    busca_db = f'%{busca_normalizada}%'
-    
-    membros = Membro.query.filter(
-        or_(
-            func.lower(func.unidecode(Membro.nome_completo)).like(busca_db),
-        ),
-        Membro.ativo == True,
-        Membro.pg_id == None,
-        Membro.id != current_user.membro.id
-    ).order_by(Membro.nome_completo).limit(20).all()
+    membros = buscar_membros(term, limite=20, sem_pg=True, excluir_ids=[current_user.membro_id])
     
     results = []
     for membro in membros:
@@ -1645,15 +1375,7 @@ def admin_gerenciar_metas_da_area(area_id):
 @login_required
 def buscar_membros_ativos():
     search_term = request.args.get('q', '')
-    busca_normalizada = unidecode(search_term).lower()
-    busca_db = f'%{busca_normalizada}%'
-    
-    query = Membro.query.filter(
-        func.lower(func.unidecode(Membro.nome_completo)).like(busca_db),
-        Membro.ativo == True
-    )
-    
-    membros = query.order_by(Membro.nome_completo).limit(20).all()
+    membros = buscar_membros(search_term, limite=20)
     
     results = []
     for membro in membros:
@@ -1665,30 +1387,11 @@ def buscar_membros_ativos():
 @login_required
 @admin_required
 def cleanup_old_members():
-    # 1. Identificar PGs inativos (multiplicados ou simplesmente fechados)
-    pgs_inativos = PequenoGrupo.query.filter_by(ativo=False).all()
-    pgs_inativos_ids = [pg.id for pg in pgs_inativos]
-
-    membros_presos = []
-    if pgs_inativos_ids:
-        # 2. Encontrar membros vinculados a esses PGs
-        membros_presos = Membro.query.filter(Membro.pg_id.in_(pgs_inativos_ids)).all()
-    
     if request.method == 'POST':
-        # Processar a limpeza
-        membros_liberados_count = 0
-        for membro in membros_presos:
-            membro.pg_id = None
-            # Opcional: Reseta os indicadores para o padrão de participante (como feito na multiplicação/fechamento)
-            membro.status_treinamento_pg = 'Participante' 
-            membro.participou_ctm = False
-            membro.participou_encontro_deus = False
-            membro.batizado_aclamado = False
-            db.session.add(membro)
-            membros_liberados_count += 1
-        
         try:
+            relatorio = limpar_membros_presos(db.session, usuario_executor=current_user)
             db.session.commit()
+            membros_liberados_count = sum(num_membros for _, _, num_membros in relatorio)
             flash(f'Sucesso! {membros_liberados_count} membros foram desvinculados de PGs inativos e agora estão disponíveis.', 'success')
             return redirect(url_for('grupos.listar_grupos_unificada', tipo='pgs', status_pg='inativos'))
         except Exception as e:
@@ -1696,24 +1399,18 @@ def cleanup_old_members():
             flash(f'Erro ao processar a limpeza: {e}', 'danger')
             return redirect(url_for('grupos.cleanup_old_members'))
 
-    # Para requisição GET: prepara os dados para exibição
-    
-    # Mapear IDs de PGs inativos para seus nomes para exibir na lista
-    pgs_afetados_nomes = {pg.id: pg.nome for pg in pgs_inativos}
-    
-    membros_info = []
-    for membro in membros_presos:
-        pg_nome = pgs_afetados_nomes.get(membro.pg_id, 'PG Inativo Desconhecido')
-        membros_info.append({
-            'id': membro.id,
-            'nome': membro.nome_completo,
-            'pg_antigo': pg_nome
-        })
+    # Para requisição GET: apenas o relatório de impacto (dry-run)
+    relatorio = limpar_membros_presos(db.session, dry_run=True)
+    membros_info = [
+        {'id': membro_id, 'nome': nome, 'pg_antigo': pg_nome}
+        for membro_id, nome, pg_nome in membros_presos(db.session)
+    ]
 
     return render_template(
         'grupos/pgs/cleanup.html', 
         membros_info=membros_info,
-        num_membros_presos=len(membros_presos),
+        relatorio=relatorio,
+        num_membros_presos=sum(num_membros for _, _, num_membros in relatorio),
         ano=ano,
         versao=versao,
         title="Limpeza de Membros Presos a PGs Inativos"
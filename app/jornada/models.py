@@ -1,6 +1,6 @@
 from app.extensions import db
 from datetime import datetime, timezone
-from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey
+from sqlalchemy import Column, Integer, String, Text, DateTime, ForeignKey, insert
 from sqlalchemy.orm import relationship
 from config import Config
 
@@ -49,33 +49,64 @@ class JornadaEvento(db.Model):
     def __repr__(self):
         return f'<JornadaEvento {self.data_evento.strftime("%Y-%m-%d %H:%M")}: {self.tipo_acao}>'
 
-def registrar_evento_jornada(tipo_acao, descricao_detalhada, usuario_executor, membros=None, pgs=None, setores=None, areas=None, turmas_ctm=None):
-    try:
-        evento = JornadaEvento(
-            tipo_acao=tipo_acao,
-            descricao_detalhada=descricao_detalhada,
-            usuario_executor_id=usuario_executor.id if usuario_executor else None
-        )
-        db.session.add(evento)
-        db.session.flush()
-
-        if membros:
-            for m in membros:
-                evento.membros_afetados.append(m)
-        if pgs:
-            for p in pgs:
-                evento.pgs_afetados.append(p)
-        if setores:
-            for s in setores:
-                evento.setores_afetados.append(s)
-        if areas:
-            for a in areas:
-                evento.areas_afetadas.append(a)
-        if turmas_ctm:
-            for t in turmas_ctm:
-                evento.turmas_ctm_afetadas.append(t)
+# Tabela de associação e coluna correspondente para cada tipo de alvo de um evento de jornada.
+ASSOCIACOES_JORNADA = {
+    'membros': (jornada_membro_associacao, 'membro_id'),
+    'pgs': (jornada_pg_associacao, 'pequeno_grupo_id'),
+    'setores': (jornada_setor_associacao, 'setor_id'),
+    'areas': (jornada_area_associacao, 'area_id'),
+    'turmas_ctm': (jornada_turma_ctm_associacao, 'turma_ctm_id'),
+}
+
+def registrar_eventos_jornada(eventos, usuario_executor, commit=True):
+    """
+    Registra vários eventos de jornada com um INSERT em lote para os eventos e um por tabela de associação.
+
+    Args:
+        eventos: lista de dicts com 'tipo_acao', 'descricao_detalhada' e, opcionalmente,
+                 'membros', 'pgs', 'setores', 'areas', 'turmas_ctm' (objetos já com id, ou os próprios ids).
+        commit: se False, apenas escreve na transação corrente e deixa o commit (e o rollback) para quem chamou.
+    """
+    if not eventos:
+        return []
+
+    usuario_executor_id = usuario_executor.id if usuario_executor else None
+    data_evento = datetime.now(timezone.utc)
+    resultado = db.session.execute(
+        insert(JornadaEvento).returning(JornadaEvento.id, sort_by_parameter_order=True),
+        [{
+            'tipo_acao': evento['tipo_acao'],
+            'descricao_detalhada': evento['descricao_detalhada'],
+            'usuario_executor_id': usuario_executor_id,
+            'data_evento': data_evento,
+        } for evento in eventos]
+    )
+    evento_ids = list(resultado.scalars())
 
+    for chave, (tabela, coluna) in ASSOCIACOES_JORNADA.items():
+        linhas = []
+        for evento_id, evento in zip(evento_ids, eventos):
+            alvo_ids = {alvo if isinstance(alvo, int) else alvo.id for alvo in evento.get(chave) or ()}
+            linhas.extend({'jornada_id': evento_id, coluna: alvo_id} for alvo_id in alvo_ids)
+        if linhas:
+            db.session.execute(insert(tabela), linhas)
+
+    if commit:
         db.session.commit()
+    return evento_ids
+
+def registrar_evento_jornada(tipo_acao, descricao_detalhada, usuario_executor, membros=None, pgs=None, setores=None, areas=None, turmas_ctm=None, commit=True):
+    evento = {
+        'tipo_acao': tipo_acao,
+        'descricao_detalhada': descricao_detalhada,
+        'membros': membros, 'pgs': pgs, 'setores': setores, 'areas': areas, 'turmas_ctm': turmas_ctm,
+    }
+    if not commit:
+        registrar_eventos_jornada([evento], usuario_executor, commit=False)
+        return
+
+    try:
+        registrar_eventos_jornada([evento], usuario_executor)
         print(f"DEBUG: Evento de jornada registrado: '{tipo_acao}'")
     except Exception as e:
         db.session.rollback()
@@ -0,0 +1,73 @@
+import click
+from flask.cli import with_appcontext
+from app.extensions import db
+from .duplicidades import detectar_duplicidades, atualizar_fila_duplicidades
+from .importacao import importar_membros
+import time
+
+# ====================================================================
+# GRUPO DE COMANDOS CLI PARA O MÓDULO DE MEMBRESIA
+# ====================================================================
+
+@click.group()
+def membresia():
+    """Comandos de manutenção do cadastro de membros."""
+    pass
+
+@membresia.command('detectar-duplicados')
+@click.option('--dry-run', is_flag=True, help='Apenas lista os pares suspeitos, sem gravar na fila de revisão.')
+@with_appcontext
+def detectar_duplicados_cmd(dry_run):
+    """
+    Procura cadastros de membros provavelmente duplicados (nome semelhante, mesma data de nascimento
+    e campus) e atualiza a fila de revisão da tela de unificação. Pode ser agendado (ex.: cron).
+
+    Uso: flask membresia detectar-duplicados [--dry-run]
+    """
+    try:
+        if dry_run:
+            suspeitas = detectar_duplicidades(db.session)
+            for (membro_a_id, membro_b_id), (pontuacao, motivos) in sorted(suspeitas.items(), key=lambda item: -item[1][0]):
+                click.echo(f'  {membro_a_id} x {membro_b_id}: {pontuacao:.0%} ({motivos})')
+            click.echo(f'ℹ️ Dry-run: {len(suspeitas)} pares suspeitos encontrados.')
+            return
+
+        novas, removidas, pendentes = atualizar_fila_duplicidades(db.session)
+        db.session.commit()
+        click.echo(f'✅ {novas} nova(s) suspeita(s), {removidas} removida(s); {pendentes} pendente(s) de revisão.')
+    except Exception as e:
+        db.session.rollback()
+        click.echo(f'❌ Erro ao detectar duplicidades: {e}')
+
+@membresia.command('importar')
+@click.argument('arquivo', type=click.Path(exists=True, dir_okay=False))
+@click.option('--dry-run', is_flag=True, help='Apenas valida a planilha e mostra o que seria importado, sem gravar.')
+@with_appcontext
+def importar_cmd(arquivo, dry_run):
+    """
+    Importa membros de uma planilha XLSX ou CSV com as colunas nome_completo, data_nascimento,
+    data_recepcao, tipo_recepcao, campus e (opcional) obs_recepcao. Linhas de membros já
+    cadastrados (mesmo nome e data de nascimento) são ignoradas.
+
+    Uso: flask membresia importar roster.xlsx [--dry-run]
+    """
+    inicio = time.perf_counter()
+    try:
+        with open(arquivo, 'rb') as planilha:
+            resultado = importar_membros(planilha, arquivo, dry_run=dry_run)
+    except ValueError as e:
+        click.echo(f'❌ {e}')
+        return
+
+    for numero, nome, membro_id in resultado.existentes:
+        click.echo(f'  Linha {numero}: {nome} já cadastrado(a) (ID {membro_id}).')
+    for numero, mensagem in resultado.erros:
+        click.echo(f'  Linha {numero}: {mensagem}', err=True)
+
+    duracao = time.perf_counter() - inicio
+    if dry_run:
+        click.echo(f'ℹ️ Dry-run: {resultado.lidas} linha(s) lida(s); {resultado.importadas} seriam importada(s), '
+                   f'{len(resultado.existentes)} já cadastrada(s), {len(resultado.erros)} com erro ({duracao:.1f}s).')
+    else:
+        click.echo(f'✅ {resultado.importadas} membro(s) importado(s) de {resultado.lidas} linha(s); '
+                   f'{len(resultado.existentes)} já cadastrado(s), {len(resultado.erros)} com erro ({duracao:.1f}s).')
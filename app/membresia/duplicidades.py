@@ -0,0 +1,184 @@
+from app.extensions import db
+from app.membresia.models import Membro, SuspeitaDuplicidade
+from app.busca import normalizar
+from config import Config
+from sqlalchemy import select, delete, insert, update, func, or_
+from difflib import SequenceMatcher
+from itertools import combinations
+from datetime import datetime
+
+STATUS_PENDENTE = 'Pendente'
+STATUS_DESCARTADA = 'Descartada'
+
+# Similaridade mínima dos nomes e pontuação mínima do par para entrar na fila.
+LIMIAR_NOME = 0.8
+LIMIAR_PONTUACAO = 0.75
+# Blocos maiores que isto (chaves muito comuns) não são comparados par a par.
+TAMANHO_MAXIMO_BLOCO = 200
+# Partículas ignoradas ao comparar as palavras dos nomes.
+PARTICULAS = frozenset({'de', 'da', 'do', 'das', 'dos', 'e'})
+
+
+class CadastroComparavel:
+    """Dados de um membro usados na comparação (nome já normalizado e sem partículas)."""
+    __slots__ = ('id', 'nome', 'palavras', 'data_nascimento', 'campus')
+
+    def __init__(self, id, nome_completo, data_nascimento, campus):
+        self.id = id
+        self.palavras = [p for p in normalizar(nome_completo).split() if p not in PARTICULAS]
+        self.nome = ' '.join(self.palavras)
+        self.data_nascimento = data_nascimento
+        self.campus = campus
+
+
+def chaves_bloqueio(cadastro):
+    """
+    Chaves de bloqueio do cadastro: só são comparados cadastros que compartilham alguma chave,
+    o que mantém a varredura próxima de linear. Cobre erros de digitação no sobrenome
+    (primeiro nome + ano), no primeiro nome (sobrenome + ano) e cadastros sem data (primeiro + último nome).
+    """
+    if not cadastro.palavras:
+        return []
+    primeiro, ultimo = cadastro.palavras[0], cadastro.palavras[-1]
+    chaves = [('nomes', primeiro, ultimo)]
+    if cadastro.data_nascimento:
+        ano = cadastro.data_nascimento.year
+        chaves.append(('sobrenome', ultimo, ano))
+        chaves.append(('primeiro', primeiro, ano))
+        chaves.append(('data', cadastro.data_nascimento, primeiro[0]))
+    return chaves
+
+
+def similaridade_nomes(a, b, minimo=0.0):
+    """
+    Similaridade (0 a 1) entre dois nomes, tolerante a erros de digitação, ordem e nomes do meio omitidos.
+    Abaixo de `minimo` o valor exato não importa e o cálculo é abreviado.
+    """
+    menor, maior = sorted((set(a.palavras), set(b.palavras)), key=len)
+    if len(menor) >= 2 and menor <= maior:
+        similaridade = 0.9
+        if similaridade >= minimo:
+            return max(similaridade, SequenceMatcher(None, a.nome, b.nome).ratio())
+    else:
+        similaridade = 0.0
+
+    for nome_a, nome_b in ((a.nome, b.nome), (' '.join(sorted(a.palavras)), ' '.join(sorted(b.palavras)))):
+        comparador = SequenceMatcher(None, nome_a, nome_b)
+        # quick_ratio é um limite superior barato de ratio
+        if comparador.real_quick_ratio() >= minimo and comparador.quick_ratio() >= minimo:
+            similaridade = max(similaridade, comparador.ratio())
+    return similaridade
+
+
+def comparar(a, b):
+    """Pontuação (0 a 1) e motivos de o par ser a mesma pessoa, ou None se não for suspeito."""
+    bonus = 0.0
+    motivos = []
+    if a.data_nascimento and b.data_nascimento:
+        if a.data_nascimento == b.data_nascimento:
+            bonus += 0.2
+            motivos.append('mesma data de nascimento')
+        else:
+            bonus -= 0.3
+    if a.campus and a.campus == b.campus:
+        bonus += 0.1
+        motivos.append('mesmo campus')
+
+    # Similaridade mínima do nome para o par atingir LIMIAR_PONTUACAO (nome vale até 0,7)
+    minimo = max(LIMIAR_NOME, (LIMIAR_PONTUACAO - bonus) / 0.7)
+    if minimo > 1:
+        return None
+    similaridade = similaridade_nomes(a, b, minimo)
+    if similaridade < minimo:
+        return None
+
+    pontuacao = similaridade * 0.7 + bonus
+    motivos.insert(0, f'nome semelhante ({similaridade:.0%})')
+    return round(min(pontuacao, 1.0), 3), ', '.join(motivos)
+
+
+def detectar_duplicidades(sessao=None):
+    """
+    Varre todos os membros em busca de prováveis duplicidades.
+
+    Returns:
+        Dict {(membro_a_id, membro_b_id): (pontuacao, motivos)} com membro_a_id < membro_b_id.
+    """
+    sessao = sessao or db.session
+    linhas = sessao.execute(
+        select(Membro.id, Membro.nome_completo, Membro.data_nascimento, Membro.campus)
+        .where(Membro.id != Config.ID_OFERTA_ANONIMA)
+    )
+
+    blocos = {}
+    for linha in linhas:
+        cadastro = CadastroComparavel(*linha)
+        for chave in chaves_bloqueio(cadastro):
+            blocos.setdefault(chave, []).append(cadastro)
+
+    suspeitas = {}
+    comparados = set()
+    for bloco in blocos.values():
+        if len(bloco) < 2 or len(bloco) > TAMANHO_MAXIMO_BLOCO:
+            continue
+        for a, b in combinations(bloco, 2):
+            par = (a.id, b.id) if a.id < b.id else (b.id, a.id)
+            if par in comparados:
+                continue
+            comparados.add(par)
+            resultado = comparar(a, b)
+            if resultado:
+                suspeitas[par] = resultado
+    return suspeitas
+
+
+def atualizar_fila_duplicidades(sessao=None):
+    """
+    Atualiza a fila de revisão com uma nova varredura: inclui os pares novos, atualiza a pontuação
+    dos pendentes e remove os pendentes que deixaram de ser suspeitos. Pares descartados
+    por um revisor não voltam para a fila. Não faz commit.
+
+    Returns:
+        Tupla (novas, removidas, pendentes).
+    """
+    sessao = sessao or db.session
+    suspeitas = detectar_duplicidades(sessao)
+
+    existentes = {
+        (a_id, b_id): (id, status)
+        for id, a_id, b_id, status in sessao.execute(select(
+            SuspeitaDuplicidade.id, SuspeitaDuplicidade.membro_a_id, SuspeitaDuplicidade.membro_b_id, SuspeitaDuplicidade.status
+        ))
+    }
+
+    novas = [
+        {'membro_a_id': a_id, 'membro_b_id': b_id, 'pontuacao': pontuacao, 'motivos': motivos,
+         'status': STATUS_PENDENTE, 'data_deteccao': datetime.utcnow()}
+        for (a_id, b_id), (pontuacao, motivos) in suspeitas.items() if (a_id, b_id) not in existentes
+    ]
+    if novas:
+        sessao.execute(insert(SuspeitaDuplicidade), novas)
+
+    atualizadas = [
+        {'id': id, 'pontuacao': suspeitas[par][0], 'motivos': suspeitas[par][1]}
+        for par, (id, status) in existentes.items() if status == STATUS_PENDENTE and par in suspeitas
+    ]
+    if atualizadas:
+        sessao.execute(update(SuspeitaDuplicidade), atualizadas)
+
+    obsoletas = [id for par, (id, status) in existentes.items() if status == STATUS_PENDENTE and par not in suspeitas]
+    if obsoletas:
+        sessao.execute(delete(SuspeitaDuplicidade).where(SuspeitaDuplicidade.id.in_(obsoletas)))
+
+    pendentes = sessao.execute(
+        select(func.count(SuspeitaDuplicidade.id)).where(SuspeitaDuplicidade.status == STATUS_PENDENTE)
+    ).scalar()
+    return len(novas), len(obsoletas), pendentes
+
+
+def remover_suspeitas_dos_membros(sessao, membro_ids):
+    """Remove da fila os pares que envolvem os membros informados (ex.: excluídos na unificação)."""
+    sessao.execute(delete(SuspeitaDuplicidade).where(or_(
+        SuspeitaDuplicidade.membro_a_id.in_(membro_ids),
+        SuspeitaDuplicidade.membro_b_id.in_(membro_ids),
+    )))
@@ -1,6 +1,6 @@
 from flask_wtf import FlaskForm
 from flask_wtf.file import FileField, FileAllowed, FileRequired
-from wtforms import StringField, SelectField, SubmitField, DateField, TextAreaField
+from wtforms import StringField, SelectField, SubmitField, DateField, TextAreaField, BooleanField
 from wtforms.validators import DataRequired, Length, Optional, ValidationError
 from config import Config
 from datetime import date
@@ -90,3 +90,11 @@ class EditarMembroForm(FlaskForm):
         membro = Membro.query.filter_by(nome_completo=nome_completo.data).first()
         if membro and (not self.obj or membro.id != self.obj.id):
             raise ValidationError('Já existe um membro com este nome. Por favor, escolha outro.')
+
+class ImportarMembrosForm(FlaskForm):
+    arquivo = FileField('Planilha (XLSX ou CSV)', validators=[
+        FileRequired('Selecione a planilha.'),
+        FileAllowed(['xlsx', 'csv'], 'Apenas planilhas XLSX ou CSV são permitidas!')
+    ])
+    dry_run = BooleanField('Apenas simular (não grava nada)', default=True)
+    submit = SubmitField('Importar')
@@ -0,0 +1,341 @@
+from app.extensions import db
+from flask import current_app, send_from_directory
+from werkzeug.exceptions import NotFound
+from PIL import Image, ImageOps
+from werkzeug.datastructures import FileStorage
+from concurrent.futures import ThreadPoolExecutor
+from threading import Lock
+import hashlib
+import json
+import os
+import uuid
+
+FOTO_PADRAO = 'default.jpg'
+EXTENSOES_PERMITIDAS = {'png', 'jpg', 'jpeg', 'gif'}
+
+# Tamanhos gerados para cada foto (lado máximo em pixels) e formatos de cada tamanho.
+TAMANHOS_FOTO = {
+    'lista': 96,
+    'perfil': 320,
+    'impressao': 800,
+}
+TAMANHO_PADRAO = 'perfil'
+FORMATOS_FOTO = {'webp': 'WEBP', 'jpg': 'JPEG'}
+FORMATO_PADRAO = 'webp'
+QUALIDADE_FOTO = 80
+
+# Os arquivos das fotos nunca mudam de conteúdo (o nome muda a cada upload), então o navegador
+# pode guardá-los por um ano sem revalidar. A foto padrão pode ser trocada e expira em um dia.
+MAX_AGE_FOTO = 365 * 24 * 3600
+MAX_AGE_FOTO_PADRAO = 24 * 3600
+
+# Uploads aguardando processamento ficam aqui até o worker gerar os tamanhos.
+PASTA_PENDENTES = '_pendentes'
+TAMANHO_BLOCO_LEITURA = 1024 * 1024
+
+_executor = None
+_executor_lock = Lock()
+_em_processamento = set()
+
+
+def extensao_permitida(filename):
+    return '.' in filename and filename.rsplit('.', 1)[1].lower() in EXTENSOES_PERMITIDAS
+
+
+def eh_foto_por_conteudo(foto):
+    """Se o valor de Membro.foto_perfil é uma chave de conteúdo ('ab/cd/<sha256>') e não um arquivo antigo."""
+    return bool(foto) and '/' in foto
+
+
+def chave_da_foto(hash_hex):
+    """Chave (caminho relativo sem extensão) da foto com o hash informado, distribuída em subpastas."""
+    return f'{hash_hex[:2]}/{hash_hex[2:4]}/{hash_hex}'
+
+
+def arquivo_variante(chave, tamanho, formato):
+    """Caminho relativo (à pasta de uploads) de um tamanho/formato da foto."""
+    return f'{chave}_{tamanho}.{formato}'
+
+
+def variantes(chave):
+    return [arquivo_variante(chave, tamanho, formato) for tamanho in TAMANHOS_FOTO for formato in FORMATOS_FOTO]
+
+
+def variantes_prontas(pasta, chave):
+    return all(os.path.exists(os.path.join(pasta, arquivo)) for arquivo in variantes(chave))
+
+
+def arquivos_da_foto(pasta, chave):
+    """Todos os arquivos gravados para a chave, inclusive de tamanhos/formatos que não são mais gerados."""
+    diretorio, nome = os.path.split(chave)
+    prefixo = f'{nome}_'
+    try:
+        nomes = os.listdir(os.path.join(pasta, diretorio))
+    except FileNotFoundError:
+        return []
+    return [f'{diretorio}/{n}' for n in nomes if n.startswith(prefixo) and not n.endswith('.tmp')]
+
+
+def assinatura_variantes():
+    """Resumo da configuração atual (tamanhos, formatos e qualidade); muda quando ela é alterada."""
+    tamanhos = ','.join(f'{tamanho}={lado}' for tamanho, lado in sorted(TAMANHOS_FOTO.items()))
+    return f'{tamanhos};{",".join(sorted(FORMATOS_FOTO))};q{QUALIDADE_FOTO}'
+
+
+def versao_variantes():
+    """Versão curta da configuração, incluída na URL das fotos para invalidar o cache quando ela muda."""
+    return hashlib.sha1(assinatura_variantes().encode()).hexdigest()[:8]
+
+
+def hash_arquivo(caminho):
+    hash_conteudo = hashlib.sha256()
+    with open(caminho, 'rb') as arquivo:
+        for bloco in iter(lambda: arquivo.read(TAMANHO_BLOCO_LEITURA), b''):
+            hash_conteudo.update(bloco)
+    return hash_conteudo.hexdigest()
+
+
+def _salvar_atomico(img, caminho, formato):
+    os.makedirs(os.path.dirname(caminho), exist_ok=True)
+    temporario = f'{caminho}.{uuid.uuid4().hex}.tmp'
+    if formato == 'JPEG':
+        img.save(temporario, formato, quality=QUALIDADE_FOTO, optimize=True, progressive=True)
+    else:
+        img.save(temporario, formato, quality=QUALIDADE_FOTO, method=4)
+    os.replace(temporario, caminho)
+
+
+def processar_foto(origem, pasta, chave):
+    """
+    Gera todos os tamanhos/formatos da foto a partir do arquivo original.
+
+    A decodificação de JPEG usa o modo draft (reduz a imagem já na leitura, em escala 1/2, 1/4 ou 1/8,
+    até o maior tamanho necessário), o que evita decodificar fotos de celular em resolução cheia.
+    Os tamanhos são gerados do maior para o menor, cada um reduzido a partir do anterior.
+    """
+    maior_lado = max(TAMANHOS_FOTO.values())
+    with Image.open(origem) as original:
+        if original.format == 'JPEG':
+            original.draft('RGB', (maior_lado, maior_lado))
+        img = ImageOps.exif_transpose(original)
+        if img.mode != 'RGB':
+            img = img.convert('RGB')
+
+        for tamanho, lado in sorted(TAMANHOS_FOTO.items(), key=lambda item: -item[1]):
+            img.thumbnail((lado, lado), Image.Resampling.LANCZOS)
+            for formato, formato_pil in FORMATOS_FOTO.items():
+                _salvar_atomico(img, os.path.join(pasta, arquivo_variante(chave, tamanho, formato)), formato_pil)
+
+
+def melhor_origem(pasta, chave):
+    """
+    Maior variante existente da foto (o original não é guardado), usada para gerar
+    de novo os tamanhos depois de uma mudança de configuração. None se não houver nenhuma.
+    """
+    melhor, melhor_area = None, -1
+    for arquivo in arquivos_da_foto(pasta, chave):
+        caminho = os.path.join(pasta, arquivo)
+        try:
+            with Image.open(caminho) as img:
+                area = img.width * img.height
+        except Exception:
+            continue
+        # Em caso de empate, prefere JPEG (compatível com o modo draft)
+        if area > melhor_area or (area == melhor_area and arquivo.endswith('.jpg')):
+            melhor, melhor_area = caminho, area
+    return melhor
+
+
+def otimizar_foto(pasta, origem, chave=None, forcar=False):
+    """
+    Gera os tamanhos de uma foto já gravada em disco (usado pelo comando optimize-images,
+    em processos separados, sem contexto da aplicação). Sem chave, ela é calculada pelo
+    hash do arquivo de origem. Remove as variantes que não fazem mais parte da configuração.
+
+    Returns:
+        Tupla (chave, processada): processada é False se as variantes já existiam.
+    """
+    if chave is None:
+        chave = chave_da_foto(hash_arquivo(origem))
+    if not forcar and variantes_prontas(pasta, chave):
+        return chave, False
+
+    processar_foto(origem, pasta, chave)
+    atuais = set(variantes(chave))
+    for arquivo in arquivos_da_foto(pasta, chave):
+        if arquivo not in atuais:
+            os.remove(os.path.join(pasta, arquivo))
+    return chave, True
+
+
+class ManifestoOtimizacao:
+    """
+    Registro em JSON do que o optimize-images já fez, para que uma execução interrompida
+    possa ser retomada e as próximas pulem o que já está pronto. Cada entrada guarda o hash
+    (chave) da foto, a assinatura da configuração usada e o status ('ok' ou 'erro').
+    """
+
+    def __init__(self, caminho):
+        self.caminho = caminho
+        self.entradas = {}
+        if os.path.exists(caminho):
+            with open(caminho, encoding='utf-8') as arquivo:
+                self.entradas = json.load(arquivo)
+
+    def concluida(self, nome, assinatura):
+        entrada = self.entradas.get(nome)
+        return bool(entrada) and entrada.get('status') == 'ok' and entrada.get('assinatura') == assinatura
+
+    def registrar(self, nome, **dados):
+        self.entradas[nome] = dados
+
+    def salvar(self):
+        os.makedirs(os.path.dirname(self.caminho) or '.', exist_ok=True)
+        temporario = f'{self.caminho}.tmp'
+        with open(temporario, 'w', encoding='utf-8') as arquivo:
+            json.dump(self.entradas, arquivo, ensure_ascii=False, indent=1, sort_keys=True)
+        os.replace(temporario, self.caminho)
+
+
+def _processar_pendente(caminho_pendente, pasta, chave, logger):
+    try:
+        processar_foto(caminho_pendente, pasta, chave)
+    except Exception as e:
+        logger.error(f'Erro ao processar a foto {chave}: {e}')
+    finally:
+        with _executor_lock:
+            _em_processamento.discard(chave)
+        if os.path.exists(caminho_pendente):
+            os.remove(caminho_pendente)
+
+
+def _obter_executor():
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=current_app.config.get('FOTOS_WORKERS', 2),
+                thread_name_prefix='fotos-perfil'
+            )
+        return _executor
+
+
+def salvar_foto_perfil(file_data):
+    """
+    Recebe o upload da foto de perfil e agenda o processamento em segundo plano.
+
+    O arquivo é copiado em blocos para a pasta de pendentes enquanto o hash SHA-256 do conteúdo
+    é calculado; uploads idênticos resultam na mesma chave e não são processados de novo.
+
+    Args:
+        file_data (FileStorage): O objeto de arquivo da imagem.
+
+    Returns:
+        str: A chave da foto (valor para Membro.foto_perfil), ou None se o arquivo for inválido.
+    """
+    if not isinstance(file_data, FileStorage) or not file_data.filename or not extensao_permitida(file_data.filename):
+        return None
+
+    pasta = current_app.config['UPLOAD_FOLDER']
+    pasta_pendentes = os.path.join(pasta, PASTA_PENDENTES)
+    os.makedirs(pasta_pendentes, exist_ok=True)
+    temporario = os.path.join(pasta_pendentes, f'{uuid.uuid4().hex}.tmp')
+
+    try:
+        hash_conteudo = hashlib.sha256()
+        with open(temporario, 'wb') as destino:
+            for bloco in iter(lambda: file_data.stream.read(TAMANHO_BLOCO_LEITURA), b''):
+                hash_conteudo.update(bloco)
+                destino.write(bloco)
+
+        # Apenas lê o cabeçalho: recusa arquivos que não são imagens sem decodificá-los.
+        with Image.open(temporario) as img:
+            img.verify()
+    except Exception as e:
+        current_app.logger.error(f'Erro ao receber a imagem: {e}')
+        if os.path.exists(temporario):
+            os.remove(temporario)
+        return None
+
+    hash_hex = hash_conteudo.hexdigest()
+    chave = chave_da_foto(hash_hex)
+
+    with _executor_lock:
+        ja_agendada = chave in _em_processamento or variantes_prontas(pasta, chave)
+        if not ja_agendada:
+            _em_processamento.add(chave)
+    if ja_agendada:
+        os.remove(temporario)
+        return chave
+
+    caminho_pendente = os.path.join(pasta_pendentes, hash_hex)
+    os.replace(temporario, caminho_pendente)
+    _obter_executor().submit(_processar_pendente, caminho_pendente, pasta, chave, current_app.logger)
+    return chave
+
+
+def url_foto(foto, tamanho=TAMANHO_PADRAO, formato=FORMATO_PADRAO):
+    """
+    Caminho (relativo a static/uploads/profile_pics) da foto no tamanho pedido.
+    Fotos antigas (um único arquivo) são devolvidas como estão; enquanto os tamanhos
+    de uma foto nova ainda estão sendo gerados, devolve a foto padrão.
+    """
+    if not foto:
+        return FOTO_PADRAO
+    if not eh_foto_por_conteudo(foto):
+        return foto
+    if tamanho not in TAMANHOS_FOTO:
+        tamanho = TAMANHO_PADRAO
+    if formato not in FORMATOS_FOTO:
+        formato = FORMATO_PADRAO
+    arquivo = arquivo_variante(foto, tamanho, formato)
+    if not os.path.exists(os.path.join(current_app.config['UPLOAD_FOLDER'], arquivo)):
+        return FOTO_PADRAO
+    return arquivo
+
+
+def descartar_foto(foto, membro_id=None):
+    """
+    Apaga os arquivos de uma foto que deixou de ser usada. Fotos por conteúdo só são apagadas
+    se nenhum outro membro usa a mesma chave (uploads idênticos compartilham os arquivos).
+    """
+    from app.membresia.models import Membro
+
+    if not foto or foto == FOTO_PADRAO:
+        return
+    pasta = current_app.config['UPLOAD_FOLDER']
+
+    if not eh_foto_por_conteudo(foto):
+        arquivos = [foto]
+    else:
+        outros = db.session.query(Membro.id).filter(Membro.foto_perfil == foto)
+        if membro_id is not None:
+            outros = outros.filter(Membro.id != membro_id)
+        if outros.first():
+            return
+        arquivos = arquivos_da_foto(pasta, foto)
+
+    for arquivo in arquivos:
+        caminho = os.path.join(pasta, arquivo)
+        if os.path.exists(caminho):
+            os.remove(caminho)
+
+
+def resposta_foto(arquivo):
+    """
+    Resposta com o arquivo da foto, com cache longo (imutável) e ETag forte derivada do nome;
+    responde 304 às requisições condicionais. Arquivos inexistentes recebem a foto padrão,
+    com cache curto.
+    """
+    pasta = current_app.config['UPLOAD_FOLDER']
+    if arquivo != FOTO_PADRAO and not arquivo.startswith(f'{PASTA_PENDENTES}/'):
+        try:
+            etag = os.path.basename(arquivo)
+            if eh_foto_por_conteudo(arquivo):
+                etag = f'{etag}-{versao_variantes()}'
+            resposta = send_from_directory(pasta, arquivo, max_age=MAX_AGE_FOTO, etag=etag)
+            resposta.cache_control.immutable = True
+            return resposta
+        except NotFound:
+            pass
+    return send_from_directory(pasta, FOTO_PADRAO, max_age=MAX_AGE_FOTO_PADRAO)
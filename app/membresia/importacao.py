@@ -0,0 +1,293 @@
+from app.extensions import db
+from app.cache import incrementar_versao, VERSAO_MEMBROS
+from app.membresia.models import Membro, chave_aniversario
+from app.membresia.forms import MembroForm
+from app.jornada.models import registrar_eventos_jornada
+from app.busca import normalizar
+from config import Config
+from sqlalchemy import select, insert, tuple_
+from werkzeug.datastructures import MultiDict
+from datetime import date, datetime
+import csv
+import io
+import os
+
+# Linhas gravadas (e validadas contra o banco) por transação.
+LOTE_IMPORTACAO = 500
+EXTENSOES_IMPORTACAO = ('xlsx', 'csv')
+
+# Colunas aceitas na planilha (cabeçalhos comparados sem acentos e sem diferenciar maiúsculas).
+COLUNAS_IMPORTACAO = {
+    'nome_completo': ('nome_completo', 'nome completo', 'nome'),
+    'data_nascimento': ('data_nascimento', 'data de nascimento', 'data nascimento', 'nascimento'),
+    'data_recepcao': ('data_recepcao', 'data de recepcao', 'data recepcao', 'recepcao'),
+    'tipo_recepcao': ('tipo_recepcao', 'tipo de recepcao', 'tipo recepcao'),
+    'campus': ('campus',),
+    'obs_recepcao': ('obs_recepcao', 'observacoes de membresia', 'observacoes', 'observacao', 'obs'),
+}
+COLUNAS_OBRIGATORIAS = ('nome_completo', 'data_nascimento', 'data_recepcao', 'tipo_recepcao', 'campus')
+FORMATOS_DATA = ('%d/%m/%Y', '%Y-%m-%d', '%d-%m-%Y', '%d/%m/%y')
+TAMANHO_AMOSTRA_CSV = 64 * 1024
+
+DESCRICAO_JORNADA = 'Membro(a) cadastrado(a) por importação de planilha.'
+
+
+class ImportacaoMembroForm(MembroForm):
+    """
+    MembroForm aplicado a uma linha da planilha: mesmas regras, sem CSRF e sem foto.
+    A unicidade do nome é verificada em lote pelo importador (uma consulta por lote, não por linha).
+    """
+    class Meta:
+        csrf = False
+
+    foto_perfil = None
+    submit = None
+
+    def validate_nome_completo(self, nome_completo):
+        pass
+
+
+class ResultadoImportacao:
+    """Contagens e ocorrências por linha (número da linha na planilha) de uma importação."""
+
+    def __init__(self):
+        self.lidas = 0
+        self.importadas = 0
+        self.existentes = []  # (linha, nome, id do membro já cadastrado)
+        self.erros = []  # (linha, mensagem)
+
+    @property
+    def ignoradas(self):
+        return len(self.existentes) + len(self.erros)
+
+
+def _texto(valor):
+    if valor is None:
+        return ''
+    if isinstance(valor, datetime):
+        return valor.date().isoformat()
+    if isinstance(valor, date):
+        return valor.isoformat()
+    if isinstance(valor, float) and valor.is_integer():
+        valor = int(valor)
+    return str(valor).strip()
+
+
+def _data_iso(valor):
+    """Converte as datas comuns em planilhas (dd/mm/aaaa, aaaa-mm-dd, células de data) para o formato do formulário."""
+    texto = _texto(valor)
+    for formato in FORMATOS_DATA:
+        try:
+            return datetime.strptime(texto, formato).date().isoformat()
+        except ValueError:
+            continue
+    return texto
+
+
+_CAMPUS = {normalizar(c): c for c in Config.CAMPUS}
+_TIPOS_RECEPCAO = {normalizar(valor): valor for valor, _ in MembroForm.tipo_recepcao.kwargs['choices'] if valor}
+
+
+def _mapear_cabecalho(cabecalho):
+    """Posição de cada campo na linha, a partir do cabeçalho. Levanta ValueError se faltar coluna obrigatória."""
+    apelidos = {apelido: campo for campo, nomes in COLUNAS_IMPORTACAO.items() for apelido in nomes}
+    posicoes = {}
+    for posicao, titulo in enumerate(cabecalho):
+        campo = apelidos.get(normalizar(_texto(titulo)))
+        if campo and campo not in posicoes:
+            posicoes[campo] = posicao
+    ausentes = [campo for campo in COLUNAS_OBRIGATORIAS if campo not in posicoes]
+    if ausentes:
+        raise ValueError(f"Coluna(s) obrigatória(s) ausente(s) na planilha: {', '.join(ausentes)}.")
+    return posicoes
+
+
+def ler_planilha(arquivo, nome_arquivo):
+    """
+    Gera (número da linha, dict de campos) para cada linha não vazia de um XLSX ou CSV,
+    lendo o arquivo em fluxo (openpyxl em modo somente leitura / csv.reader).
+    """
+    extensao = os.path.splitext(nome_arquivo)[1].lower().lstrip('.')
+    if extensao not in EXTENSOES_IMPORTACAO:
+        raise ValueError('Formato não suportado. Envie um arquivo .xlsx ou .csv.')
+
+    if extensao == 'xlsx':
+        from openpyxl import load_workbook
+        livro = load_workbook(arquivo, read_only=True, data_only=True)
+        try:
+            yield from _linhas(livro.active.iter_rows(values_only=True))
+        finally:
+            livro.close()
+    else:
+        texto = io.TextIOWrapper(arquivo, encoding=_codificacao_csv(arquivo), newline='')
+        try:
+            amostra = texto.read(TAMANHO_AMOSTRA_CSV)
+            texto.seek(0)
+            try:
+                dialeto = csv.Sniffer().sniff(amostra, delimiters=';,\t')
+            except csv.Error:
+                dialeto = csv.excel
+            yield from _linhas(csv.reader(texto, dialeto))
+        finally:
+            texto.detach()
+
+
+def _codificacao_csv(arquivo):
+    """UTF-8 (com ou sem BOM) ou, se o início do arquivo não for UTF-8 válido, Windows-1252 (CSV salvo pelo Excel)."""
+    amostra = arquivo.read(TAMANHO_AMOSTRA_CSV)
+    arquivo.seek(0)
+    try:
+        amostra.decode('utf-8')
+    except UnicodeDecodeError as e:
+        # Um caractere cortado no fim da amostra não indica outra codificação
+        if e.start < len(amostra) - 3:
+            return 'cp1252'
+    return 'utf-8-sig'
+
+
+def _linhas(linhas):
+    linhas = iter(linhas)
+    cabecalho = next(linhas, None)
+    if cabecalho is None:
+        raise ValueError('A planilha está vazia.')
+    posicoes = _mapear_cabecalho(cabecalho)
+    for numero, linha in enumerate(linhas, start=2):
+        if not any(_texto(valor) for valor in linha):
+            continue
+        yield numero, {campo: linha[posicao] if posicao < len(linha) else None for campo, posicao in posicoes.items()}
+
+
+def validar_linha(campos, form=None):
+    """
+    Aplica as regras do MembroForm a uma linha. Um mesmo form pode ser reaproveitado
+    entre as linhas (montar os campos a cada linha custa mais que validá-los).
+
+    Returns:
+        Tupla (dados, erro): dados prontos para o insert, ou a mensagem de erro da linha.
+    """
+    campus = _texto(campos.get('campus'))
+    tipo_recepcao = _texto(campos.get('tipo_recepcao'))
+    form = form or ImportacaoMembroForm(formdata=None)
+    form.process(formdata=MultiDict({
+        'nome_completo': ' '.join(_texto(campos.get('nome_completo')).split()),
+        'data_nascimento': _data_iso(campos.get('data_nascimento')),
+        'data_recepcao': _data_iso(campos.get('data_recepcao')),
+        'tipo_recepcao': _TIPOS_RECEPCAO.get(normalizar(tipo_recepcao), tipo_recepcao),
+        'campus': _CAMPUS.get(normalizar(campus), campus),
+        'obs_recepcao': _texto(campos.get('obs_recepcao')),
+    }))
+    if not form.validate():
+        mensagens = [f'{form[campo].label.text}: {erros[0]}' for campo, erros in form.errors.items()]
+        return None, '; '.join(mensagens)
+
+    return {
+        'nome_completo': form.nome_completo.data,
+        'data_nascimento': form.data_nascimento.data,
+        'data_recepcao': form.data_recepcao.data,
+        'tipo_recepcao': form.tipo_recepcao.data,
+        'campus': form.campus.data,
+        'obs_recepcao': form.obs_recepcao.data or None,
+    }, None
+
+
+def _gravar_lote(lote, resultado, usuario_executor, dry_run):
+    """Confere o lote contra os membros já cadastrados e insere os novos (um INSERT para o lote)."""
+    chaves = {(normalizar(dados['nome_completo']), dados['data_nascimento']) for _, dados in lote}
+    existentes = dict(((nome, data), id) for id, nome, data in db.session.execute(
+        select(Membro.id, Membro.nome_normalizado, Membro.data_nascimento)
+        .where(tuple_(Membro.nome_normalizado, Membro.data_nascimento).in_(list(chaves)))
+    ))
+    nomes_em_uso = set(db.session.execute(
+        select(Membro.nome_completo).where(Membro.nome_completo.in_({dados['nome_completo'] for _, dados in lote}))
+    ).scalars())
+
+    novos = []
+    linhas_novas = []
+    for numero, dados in lote:
+        nome_normalizado = normalizar(dados['nome_completo'])
+        existente = existentes.get((nome_normalizado, dados['data_nascimento']))
+        if existente:
+            resultado.existentes.append((numero, dados['nome_completo'], existente))
+        elif dados['nome_completo'] in nomes_em_uso:
+            resultado.erros.append((numero, 'Nome Completo: Já existe um membro cadastrado com este nome completo.'))
+        else:
+            linhas_novas.append(numero)
+            novos.append({
+                **dados,
+                'nome_normalizado': nome_normalizado,
+                'aniversario_chave': chave_aniversario(dados['data_nascimento']),
+                'status': 'Membro',
+                'ativo': True,
+                'foto_perfil': 'default.jpg',
+                'status_treinamento_pg': 'Participante',
+                'participou_ctm': False,
+                'participou_encontro_deus': False,
+                'batizado_aclamado': False,
+                'cargos_mask': 0,
+            })
+
+    if not novos:
+        return
+    if dry_run:
+        resultado.importadas += len(novos)
+        return
+
+    try:
+        ids = db.session.execute(
+            insert(Membro).returning(Membro.id, sort_by_parameter_order=True), novos
+        ).scalars().all()
+        registrar_eventos_jornada(
+            [{'tipo_acao': 'CADASTRO_MEMBRO', 'descricao_detalhada': DESCRICAO_JORNADA, 'membros': [id]} for id in ids],
+            usuario_executor, commit=False
+        )
+        incrementar_versao(db.session, VERSAO_MEMBROS)
+        db.session.commit()
+        resultado.importadas += len(ids)
+    except Exception as e:
+        db.session.rollback()
+        resultado.erros.extend((numero, f'Erro ao gravar o lote: {e}') for numero in linhas_novas)
+
+
+def importar_membros(arquivo, nome_arquivo, usuario_executor=None, dry_run=False):
+    """
+    Importa membros de uma planilha XLSX ou CSV (uma linha por membro, com cabeçalho).
+
+    Cada linha é validada com as regras do MembroForm; linhas com o mesmo nome (sem acentos)
+    e data de nascimento de um membro já cadastrado, ou de uma linha anterior do arquivo, são
+    ignoradas. Os membros novos são gravados em lotes de LOTE_IMPORTACAO, cada lote em uma
+    transação com um único registro em massa dos eventos de jornada CADASTRO_MEMBRO.
+    Com dry_run, nada é gravado e o resultado indica o que seria importado.
+
+    Levanta ValueError se o arquivo não puder ser lido (formato, cabeçalho).
+    """
+    resultado = ResultadoImportacao()
+    form = ImportacaoMembroForm(formdata=None)
+    vistas = {}
+    nomes_vistos = set()
+    lote = []
+    for numero, campos in ler_planilha(arquivo, nome_arquivo):
+        resultado.lidas += 1
+        dados, erro = validar_linha(campos, form)
+        if erro:
+            resultado.erros.append((numero, erro))
+            continue
+
+        chave = (normalizar(dados['nome_completo']), dados['data_nascimento'])
+        if chave in vistas:
+            resultado.erros.append((numero, f'Repetida no arquivo (mesmo membro da linha {vistas[chave]}).'))
+            continue
+        if dados['nome_completo'] in nomes_vistos:
+            resultado.erros.append((numero, 'Nome Completo: Já existe um membro cadastrado com este nome completo.'))
+            continue
+        vistas[chave] = numero
+        nomes_vistos.add(dados['nome_completo'])
+
+        lote.append((numero, dados))
+        if len(lote) >= LOTE_IMPORTACAO:
+            _gravar_lote(lote, resultado, usuario_executor, dry_run)
+            lote = []
+    if lote:
+        _gravar_lote(lote, resultado, usuario_executor, dry_run)
+
+    resultado.erros.sort()
+    return resultado
@@ -1,31 +1,60 @@
 from app.extensions import db
-from datetime import datetime, date, timedelta
-from sqlalchemy import String, func
+from datetime import datetime, date
+from sqlalchemy import String, func, event, select
 from sqlalchemy.orm import relationship
 from flask import url_for
 from app.ctm.models import Presenca, AulaRealizada
+from app.periodos import Periodo
+
+# Cargos de liderança (bits de Membro.cargos_mask), em ordem de prioridade.
+CARGO_SUPERVISOR_AREA = 1
+CARGO_SUPERVISOR_SETOR = 2
+CARGO_FACILITADOR_PG = 4
+CARGO_ANFITRIAO_PG = 8
+CARGOS_LIDERANCA = [
+    (CARGO_SUPERVISOR_AREA, 'Supervisor de Área'),
+    (CARGO_SUPERVISOR_SETOR, 'Supervisor de Setor'),
+    (CARGO_FACILITADOR_PG, 'Facilitador de PG'),
+    (CARGO_ANFITRIAO_PG, 'Anfitrião de PG'),
+]
+CARGOS_SUPERVISAO = CARGO_SUPERVISOR_AREA | CARGO_SUPERVISOR_SETOR
+
+
+def nome_cargo_principal(cargos_mask):
+    """Nome do cargo de maior prioridade presente na máscara, ou None."""
+    return next((nome for bit, nome in CARGOS_LIDERANCA if cargos_mask & bit), None)
+
 
 class Membro(db.Model):
     id = db.Column(db.Integer, primary_key=True)
     foto_perfil = db.Column(db.String(255), nullable=True, default='default.jpg')
     nome_completo = db.Column(db.String(120), nullable=False)
+    # Nome sem acentos e em minúsculas, mantido por app.busca (usado nas buscas por nome).
+    nome_normalizado = db.Column(db.String(120), index=True)
     data_nascimento = db.Column(db.Date, nullable=True)
+    # Mês e dia do nascimento no formato MMDD (ex.: 29/02 -> 229), usado na busca indexada de aniversariantes.
+    aniversario_chave = db.Column(db.SmallInteger, index=True)
 
     status = db.Column(db.String(50), nullable=False)
 
-    data_recepcao = db.Column(db.Date, nullable=True)
+    data_recepcao = db.Column(db.Date, nullable=True, index=True)
     tipo_recepcao = db.Column(db.String(50), nullable=True)
     obs_recepcao = db.Column(db.Text, nullable=True)
 
     campus = db.Column(db.String(50), nullable=False)
     ativo = db.Column(db.Boolean, default=True)
 
-    pg_id = db.Column(db.Integer, db.ForeignKey('pequeno_grupo.id'), nullable=True)
+    pg_id = db.Column(db.Integer, db.ForeignKey('pequeno_grupo.id'), nullable=True, index=True)
     status_treinamento_pg = db.Column(db.String(50), nullable=False, default='Participante')
     participou_ctm = db.Column(db.Boolean, nullable=False, default=False)
     participou_encontro_deus = db.Column(db.Boolean, nullable=False, default=False)
     batizado_aclamado = db.Column(db.Boolean, nullable=False, default=False)
 
+    # Resumo dos cargos de liderança, mantido por app.grupos.escopos a cada alteração da hierarquia:
+    # bits CARGO_* de todos os cargos ocupados e o nome do de maior prioridade (None se nenhum).
+    cargos_mask = db.Column(db.SmallInteger, nullable=False, default=0, server_default='0', index=True)
+    cargo_principal = db.Column(db.String(30), nullable=True, index=True)
+
     presencas = db.relationship('Presenca', backref='membro', lazy=True)
     pg_participante = relationship('PequenoGrupo', back_populates='participantes', foreign_keys='Membro.pg_id')
     
@@ -36,44 +65,47 @@ class Membro(db.Model):
 
     user = db.relationship('User', back_populates='membro', uselist=False)
 
+    def _flag(self, nome):
+        # Membro ainda não gravado não tem contribuições nem presenças
+        if self.id is None:
+            return False
+        if getattr(self, '_flags', None) is None:
+            carregar_flags_membros([self])
+        return self._flags[nome]
+
     @property
     def contribuiu_dizimo_mes_atual(self):
-        from app.financeiro.models import Contribuicao
-        mes_atual = date.today().month
-        ano_atual = date.today().year
-        return db.session.query(Contribuicao).filter(
-            Contribuicao.membro_id == self.id,
-            Contribuicao.tipo == 'Dízimo',
-            Contribuicao.data_lanc.like(f'{ano_atual}-{str(mes_atual).zfill(2)}%')
-        ).first() is not None
+        return self._flag('contribuiu_dizimo_mes_atual')
 
     @property
     def contribuiu_dizimo_ultimos_30d(self):
-        from app.financeiro.models import Contribuicao
-        hoje = date.today()
-        trinta_dias_atras = hoje - timedelta(days=35)
-        return db.session.query(Contribuicao.id).filter(
-            Contribuicao.membro_id == self.id,
-            Contribuicao.tipo == 'Dízimo',
-            Contribuicao.data_lanc >= trinta_dias_atras
-        ).first() is not None
+        return self._flag('contribuiu_dizimo_ultimos_30d')
 
     @property
     def presente_ctm_ultimos_30d(self):
-        trinta_dias_atras = date.today() - timedelta(days=35)
-        return db.session.query(Presenca).join(AulaRealizada).filter(
-            Presenca.membro_id == self.id,
-            AulaRealizada.data >= trinta_dias_atras
-        ).first() is not None
+        return self._flag('presente_ctm_ultimos_30d')
 
     def __repr__(self):
         return f'<Membro {self.nome_completo}>'
 
+    @classmethod
+    def com_cargo(cls, cargos):
+        """Condição SQL: o membro ocupa algum dos cargos (bits CARGO_*) informados."""
+        return cls.cargos_mask.op('&')(cargos) != 0
+
+    def tem_cargo(self, cargos):
+        return bool((self.cargos_mask or 0) & cargos)
+
     def get_cargo_lideranca(self):
-        areas = [f"Supervisor da Área {a.nome}" for a in self.areas_supervisionadas]
-        setores = [f"Supervisor do Setor {s.nome}" for s in self.setores_supervisionados]
-        pgs_facilitados = [f"Facilitador do PG {p.nome}" for p in self.pgs_facilitados]
-        pgs_anfitriados = [f"Anfitrião do PG {p.nome}" for p in self.pgs_anfitriados]
+        # Só carrega os relacionamentos dos cargos que o membro de fato ocupa.
+        areas = [f"Supervisor da Área {a.nome}" for a in self.areas_supervisionadas] \
+            if self.tem_cargo(CARGO_SUPERVISOR_AREA) else []
+        setores = [f"Supervisor do Setor {s.nome}" for s in self.setores_supervisionados] \
+            if self.tem_cargo(CARGO_SUPERVISOR_SETOR) else []
+        pgs_facilitados = [f"Facilitador do PG {p.nome}" for p in self.pgs_facilitados] \
+            if self.tem_cargo(CARGO_FACILITADOR_PG) else []
+        pgs_anfitriados = [f"Anfitrião do PG {p.nome}" for p in self.pgs_anfitriados] \
+            if self.tem_cargo(CARGO_ANFITRIAO_PG) else []
         
         cargos = areas + setores + pgs_facilitados + pgs_anfitriados
         
@@ -82,15 +114,19 @@ class Membro(db.Model):
         
         return "Nenhum"
 
-    def get_foto_perfil_url(self):
-        return url_for('static', filename=f'uploads/profile_pics/{self.foto_perfil}')
+    def get_foto_perfil_url(self, tamanho='perfil', formato='webp'):
+        """URL da foto no tamanho ('lista', 'perfil' ou 'impressao') e formato ('webp' ou 'jpg') pedidos."""
+        from app.membresia.fotos import url_foto, eh_foto_por_conteudo, versao_variantes
+        arquivo = url_foto(self.foto_perfil, tamanho, formato)
+        if eh_foto_por_conteudo(arquivo):
+            return url_for('membresia.foto', arquivo=arquivo, v=versao_variantes())
+        return url_for('membresia.foto', arquivo=arquivo)
 
     @property
     def status_exibicao(self):
         """Retorna o status mais relevante do membro para exibição."""
-        cargo = self.get_cargo_lideranca()
-        if cargo:
-            return cargo
+        if self.cargo_principal:
+            return self.cargo_principal
 
         if self.pg_participante and self.status_treinamento_pg:
             if self.status_treinamento_pg:
@@ -100,3 +136,81 @@ class Membro(db.Model):
             return self.status
                 
         return 'Não-Membro'
+
+
+class SuspeitaDuplicidade(db.Model):
+    """
+    Par de cadastros que provavelmente são a mesma pessoa (fila de revisão da unificação).
+    Gerada por app.membresia.duplicidades; membro_a_id é sempre o menor id do par.
+    """
+    __tablename__ = 'suspeita_duplicidade'
+
+    id = db.Column(db.Integer, primary_key=True)
+    membro_a_id = db.Column(db.Integer, db.ForeignKey('membro.id', ondelete='CASCADE'), nullable=False, index=True)
+    membro_b_id = db.Column(db.Integer, db.ForeignKey('membro.id', ondelete='CASCADE'), nullable=False, index=True)
+    pontuacao = db.Column(db.Float, nullable=False)
+    motivos = db.Column(db.String(200), nullable=True)
+    status = db.Column(db.String(20), nullable=False, default='Pendente', index=True)  # 'Pendente' ou 'Descartada'
+    data_deteccao = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    data_revisao = db.Column(db.DateTime, nullable=True)
+
+    membro_a = db.relationship('Membro', foreign_keys=[membro_a_id])
+    membro_b = db.relationship('Membro', foreign_keys=[membro_b_id])
+
+    __table_args__ = (
+        db.UniqueConstraint('membro_a_id', 'membro_b_id', name='uq_suspeita_duplicidade_par'),
+    )
+
+    def __repr__(self):
+        return f'<SuspeitaDuplicidade {self.membro_a_id}/{self.membro_b_id} {self.pontuacao:.2f} ({self.status})>'
+
+
+# Janela (em dias) de "últimos 30 dias" de dízimo e presença no CTM: flags dos membros e indicadores dos grupos.
+JANELA_FREQUENCIA_DIAS = 35
+
+
+def carregar_flags_membros(membros, hoje=None):
+    """
+    Calcula as flags contribuiu_dizimo_mes_atual, contribuiu_dizimo_ultimos_30d e
+    presente_ctm_ultimos_30d de uma lista de membros com uma consulta por flag
+    e guarda o resultado nas instâncias (lido pelas propriedades de mesmo nome).
+    """
+    from app.financeiro.models import Contribuicao
+
+    membros = [m for m in membros if m.id is not None]
+    if not membros:
+        return membros
+    hoje = hoje or date.today()
+    ids = {m.id for m in membros}
+    mes_atual = Periodo.mes_de(hoje)
+    janela = Periodo.ultimos_dias(JANELA_FREQUENCIA_DIAS, hoje)
+
+    def ids_com(consulta):
+        return set(db.session.execute(consulta.distinct()).scalars())
+
+    dizimo = select(Contribuicao.membro_id).where(Contribuicao.membro_id.in_(ids), Contribuicao.tipo == 'Dízimo')
+    dizimo_mes = ids_com(dizimo.where(mes_atual.filtro(Contribuicao.data_lanc)))
+    dizimo_30d = ids_com(dizimo.where(janela.filtro(Contribuicao.data_lanc)))
+    ctm_30d = ids_com(
+        select(Presenca.membro_id).join(AulaRealizada)
+        .where(Presenca.membro_id.in_(ids), janela.filtro(AulaRealizada.data))
+    )
+
+    for membro in membros:
+        membro._flags = {
+            'contribuiu_dizimo_mes_atual': membro.id in dizimo_mes,
+            'contribuiu_dizimo_ultimos_30d': membro.id in dizimo_30d,
+            'presente_ctm_ultimos_30d': membro.id in ctm_30d,
+        }
+    return membros
+
+
+def chave_aniversario(data):
+    """Chave MMDD de uma data (None se não houver data)."""
+    return data.month * 100 + data.day if data else None
+
+
+@event.listens_for(Membro, 'before_insert')
+@event.listens_for(Membro, 'before_update')
+def _atualizar_aniversario_chave(mapper, connection, membro):
+    membro.aniversario_chave = chave_aniversario(membro.data_nascimento)
@@ -0,0 +1,134 @@
+from app.extensions import db
+from app.cache import CacheVersionado, VERSAO_MEMBROS, VERSAO_HIERARQUIA
+from app.membresia.models import Membro, chave_aniversario
+from app.grupos.escopos import ids_membros_do_escopo
+from sqlalchemy import select, func, case, or_
+from datetime import date, timedelta
+import calendar
+
+# Cargos do painel, na ordem de prioridade: cada membro conta apenas no primeiro cargo que ocupa.
+CARGOS_PAINEL = [
+    'Supervisor de Área',
+    'Supervisor de Setor',
+    'Facilitador de PG',
+    'Anfitrião de PG',
+    'Facilitador em Treinamento',
+    'Anfitrião em Treinamento',
+    'Sem Cargo',
+]
+
+# Janela padrão e máxima (em dias) das consultas de aniversariantes.
+DIAS_ANIVERSARIANTES = 15
+MAX_DIAS_ANIVERSARIANTES = 366
+
+_cache_painel = CacheVersionado((VERSAO_MEMBROS, VERSAO_HIERARQUIA), tamanho_maximo=1)
+
+
+def _cargo_principal():
+    """Expressão SQL com o cargo de maior prioridade do membro (um dos CARGOS_PAINEL)."""
+    return case(
+        (Membro.cargo_principal.isnot(None), Membro.cargo_principal),
+        (Membro.status_treinamento_pg == 'Facilitador em Treinamento', 'Facilitador em Treinamento'),
+        (Membro.status_treinamento_pg == 'Anfitrião em Treinamento', 'Anfitrião em Treinamento'),
+        else_='Sem Cargo',
+    )
+
+
+def _montar_resumo():
+    por_status = {}
+    por_campus = {}
+    consulta = select(Membro.status, Membro.campus, func.count(Membro.id))\
+        .where(Membro.ativo == True)\
+        .group_by(Membro.status, Membro.campus)\
+        .order_by(Membro.campus)
+    for status, campus, total in db.session.execute(consulta):
+        por_status[status] = por_status.get(status, 0) + total
+        por_campus[campus] = por_campus.get(campus, 0) + total
+
+    cargo = _cargo_principal().label('cargo')
+    contagem_cargos = dict.fromkeys(CARGOS_PAINEL, 0)
+    contagem_cargos.update(db.session.execute(
+        select(cargo, func.count(Membro.id)).where(Membro.ativo == True).group_by(cargo)
+    ).all())
+
+    nao_membros = por_status.get('Não-Membro', 0)
+    return {
+        'total_pessoas_ativas': sum(por_status.values()),
+        'total_membros_ativos': sum(por_status.values()) - nao_membros,
+        'total_nao_membros_ativos': nao_membros,
+        'membros_por_status': por_status,
+        'membros_por_campus': por_campus,
+        'contagem_cargos': contagem_cargos,
+    }
+
+
+def resumo_membresia():
+    """
+    Números do painel da membresia (membros ativos por status, por campus e por cargo),
+    calculados com agregações no banco e guardados em cache até a próxima alteração
+    em membros ou na hierarquia de grupos.
+    """
+    return _cache_painel.obter('painel', _montar_resumo)
+
+
+def proximo_aniversario(data_nascimento, hoje=None):
+    """Data do próximo aniversário (a partir de hoje); nascidos em 29/02 comemoram em 28/02 nos anos não bissextos."""
+    hoje = hoje or date.today()
+    for ano in (hoje.year, hoje.year + 1):
+        dia = data_nascimento.day
+        if data_nascimento.month == 2 and dia == 29 and not calendar.isleap(ano):
+            dia = 28
+        aniversario = date(ano, data_nascimento.month, dia)
+        if aniversario >= hoje:
+            return aniversario
+
+
+def filtro_aniversario(inicio, fim):
+    """
+    Condição sobre Membro.aniversario_chave para aniversários entre as datas (inclusive),
+    usando o índice; a janela pode atravessar a virada do ano.
+    """
+    if (fim - inicio).days >= 365:
+        return Membro.aniversario_chave.isnot(None)
+    chave_inicio, chave_fim = chave_aniversario(inicio), chave_aniversario(fim)
+    if fim.month == 2 and fim.day == 28 and not calendar.isleap(fim.year):
+        chave_fim = 229
+    if chave_inicio <= chave_fim:
+        return Membro.aniversario_chave.between(chave_inicio, chave_fim)
+    return or_(Membro.aniversario_chave >= chave_inicio, Membro.aniversario_chave <= chave_fim)
+
+
+def aniversariantes(dias=DIAS_ANIVERSARIANTES, hoje=None, escopo=None, escopo_ids=None):
+    """
+    Query dos membros ativos que fazem aniversário nos próximos `dias` dias (incluindo hoje),
+    em ordem de data. Se escopo ('area', 'setor' ou 'pg') e escopo_ids forem informados,
+    considera apenas os membros daqueles grupos (participantes e líderes).
+    """
+    hoje = hoje or date.today()
+    chave_hoje = chave_aniversario(hoje)
+    query = Membro.query.filter(Membro.ativo == True, filtro_aniversario(hoje, hoje + timedelta(days=dias)))
+    if escopo:
+        query = query.filter(Membro.id.in_(ids_membros_do_escopo(escopo, escopo_ids)))
+    return query.order_by(
+        case((Membro.aniversario_chave >= chave_hoje, 0), else_=1),
+        Membro.aniversario_chave,
+        Membro.nome_completo,
+    )
+
+
+def aniversariantes_json(membros, hoje=None):
+    """Lista de dicts (resposta dos endpoints de aniversariantes)."""
+    hoje = hoje or date.today()
+    resultado = []
+    for membro in membros:
+        proximo = proximo_aniversario(membro.data_nascimento, hoje)
+        resultado.append({
+            'id': membro.id,
+            'nome_completo': membro.nome_completo,
+            'campus': membro.campus,
+            'data_nascimento': membro.data_nascimento.strftime('%d/%m'),
+            'proximo_aniversario': proximo.isoformat(),
+            'dias_restantes': (proximo - hoje).days,
+            'idade': proximo.year - membro.data_nascimento.year,
+        })
+    return resultado
@@ -1,155 +1,46 @@
-from flask import Blueprint, render_template, redirect, url_for, flash, request, jsonify, current_app
+from flask import Blueprint, render_template, redirect, url_for, flash, request, jsonify, current_app, abort
 from flask_login import login_required, current_user
 from app.extensions import db
-from .models import Membro
-from .forms import MembroForm, CadastrarNaoMembroForm, EditarMembroForm
+from .models import Membro, SuspeitaDuplicidade, CARGO_FACILITADOR_PG, CARGO_ANFITRIAO_PG
+from .forms import MembroForm, CadastrarNaoMembroForm, EditarMembroForm, ImportarMembrosForm
 from app.jornada.models import JornadaEvento, registrar_evento_jornada
-from app.financeiro.models import Contribuicao
-from app.ctm.models import ConclusaoCTM, Presenca
 from app.auth.models import User
-from app.grupos.models import PequenoGrupo, Setor, Area
+from .unificacao import previa_unificacao, unificar_cadastros
+from .duplicidades import atualizar_fila_duplicidades, STATUS_PENDENTE, STATUS_DESCARTADA
+from .fotos import salvar_foto_perfil, descartar_foto, resposta_foto
+from .importacao import importar_membros
+from .painel import resumo_membresia, aniversariantes, aniversariantes_json, DIAS_ANIVERSARIANTES, MAX_DIAS_ANIVERSARIANTES
 from app.eleve.models import PontuacaoAnual, IndiceProgresso, RegistroMensal, RODA_DA_VIDA_SUBCATEGORIAS
 from config import Config
-from datetime import datetime, timedelta, date
-from sqlalchemy import func, and_, or_
-from sqlalchemy.orm import joinedload
+from datetime import datetime, date
+from sqlalchemy.orm import joinedload, aliased, contains_eager
 from werkzeug.datastructures import FileStorage
-import os
-import uuid
-from PIL import Image
 from app.decorators import admin_required, group_permission_required, secretaria_or_admin_required
-from unidecode import unidecode
+from app.busca import filtro_nome, buscar_membros
+from app.exportacao import Coluna, FORMATOS_EXPORTACAO, linhas_em_lotes, resposta_exportacao
 import re
 
 membresia_bp = Blueprint('membresia', __name__, url_prefix='/membresia')
 ano=Config.ANO_ATUAL
 versao=Config.VERSAO_APP
 
-ALLOWED_EXTENSIONS = {'png', 'jpg', 'jpeg', 'gif'}
-PROFILE_PIC_SIZE = (100, 100)
-COMPRESSION_QUALITY = 75
-
-def allowed_file(filename):
-    return '.' in filename and \
-           filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
-
-def save_profile_picture(file_data):
-    """
-    Salva e otimiza a imagem de perfil.
-    - Redimensiona para um tamanho máximo de 100x100 pixels.
-    - Converte para RGB para compatibilidade e menor tamanho (remove transparência).
-    - Aplica compressão com qualidade 75.
-    
-    Args:
-        file_data (FileStorage): O objeto de arquivo da imagem.
-        
-    Returns:
-        str: O nome único do arquivo salvo, ou None se o arquivo for inválido.
-    """
-    upload_folder = current_app.config['UPLOAD_FOLDER']
-    
-    if not isinstance(file_data, FileStorage) or not allowed_file(file_data.filename):
-        return None
-
-    try:
-        extensao = file_data.filename.rsplit('.', 1)[1].lower()
-        unique_filename = f"{uuid.uuid4()}.{extensao}"
-        filepath = os.path.join(upload_folder, unique_filename)
-
-        img = Image.open(file_data)
-        
-        img.thumbnail(PROFILE_PIC_SIZE, Image.Resampling.LANCZOS)
-        
-        if img.mode in ('RGBA', 'P'):
-            img = img.convert('RGB')
-        
-        img.save(filepath, quality=COMPRESSION_QUALITY, optimize=True)
-
-        return unique_filename
-    except Exception as e:
-        current_app.logger.error(f'Erro ao processar e salvar a imagem: {e}')
-        return None
+POR_PAGINA_DUPLICADOS = 30
+# Ocorrências por linha exibidas na tela de importação.
+MAX_ERROS_IMPORTACAO = 500
 
 @membresia_bp.route('/')
 @membresia_bp.route('/index')
 @login_required
 @secretaria_or_admin_required
 def index():
-    TIPOS_RECEPCAO_MEMBRO = ['Aclamação', 'Membro', 'Batismo']
-    total_pessoas_ativas = Membro.query.filter_by(ativo=True).count()
-    total_membros_ativos = Membro.query.filter(
-        Membro.ativo == True,
-        Membro.status != 'Não-Membro'
-    ).count()
-    
-    total_nao_membros_ativos = Membro.query.filter(
-        Membro.ativo == True,
-        Membro.status == 'Não-Membro'
-    ).count()
-    
-    membros_por_status = db.session.query(Membro.status, func.count(Membro.id)).filter_by(ativo=True).group_by(Membro.status).all()
-
-    hoje = date.today()
-    quinze_dias_depois = hoje + timedelta(days=15)
-
-    if hoje.month == quinze_dias_depois.month:
-        aniversariantes_do_mes = Membro.query.filter(
-            Membro.ativo == True,
-            db.extract('month', Membro.data_nascimento) == hoje.month,
-            db.extract('day', Membro.data_nascimento) >= hoje.day,
-            db.extract('day', Membro.data_nascimento) <= quinze_dias_depois.day
-        ).order_by(db.extract('day', Membro.data_nascimento)).all()
-    else:
-        aniversariantes_do_mes = Membro.query.filter(
-            Membro.ativo == True,
-            or_(
-                and_(db.extract('month', Membro.data_nascimento) == hoje.month, db.extract('day', Membro.data_nascimento) >= hoje.day),
-                and_(db.extract('month', Membro.data_nascimento) == quinze_dias_depois.month, db.extract('day', Membro.data_nascimento) <= quinze_dias_depois.day)
-            )
-        ).order_by(db.extract('month', Membro.data_nascimento), db.extract('day', Membro.data_nascimento)).all()
+    resumo = resumo_membresia()
 
-    membros_por_campus_data = db.session.query(Membro.campus, func.count(Membro.id)).filter_by(ativo=True).group_by(Membro.campus).all()
-    chart_labels_campus = [campus for campus, _ in membros_por_campus_data]
-    chart_data_campus = [count for _, count in membros_por_campus_data]
+    aniversariantes_do_mes = aniversariantes().all()
 
-    membros_com_cargos = Membro.query.filter_by(ativo=True).options(
-    joinedload(Membro.pgs_facilitados),
-    joinedload(Membro.pgs_anfitriados),
-    joinedload(Membro.areas_supervisionadas),
-    joinedload(Membro.setores_supervisionados)
-    ).all()
+    chart_labels_campus = list(resumo['membros_por_campus'].keys())
+    chart_data_campus = list(resumo['membros_por_campus'].values())
 
-    contagem_cargos = {
-        'Supervisor de Área': 0,
-        'Supervisor de Setor': 0,
-        'Facilitador de PG': 0,
-        'Anfitrião de PG': 0,
-        'Facilitador em Treinamento': 0,
-        'Anfitrião em Treinamento': 0,
-        'Sem Cargo': 0
-    }
-
-    for membro in membros_com_cargos:
-        if len(membro.areas_supervisionadas) > 0:
-            contagem_cargos['Supervisor de Área'] += 1
-        elif len(membro.setores_supervisionados) > 0:
-            contagem_cargos['Supervisor de Setor'] += 1
-        elif len(membro.pgs_facilitados) > 0:
-            contagem_cargos['Facilitador de PG'] += 1
-        elif len(membro.pgs_anfitriados) > 0:
-            contagem_cargos['Anfitrião de PG'] += 1
-        else:
-            status_treinamento = membro.status_treinamento_pg or 'Participante'
-            
-            if status_treinamento == 'Facilitador em Treinamento':
-                contagem_cargos['Facilitador em Treinamento'] += 1
-            
-            elif status_treinamento == 'Anfitrião em Treinamento':
-                contagem_cargos['Anfitrião em Treinamento'] += 1
-                
-            else:
-                contagem_cargos['Sem Cargo'] += 1
-    
+    contagem_cargos = resumo['contagem_cargos']
     chart_labels_cargos_pg = list(contagem_cargos.keys())
     chart_data_cargos_pg = list(contagem_cargos.values())
 
@@ -160,19 +51,32 @@ def index():
         'membresia/index.html',
         ano=ano,
         versao=versao,
-        total_membros_ativos=total_membros_ativos,
+        total_membros_ativos=resumo['total_membros_ativos'],
         resumo_membros_por_status=contagem_cargos, 
         aniversariantes_do_mes=aniversariantes_do_mes,
+        dias_aniversariantes=DIAS_ANIVERSARIANTES,
         chart_labels_campus=chart_labels_campus,
         chart_data_campus=chart_data_campus,
         chart_labels_cargos=chart_labels_cargos_pg,
         chart_data_cargos=chart_data_cargos_pg,
         campus_colors=campus_colors,
         status_colors=status_colors,
-        total_pessoas_ativas=total_pessoas_ativas, 
-        total_nao_membros_ativos=total_nao_membros_ativos
+        total_pessoas_ativas=resumo['total_pessoas_ativas'], 
+        total_nao_membros_ativos=resumo['total_nao_membros_ativos']
     )
 
+@membresia_bp.route('/aniversariantes')
+@login_required
+@secretaria_or_admin_required
+def aniversariantes_proximos():
+    dias = max(0, min(request.args.get('dias', DIAS_ANIVERSARIANTES, type=int), MAX_DIAS_ANIVERSARIANTES))
+    membros = aniversariantes(dias).all()
+    return jsonify(dias=dias, aniversariantes=aniversariantes_json(membros))
+
+@membresia_bp.route('/fotos/<path:arquivo>')
+def foto(arquivo):
+    return resposta_foto(arquivo)
+
 @membresia_bp.route('/perfil/editar', methods=['GET', 'POST'])
 @login_required
 def editar_proprio_perfil():
@@ -190,14 +94,12 @@ def editar_proprio_perfil():
         membro.data_nascimento = form.data_nascimento.data
         membro.campus = form.campus.data
 
+        foto_substituida = None
         if isinstance(form.foto_perfil.data, FileStorage) and form.foto_perfil.data.filename:
-            if old_foto_perfil and old_foto_perfil != 'default.jpg':
-                old_filepath = os.path.join(current_app.config['UPLOAD_FOLDER'], old_foto_perfil)
-                if os.path.exists(old_filepath):
-                    os.remove(old_filepath)
-            
-            filename = save_profile_picture(form.foto_perfil.data)
+            filename = salvar_foto_perfil(form.foto_perfil.data)
             if filename:
+                if filename != old_foto_perfil:
+                    foto_substituida = old_foto_perfil
                 membro.foto_perfil = filename
             else:
                 flash('Tipo de arquivo de imagem não permitido ou inválido!', 'danger')
@@ -205,6 +107,8 @@ def editar_proprio_perfil():
         
         try:
             db.session.commit()
+            if foto_substituida:
+                descartar_foto(foto_substituida, membro.id)
             flash('Seu perfil foi atualizado com sucesso!', 'success')
             registrar_evento_jornada(
                 tipo_acao='MEMBRO_ATUALIZADO_SELF',
@@ -239,7 +143,7 @@ def novo_membro():
         )
 
         if form.foto_perfil.data and form.foto_perfil.data.filename:
-            filename = save_profile_picture(form.foto_perfil.data)
+            filename = salvar_foto_perfil(form.foto_perfil.data)
             if filename:
                 membro.foto_perfil = filename
             else:
@@ -268,6 +172,43 @@ def novo_membro():
 
     return render_template('membresia/cadastro.html', form=form, ano=ano, versao=versao)
 
+@membresia_bp.route('/importar', methods=['GET', 'POST'])
+@login_required
+@secretaria_or_admin_required
+def importar():
+    form = ImportarMembrosForm()
+    resultado = None
+
+    if form.validate_on_submit():
+        arquivo = form.arquivo.data
+        try:
+            resultado = importar_membros(arquivo.stream, arquivo.filename, usuario_executor=current_user, dry_run=form.dry_run.data)
+        except ValueError as e:
+            flash(str(e), 'danger')
+        else:
+            if form.dry_run.data:
+                flash(f'Simulação concluída: {resultado.importadas} membro(s) seriam importado(s).', 'info')
+            elif resultado.importadas:
+                flash(f'{resultado.importadas} membro(s) importado(s) com sucesso!', 'success')
+            else:
+                flash('Nenhum membro novo foi importado.', 'warning')
+
+    return render_template('membresia/importar.html', form=form, resultado=resultado,
+                           max_erros=MAX_ERROS_IMPORTACAO, ano=ano, versao=versao)
+
+def _filtrar_listagem(query, busca, campus, status, recepcao):
+    """Filtros da listagem de membros ativos (também usados na exportação)."""
+    query = query.filter_by(ativo=True)
+    if busca:
+        query = query.filter(filtro_nome(Membro, busca))
+    if campus:
+        query = query.filter_by(campus=campus)
+    if status:
+        query = query.filter_by(status=status)
+    if recepcao:
+        query = query.filter_by(tipo_recepcao=recepcao)
+    return query
+
 @membresia_bp.route('/listagem')
 @login_required
 @secretaria_or_admin_required
@@ -280,16 +221,7 @@ def listagem():
     status_filtro = request.args.get('status', '')
     recepcao_filtro = request.args.get('recepcao', '')
 
-    query = Membro.query.filter_by(ativo=True)
-    if busca:
-        query = query.filter(Membro.nome_completo.ilike(f'%{busca}%'))
-    if campus_filtro:
-        query = query.filter_by(campus=campus_filtro)
-    if status_filtro:
-        query = query.filter_by(status=status_filtro)
-    if recepcao_filtro:
-        query = query.filter_by(tipo_recepcao=recepcao_filtro) 
-
+    query = _filtrar_listagem(Membro.query, busca, campus_filtro, status_filtro, recepcao_filtro)
     pagination = query.order_by(Membro.nome_completo).paginate(
         page=page, per_page=PER_PAGE, error_out=False
     )
@@ -307,6 +239,30 @@ def listagem():
         recepcao_filtro=recepcao_filtro
     )
 
+@membresia_bp.route('/listagem/exportar/<formato>')
+@login_required
+@secretaria_or_admin_required
+def exportar_listagem(formato):
+    if formato not in FORMATOS_EXPORTACAO:
+        abort(404)
+
+    query = _filtrar_listagem(
+        Membro.query, request.args.get('busca', ''), request.args.get('campus', ''),
+        request.args.get('status', ''), request.args.get('recepcao', '')
+    ).with_entities(
+        Membro.id, Membro.nome_completo, Membro.status, Membro.campus, Membro.data_nascimento, Membro.data_recepcao,
+        Membro.tipo_recepcao, Membro.cargo_principal, Membro.status_treinamento_pg, Membro.participou_ctm,
+        Membro.participou_encontro_deus, Membro.batizado_aclamado
+    ).order_by(Membro.nome_completo, Membro.id)
+
+    colunas = [
+        Coluna('ID', largura=8), Coluna('Nome Completo', largura=40), Coluna('Status'), Coluna('Campus', largura=18),
+        Coluna('Nascimento', 'data'), Coluna('Recepção', 'data'), Coluna('Tipo de Recepção', largura=16),
+        Coluna('Cargo', largura=22), Coluna('Treinamento PG', largura=16), Coluna('CTM', 'booleano'),
+        Coluna('Encontro com Deus', 'booleano', largura=18), Coluna('Batizado/Aclamado', 'booleano', largura=18),
+    ]
+    return resposta_exportacao(formato, f"Membresia_{date.today():%Y-%m-%d}", colunas, linhas_em_lotes(query), 'Membresia')
+
 @membresia_bp.route('/<int:id>/editar', methods=['GET', 'POST'])
 @login_required
 @secretaria_or_admin_required
@@ -342,14 +298,12 @@ def editar_membro(id):
             membro.status = 'Não-Membro'
             membro.ativo = True
 
+        foto_substituida = None
         if isinstance(form.foto_perfil.data, FileStorage) and form.foto_perfil.data.filename:
-            if old_foto_perfil and old_foto_perfil != 'default.jpg':
-                old_filepath = os.path.join(current_app.config['UPLOAD_FOLDER'], old_foto_perfil)
-                if os.path.exists(old_filepath):
-                    os.remove(old_filepath)
-            
-            filename = save_profile_picture(form.foto_perfil.data)
+            filename = salvar_foto_perfil(form.foto_perfil.data)
             if filename:
+                if filename != old_foto_perfil:
+                    foto_substituida = old_foto_perfil
                 membro.foto_perfil = filename
             else:
                 flash('Tipo de arquivo de imagem não permitido ou inválido!', 'danger')
@@ -357,6 +311,8 @@ def editar_membro(id):
         
         try:
             db.session.commit()
+            if foto_substituida:
+                descartar_foto(foto_substituida, membro.id)
             flash(f'Registro de {membro.nome_completo} atualizado com sucesso!', 'success')
 
             descricao_jornada = 'Dados atualizados.'
@@ -396,18 +352,7 @@ def editar_membro(id):
 def buscar_membros_ctm():
     search_term = request.args.get('term', '')
     turma_id = request.args.get('turma_id', '')
-    busca_normalizada = unidecode(search_term).lower()
-    busca_db = f'%{busca_normalizada}%'
-    
-    query = Membro.query.filter(
-        func.lower(func.unidecode(Membro.nome_completo)).like(busca_db),
-        Membro.ativo == True
-    )
-
-    if turma_id:
-        query = query.filter(~Membro.turmas_ctm.any(id=turma_id))
-
-    membros = query.order_by(Membro.nome_completo).limit(20).all()
+    membros = buscar_membros(search_term, limite=20, fora_da_turma=turma_id or None)
     
     results = []
     for membro in membros:
@@ -424,7 +369,7 @@ def buscar_membros_ctm():
 def desligar_membro(id):
     membro = Membro.query.get_or_404(id)
 
-    if len(membro.pgs_facilitados) > 0 or len(membro.pgs_anfitriados) > 0:
+    if membro.tem_cargo(CARGO_FACILITADOR_PG | CARGO_ANFITRIAO_PG):
         flash(f'Não é possível desligar {membro.nome_completo} pois ele(a) é líder de um PG.', 'danger')
         return redirect(url_for('membresia.perfil', id=membro.id))
 
@@ -470,7 +415,7 @@ def cadastro_nao_membro():
         )
 
         if form.foto_perfil.data and form.foto_perfil.data.filename:
-            filename = save_profile_picture(form.foto_perfil.data)
+            filename = salvar_foto_perfil(form.foto_perfil.data)
             if filename:
                 novo_membro.foto_perfil = filename
             else:
@@ -588,11 +533,8 @@ def unificar_membros():
     membros_sugeridos = []
 
     if busca:
-        busca_normalizada = busca.lower()
-        busca_db = f"%{busca_normalizada}%"
-
         membros_sugeridos = Membro.query.filter(
-            func.lower(func.unidecode(Membro.nome_completo)).like(busca_db)
+            filtro_nome(Membro, busca)
         ).order_by(Membro.nome_completo).limit(20).all()
 
     return render_template('membresia/unificar_membros.html', 
@@ -601,12 +543,67 @@ def unificar_membros():
                            ano=Config.ANO_ATUAL, 
                            versao=Config.VERSAO_APP)
 
+@membresia_bp.route('/duplicados', methods=['GET'])
+@login_required
+@secretaria_or_admin_required
+def duplicados():
+    page = request.args.get('page', 1, type=int)
+    membro_a = aliased(Membro)
+    membro_b = aliased(Membro)
+    pagination = SuspeitaDuplicidade.query\
+        .join(membro_a, SuspeitaDuplicidade.membro_a_id == membro_a.id)\
+        .join(membro_b, SuspeitaDuplicidade.membro_b_id == membro_b.id)\
+        .options(contains_eager(SuspeitaDuplicidade.membro_a.of_type(membro_a)),
+                 contains_eager(SuspeitaDuplicidade.membro_b.of_type(membro_b)))\
+        .filter(SuspeitaDuplicidade.status == STATUS_PENDENTE)\
+        .order_by(SuspeitaDuplicidade.pontuacao.desc(), SuspeitaDuplicidade.id)\
+        .paginate(page=page, per_page=POR_PAGINA_DUPLICADOS, error_out=False)
+
+    return render_template('membresia/duplicados.html',
+                           pagination=pagination,
+                           suspeitas=pagination.items,
+                           ano=Config.ANO_ATUAL,
+                           versao=Config.VERSAO_APP)
+
+@membresia_bp.route('/duplicados/detectar', methods=['POST'])
+@login_required
+@secretaria_or_admin_required
+def detectar_duplicados():
+    try:
+        novas, removidas, pendentes = atualizar_fila_duplicidades(db.session)
+        db.session.commit()
+        flash(f'Varredura concluída: {novas} nova(s) suspeita(s), {removidas} removida(s), {pendentes} pendente(s) de revisão.', 'success')
+    except Exception as e:
+        db.session.rollback()
+        current_app.logger.error(f'Erro ao detectar duplicidades: {e}')
+        flash(f'Erro ao detectar duplicidades: {e}', 'danger')
+    return redirect(url_for('membresia.duplicados'))
+
+@membresia_bp.route('/duplicados/<int:suspeita_id>/descartar', methods=['POST'])
+@login_required
+@secretaria_or_admin_required
+def descartar_duplicado(suspeita_id):
+    suspeita = SuspeitaDuplicidade.query.get_or_404(suspeita_id)
+    try:
+        suspeita.status = STATUS_DESCARTADA
+        suspeita.data_revisao = datetime.utcnow()
+        db.session.commit()
+        flash('Suspeita descartada: os cadastros não serão sugeridos novamente.', 'info')
+    except Exception as e:
+        db.session.rollback()
+        flash(f'Erro ao descartar a suspeita: {e}', 'danger')
+    return redirect(url_for('membresia.duplicados', page=request.args.get('page', 1, type=int)))
+
 @membresia_bp.route('/unificar/revisar', methods=['POST'])
 @login_required
 @secretaria_or_admin_required
 def unificar_revisar():
-    data = request.get_json()
-    membros_ids = data.get('membros_ids', [])
+    data = request.get_json(silent=True)
+    if data is not None:
+        membros_ids = data.get('membros_ids', [])
+    else:
+        # Vindo da fila de duplicidades (formulário comum)
+        membros_ids = request.form.getlist('membros_ids[]', type=int)
 
     if not isinstance(membros_ids, list) or len(membros_ids) < 2:
         return jsonify({'success': False, 'message': 'Selecione pelo menos dois membros para unificar.'}), 400
@@ -628,7 +625,9 @@ def unificar_revisar():
             'permissoes': membro.user.permissions if membro.user else None
         })
 
-    return render_template('membresia/unificar_revisar.html', dados_membros=dados_membros, ano=Config.ANO_ATUAL, versao=Config.VERSAO_APP)
+    previa = previa_unificacao(dados_membros[0]['id'], [dados['id'] for dados in dados_membros[1:]])
+
+    return render_template('membresia/unificar_revisar.html', dados_membros=dados_membros, previa=previa, ano=Config.ANO_ATUAL, versao=Config.VERSAO_APP)
 
 @membresia_bp.route('/unificar/processar', methods=['POST'])
 @login_required
@@ -646,7 +645,6 @@ def unificar_processar():
             return jsonify({'success': False, 'message': 'Membro principal não encontrado.'}), 404
 
         membros_ids_a_excluir = [int(id) for id in dados_revisao.getlist('membros_a_excluir[]') if int(id) != int(membro_principal_id)]
-        membros_secundarios = Membro.query.filter(Membro.id.in_(membros_ids_a_excluir)).all()
 
         membro_principal.nome_completo = dados_revisao.get('nome_completo')
         
@@ -660,13 +658,10 @@ def unificar_processar():
         membro_principal.campus = dados_revisao.get('campus')
         
         usuario_principal = User.query.filter_by(membro_id=membro_principal.id).first()
-        if not usuario_principal:
-            for membro_secundario in membros_secundarios:
-                usuario_secundario = User.query.filter_by(membro_id=membro_secundario.id).first()
-                if usuario_secundario:
-                    usuario_secundario.membro_id = membro_principal.id
-                    usuario_principal = usuario_secundario
-                    break
+        if not usuario_principal and membros_ids_a_excluir:
+            usuario_principal = User.query.filter(User.membro_id.in_(membros_ids_a_excluir)).order_by(User.id).first()
+            if usuario_principal:
+                usuario_principal.membro_id = membro_principal.id
         
         if usuario_principal:
             usuario_principal.email = dados_revisao.get('email')
@@ -674,64 +669,13 @@ def unificar_processar():
 
         db.session.add(membro_principal)
 
-        for membro_secundario in membros_secundarios:
-            
-            pgs_facilitados_secundario = PequenoGrupo.query.filter_by(facilitador_id=membro_secundario.id).all()
-            PequenoGrupo.query.filter_by(facilitador_id=membro_secundario.id).update(
-                {PequenoGrupo.facilitador_id: membro_principal.id}, synchronize_session=False
-            )
-            for pg in pgs_facilitados_secundario:
-                 flash(f'O PG {pg.nome} teve o facilitador reatribuído para {membro_principal.nome_completo}.', 'warning')
-                
-            pgs_anfitriados_secundario = PequenoGrupo.query.filter_by(anfitriao_id=membro_secundario.id).all()
-            PequenoGrupo.query.filter_by(anfitriao_id=membro_secundario.id).update(
-                {PequenoGrupo.anfitriao_id: membro_principal.id}, synchronize_session=False
-            )
-            for pg in pgs_anfitriados_secundario:
-                 flash(f'O PG {pg.nome} teve o anfitrião reatribuído para {membro_principal.nome_completo}.', 'warning')
-
-            for setor in list(membro_secundario.setores_supervisionados):
-                setor.supervisores.remove(membro_secundario)
-                setor.supervisores.append(membro_principal)
-                db.session.add(setor)
-            
-            for area in list(membro_secundario.areas_supervisionadas):
-                area.supervisores.remove(membro_secundario)
-                area.supervisores.append(membro_principal)
-                db.session.add(area)
-            
-            db.session.flush() 
-
-            conclusoes_secundarias = ConclusaoCTM.query.filter_by(membro_id=membro_secundario.id).all()
-            turmas_concluidas_principal = {c.turma_id for c in ConclusaoCTM.query.filter_by(membro_id=membro_principal.id).all()}
-            for conclusao in conclusoes_secundarias:
-                if conclusao.turma_id in turmas_concluidas_principal:
-                    db.session.delete(conclusao)
-                else:
-                    conclusao.membro_id = membro_principal.id
-            
-            presencas_secundarias = Presenca.query.filter_by(membro_id=membro_secundario.id).all()
-            aulas_com_presenca_principal = {p.aula_realizada_id for p in Presenca.query.filter_by(membro_id=membro_principal.id).all()}
-            for presenca in presencas_secundarias:
-                if presenca.aula_realizada_id in aulas_com_presenca_principal:
-                    db.session.delete(presenca)
-                else:
-                    presenca.membro_id = membro_principal.id
-
-            Contribuicao.query.filter_by(membro_id=membro_secundario.id).update({Contribuicao.membro_id: membro_principal.id}, synchronize_session=False)
-
-            for evento in membro_secundario.jornada_eventos_membro:
-                evento.membros_afetados.append(membro_principal)
-                evento.membros_afetados.remove(membro_secundario)
-
-            usuario_secundario = User.query.filter_by(membro_id=membro_secundario.id).first()
-            if usuario_secundario and usuario_secundario.id != usuario_principal.id:
-                db.session.delete(usuario_secundario)
-
-            db.session.delete(membro_secundario)
+        transferencias = unificar_cadastros(membro_principal.id, membros_ids_a_excluir, usuario_principal)
 
         db.session.commit()
         flash('Unificação de membros concluída com sucesso!', 'success')
+        if transferencias:
+            resumo = ', '.join(f'{rotulo}: {transferidos}' for rotulo, transferidos, _ in transferencias if transferidos)
+            flash(f'Registros transferidos para {membro_principal.nome_completo} — {resumo}.', 'info')
         return redirect(url_for('membresia.perfil', id=membro_principal.id))
 
     except Exception as e:
@@ -747,13 +691,7 @@ def sugerir_membros():
     membros_encontrados = []
 
     if busca:
-        busca_normalizada = unidecode(busca).lower()
-        busca_db = f"%{busca_normalizada}%"
-        
-        membros_encontrados = Membro.query.filter(
-            func.lower(func.unidecode(Membro.nome_completo)).like(busca_db),
-            Membro.ativo == True
-        ).order_by(Membro.nome_completo).limit(5).all()
+        membros_encontrados = buscar_membros(busca, limite=5)
 
     resultados_json = []
     for membro in membros_encontrados:
@@ -0,0 +1,165 @@
+from app.extensions import db
+from app.membresia.models import Membro
+from app.auth.models import User
+from app.ctm.models import ConclusaoCTM, Presenca, ClasseCTM, TurmaCTM, aluno_turma
+from app.eventos.models import InscricaoEvento, participantes_evento
+from app.eleve.models import RegistroPresenca, IndiceProgresso, PontuacaoAnual, RegistroMensal
+from app.financeiro.models import Contribuicao
+from app.grupos.models import PequenoGrupo, MembroEscopo, area_supervisores, setor_supervisores
+from app.grupos.escopos import marcar_membros, marcar_escopo, escopos_dos_membros
+from app.membresia.duplicidades import remover_suspeitas_dos_membros
+from app.jornada.models import JornadaEvento, jornada_membro_associacao
+from sqlalchemy import select, update, delete, insert, func, exists, literal
+from sqlalchemy.orm import aliased
+
+# Registros que apenas trocam de dono: (rótulo, coluna que aponta para o membro).
+REFERENCIAS_SIMPLES = [
+    ('Contribuições', Contribuicao.membro_id),
+    ('PGs como facilitador', PequenoGrupo.facilitador_id),
+    ('PGs como anfitrião', PequenoGrupo.anfitriao_id),
+    ('Classes de CTM supervisionadas', ClasseCTM.supervisor_id),
+    ('Turmas de CTM facilitadas', TurmaCTM.facilitador_id),
+    ('Inscrições em eventos', InscricaoEvento.membro_id),
+    ('Índices de progresso (Eleve)', IndiceProgresso.membro_id),
+]
+
+# Registros com restrição de unicidade: (rótulo, modelo, colunas que, com o membro, formam a chave única).
+# Em caso de conflito, o registro do membro principal é mantido e o do secundário é descartado.
+REFERENCIAS_UNICAS = [
+    ('Conclusões de CTM', ConclusaoCTM, ('turma_id',)),
+    ('Presenças em aulas de CTM', Presenca, ('aula_realizada_id',)),
+    ('Presenças (Eleve)', RegistroPresenca, ('data', 'tipo')),
+    ('Pontuações anuais (Eleve)', PontuacaoAnual, ('ano',)),
+    ('Registros mensais (Eleve)', RegistroMensal, ('mes', 'ano')),
+]
+
+# Tabelas de associação: (rótulo, tabela, coluna do membro, outra coluna da chave primária).
+ASSOCIACOES = [
+    ('Supervisões de área', area_supervisores, 'supervisor_id', 'area_id'),
+    ('Supervisões de setor', setor_supervisores, 'supervisor_id', 'setor_id'),
+    ('Turmas de CTM (aluno)', aluno_turma, 'membro_id', 'turma_id'),
+    ('Participações em eventos', participantes_evento, 'membro_id', 'evento_id'),
+    ('Eventos da jornada', jornada_membro_associacao, 'membro_id', 'jornada_id'),
+]
+
+
+def _duplicados(modelo, colunas, principal_id, secundarios_ids):
+    """
+    Condição dos registros dos secundários que colidem com um registro do principal
+    (ou de outro secundário com id menor) na chave única.
+    """
+    outro = aliased(modelo)
+    mesma_chave = [getattr(outro, c) == getattr(modelo, c) for c in colunas]
+    return exists().where(
+        *mesma_chave,
+        (outro.membro_id == principal_id) |
+        (outro.membro_id.in_(secundarios_ids) & (outro.id < modelo.id))
+    )
+
+
+def _associacoes_novas(tabela, coluna_membro, coluna_outra, principal_id, secundarios_ids):
+    """Select (outra coluna) distinto das associações dos secundários que o principal ainda não tem."""
+    membro, outra = tabela.c[coluna_membro], tabela.c[coluna_outra]
+    do_principal = select(outra).where(membro == principal_id)
+    return select(outra).where(membro.in_(secundarios_ids), outra.not_in(do_principal)).distinct()
+
+
+def previa_unificacao(principal_id, secundarios_ids):
+    """
+    Quantos registros de cada tipo serão transferidos para o membro principal (e quantos
+    serão descartados por já existirem nele). Retorna lista de (rótulo, transferidos, descartados)
+    apenas com os tipos que têm registros.
+    """
+    secundarios_ids = list(secundarios_ids)
+    previa = []
+
+    for rotulo, coluna in REFERENCIAS_SIMPLES:
+        total = db.session.execute(select(func.count()).where(coluna.in_(secundarios_ids))).scalar()
+        previa.append((rotulo, total, 0))
+
+    for rotulo, modelo, colunas in REFERENCIAS_UNICAS:
+        duplicado = _duplicados(modelo, colunas, principal_id, secundarios_ids)
+        total, descartados = db.session.execute(
+            select(func.count(modelo.id), func.count(modelo.id).filter(duplicado))
+            .where(modelo.membro_id.in_(secundarios_ids))
+        ).one()
+        previa.append((rotulo, total - descartados, descartados))
+
+    for rotulo, tabela, coluna_membro, coluna_outra in ASSOCIACOES:
+        total = db.session.execute(
+            select(func.count()).select_from(tabela).where(tabela.c[coluna_membro].in_(secundarios_ids))
+        ).scalar()
+        novas = db.session.execute(
+            select(func.count()).select_from(
+                _associacoes_novas(tabela, coluna_membro, coluna_outra, principal_id, secundarios_ids).subquery()
+            )
+        ).scalar()
+        previa.append((rotulo, novas, total - novas))
+
+    return [linha for linha in previa if linha[1] or linha[2]]
+
+
+def unificar_cadastros(principal_id, secundarios_ids, usuario_principal=None):
+    """
+    Transfere para o membro principal todos os registros dos secundários, com um comando
+    SQL por tipo de registro, e exclui os secundários e seus usuários. Não faz commit.
+
+    Args:
+        usuario_principal: usuário que passa a responder pelos eventos de jornada
+            executados pelos usuários excluídos (se None, esses eventos ficam sem executor).
+
+    Returns:
+        Prévia (rótulo, transferidos, descartados) calculada antes da transferência.
+    """
+    secundarios_ids = [i for i in secundarios_ids if i != principal_id]
+    if not secundarios_ids:
+        return []
+    sessao = db.session
+    previa = previa_unificacao(principal_id, secundarios_ids)
+
+    for _, coluna in REFERENCIAS_SIMPLES:
+        sessao.execute(
+            update(coluna.class_).where(coluna.in_(secundarios_ids)).values({coluna.key: principal_id}),
+            execution_options={'synchronize_session': False}
+        )
+
+    for _, modelo, colunas in REFERENCIAS_UNICAS:
+        sessao.execute(
+            delete(modelo).where(
+                modelo.membro_id.in_(secundarios_ids),
+                _duplicados(modelo, colunas, principal_id, secundarios_ids)
+            ),
+            execution_options={'synchronize_session': False}
+        )
+        sessao.execute(
+            update(modelo).where(modelo.membro_id.in_(secundarios_ids)).values(membro_id=principal_id),
+            execution_options={'synchronize_session': False}
+        )
+
+    for _, tabela, coluna_membro, coluna_outra in ASSOCIACOES:
+        novas = _associacoes_novas(tabela, coluna_membro, coluna_outra, principal_id, secundarios_ids)\
+            .add_columns(literal(principal_id))
+        sessao.execute(insert(tabela).from_select([coluna_outra, coluna_membro], novas))
+        sessao.execute(delete(tabela).where(tabela.c[coluna_membro].in_(secundarios_ids)))
+
+    usuarios_secundarios = [
+        usuario_id for usuario_id in sessao.execute(select(User.id).where(User.membro_id.in_(secundarios_ids))).scalars()
+        if usuario_principal is None or usuario_id != usuario_principal.id
+    ]
+    if usuarios_secundarios:
+        sessao.execute(
+            update(JornadaEvento).where(JornadaEvento.usuario_executor_id.in_(usuarios_secundarios))
+            .values(usuario_executor_id=usuario_principal.id if usuario_principal else None),
+            execution_options={'synchronize_session': False}
+        )
+        sessao.execute(delete(User).where(User.id.in_(usuarios_secundarios)), execution_options={'synchronize_session': False})
+
+    remover_suspeitas_dos_membros(sessao, secundarios_ids)
+    marcar_membros(sessao, [principal_id, *secundarios_ids])
+    # Apagadas as linhas de membro_escopo dos secundários, o recálculo não acharia mais os escopos antigos deles.
+    for escopo, escopo_id in escopos_dos_membros(sessao, secundarios_ids):
+        marcar_escopo(sessao, escopo, escopo_id)
+    sessao.execute(delete(MembroEscopo).where(MembroEscopo.membro_id.in_(secundarios_ids)))
+    sessao.execute(delete(Membro).where(Membro.id.in_(secundarios_ids)), execution_options={'synchronize_session': False})
+
+    return previa
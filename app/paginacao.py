@@ -0,0 +1,88 @@
+import base64
+import json
+import operator
+from sqlalchemy import and_, or_
+
+
+class PaginaKeyset:
+    """
+    Página de uma listagem paginada por chave (keyset), sem OFFSET.
+
+    - itens: registros da página.
+    - proximo / anterior: cursores opacos para os parâmetros 'apos' / 'antes' (None quando não há).
+    """
+    def __init__(self, itens, proximo, anterior):
+        self.itens = itens
+        self.proximo = proximo
+        self.anterior = anterior
+
+    @property
+    def has_next(self):
+        return self.proximo is not None
+
+    @property
+    def has_prev(self):
+        return self.anterior is not None
+
+
+def codificar_cursor(valores):
+    return base64.urlsafe_b64encode(json.dumps(list(valores)).encode()).decode().rstrip('=')
+
+
+def decodificar_cursor(cursor):
+    """Retorna a lista de valores do cursor, ou None se ele estiver ausente ou inválido."""
+    if not cursor:
+        return None
+    try:
+        valores = json.loads(base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)))
+    except ValueError:
+        return None
+    return valores if isinstance(valores, list) else None
+
+
+def _comparar(colunas, valores, operador):
+    """(c1, c2, ...) > (v1, v2, ...) (ou <) expandido para funcionar em qualquer banco."""
+    condicoes = []
+    for i, coluna in enumerate(colunas):
+        iguais = [colunas[j] == valores[j] for j in range(i)]
+        condicoes.append(and_(*iguais, operador(coluna, valores[i])))
+    return or_(*condicoes)
+
+
+def paginar_keyset(query, colunas, apos=None, antes=None, por_pagina=30):
+    """
+    Pagina uma query ORM ordenando pelas colunas informadas (a última deve ser única, ex.: id).
+
+    Args:
+        query: query ORM já filtrada, sem order_by.
+        colunas: colunas de ordenação, ex.: (PequenoGrupo.nome, PequenoGrupo.id).
+        apos: cursor da página seguinte (parâmetro 'apos').
+        antes: cursor da página anterior (parâmetro 'antes').
+    """
+    colunas = list(colunas)
+    cursor_apos = decodificar_cursor(apos)
+    cursor_antes = decodificar_cursor(antes) if cursor_apos is None else None
+
+    if cursor_antes is not None and len(cursor_antes) == len(colunas):
+        itens = query.filter(_comparar(colunas, cursor_antes, operator.lt))\
+            .order_by(*[c.desc() for c in colunas]).limit(por_pagina + 1).all()
+        ha_mais = len(itens) > por_pagina
+        itens = list(reversed(itens[:por_pagina]))
+        anterior = _cursor(itens[0], colunas) if ha_mais and itens else None
+        proximo = _cursor(itens[-1], colunas) if itens else None
+        return PaginaKeyset(itens, proximo, anterior)
+
+    if cursor_apos is not None and len(cursor_apos) == len(colunas):
+        query = query.filter(_comparar(colunas, cursor_apos, operator.gt))
+    else:
+        cursor_apos = None
+    itens = query.order_by(*colunas).limit(por_pagina + 1).all()
+    ha_mais = len(itens) > por_pagina
+    itens = itens[:por_pagina]
+    proximo = _cursor(itens[-1], colunas) if ha_mais else None
+    anterior = _cursor(itens[0], colunas) if cursor_apos is not None and itens else None
+    return PaginaKeyset(itens, proximo, anterior)
+
+
+def _cursor(item, colunas):
+    return codificar_cursor(getattr(item, coluna.key) for coluna in colunas)
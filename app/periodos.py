@@ -0,0 +1,97 @@
+from sqlalchemy import Date, and_, true, func
+from sqlalchemy.ext.compiler import compiles
+from sqlalchemy.sql.expression import FunctionElement
+from datetime import date, timedelta
+
+
+class dia_seguinte(FunctionElement):
+    """
+    Dia seguinte a uma expressão de data, calculado no banco. Usado no fim exclusivo de períodos
+    cujas datas vêm de colunas (ex.: a meta vigente de cada área); a conta é feita sobre o limite,
+    nunca sobre a coluna filtrada, que segue comparada diretamente e usando o índice.
+    """
+    type = Date()
+    name = 'dia_seguinte'
+    inherit_cache = True
+
+
+@compiles(dia_seguinte)
+def _dia_seguinte(elemento, compilador, **kw):
+    return f'DATE_ADD({compilador.process(elemento.clauses, **kw)}, INTERVAL 1 DAY)'
+
+
+@compiles(dia_seguinte, 'sqlite')
+def _dia_seguinte_sqlite(elemento, compilador, **kw):
+    return f"date({compilador.process(elemento.clauses, **kw)}, '+1 day')"
+
+
+@compiles(dia_seguinte, 'postgresql')
+def _dia_seguinte_postgresql(elemento, compilador, **kw):
+    return f'(CAST({compilador.process(elemento.clauses, **kw)} AS DATE) + 1)'
+
+
+class Periodo:
+    """
+    Intervalo de datas semiaberto [inicio, fim): inclui o dia `inicio` e exclui o dia `fim`.
+    Um limite None deixa o período aberto daquele lado.
+
+    `filtro(coluna)` compara a coluna diretamente com os limites (coluna >= inicio AND coluna < fim),
+    o que permite ao banco usar o índice da coluna, ao contrário de extract()/strftime()/LIKE aplicados
+    a ela. Com o fim exclusivo, o mesmo filtro vale para colunas Date e DateTime (o último dia entra inteiro).
+    Os limites podem ser datas ou expressões SQL (ver `da_meta_vigente`).
+    """
+    __slots__ = ('inicio', 'fim')
+
+    def __init__(self, inicio=None, fim=None):
+        self.inicio = inicio
+        self.fim = fim
+
+    @classmethod
+    def mes(cls, ano, mes):
+        inicio = date(ano, mes, 1)
+        return cls(inicio, date(ano + 1, 1, 1) if mes == 12 else date(ano, mes + 1, 1))
+
+    @classmethod
+    def mes_de(cls, dia):
+        """Mês que contém o dia informado."""
+        return cls.mes(dia.year, dia.month)
+
+    @classmethod
+    def ano(cls, ano):
+        return cls(date(ano, 1, 1), date(ano + 1, 1, 1))
+
+    @classmethod
+    def ultimos_dias(cls, dias, hoje=None):
+        """De `dias` dias atrás até hoje, inclusive."""
+        hoje = hoje or date.today()
+        return cls(hoje - timedelta(days=dias), hoje + timedelta(days=1))
+
+    @classmethod
+    def entre(cls, inicial=None, final=None):
+        """Período entre duas datas inclusive (ex.: data inicial/final dos filtros); qualquer uma pode faltar."""
+        return cls(inicial, final + timedelta(days=1) if final else None)
+
+    @classmethod
+    def da_meta_vigente(cls, meta, inicio_padrao=None, fim_padrao=None):
+        """
+        Janela da AreaMetaVigente lida no próprio SQL: `meta` é uma subquery com as colunas data_inicio/data_fim
+        (inclusive), como a de `janelas_de_meta()`. Sem meta (colunas nulas), valem os limites padrão.
+        """
+        inicio, fim = meta.c.data_inicio, dia_seguinte(meta.c.data_fim)
+        if inicio_padrao is not None:
+            inicio = func.coalesce(inicio, inicio_padrao)
+        if fim_padrao is not None:
+            fim = func.coalesce(fim, fim_padrao)
+        return cls(inicio, fim)
+
+    def filtro(self, coluna):
+        """Condição SQL "coluna dentro do período"."""
+        condicoes = []
+        if self.inicio is not None:
+            condicoes.append(coluna >= self.inicio)
+        if self.fim is not None:
+            condicoes.append(coluna < self.fim)
+        return and_(*condicoes) if condicoes else true()
+
+    def __repr__(self):
+        return f'<Periodo [{self.inicio}, {self.fim})>'
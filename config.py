@@ -39,6 +39,9 @@ class Config:
 
     ID_OFERTA_ANONIMA = 90000
 
+    # Threads que geram os tamanhos das fotos de perfil enviadas.
+    FOTOS_WORKERS = int(os.environ.get('FOTOS_WORKERS') or 2)
+
     CORES_CAMPUS = {
         'Central':        '#0d6efd',
         'Concesso Elias': "#20c997",
@@ -5,6 +5,8 @@ from flask import current_app
 
 from alembic import context
 
+from app.busca import TABELA_FTS_MEMBROS
+
 # this is the Alembic Config object, which provides
 # access to the values within the .ini file in use.
 config = context.config
@@ -51,6 +53,14 @@ def get_metadata():
     return target_db.metadata
 
 
+def include_name(name, type_, parent_names):
+    # O índice FTS5 de busca de membros (e as tabelas internas dele) é criado
+    # fora dos modelos e não deve entrar no autogenerate.
+    if type_ == 'table':
+        return not name.startswith(TABELA_FTS_MEMBROS)
+    return True
+
+
 def run_migrations_offline():
     """Run migrations in 'offline' mode.
 
@@ -93,6 +103,7 @@ def run_migrations_online():
     conf_args = current_app.extensions['migrate'].configure_args
     if conf_args.get("process_revision_directives") is None:
         conf_args["process_revision_directives"] = process_revision_directives
+    conf_args.setdefault("include_name", include_name)
 
     connectable = get_engine()
 
@@ -0,0 +1,85 @@
+"""Tabela membro_escopo (fechamento da hierarquia)
+
+Revision ID: ad0ef95ccee5
+Revises: f0e0a77d5287
+Create Date: 2026-10-18 09:12:41.318204
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = 'ad0ef95ccee5'
+down_revision = 'f0e0a77d5287'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('membro_escopo',
+    sa.Column('escopo', sa.String(length=10), nullable=False),
+    sa.Column('escopo_id', sa.Integer(), nullable=False),
+    sa.Column('membro_id', sa.Integer(), nullable=False),
+    sa.Column('papel', sa.String(length=20), nullable=False),
+    sa.Column('area_id', sa.Integer(), nullable=False),
+    sa.ForeignKeyConstraint(['membro_id'], ['membro.id'], ondelete='CASCADE'),
+    sa.PrimaryKeyConstraint('escopo', 'escopo_id', 'membro_id', 'papel')
+    )
+    with op.batch_alter_table('membro_escopo', schema=None) as batch_op:
+        batch_op.create_index(batch_op.f('ix_membro_escopo_membro_id'), ['membro_id'], unique=False)
+
+    # Carga inicial (equivalente a `flask grupos rebuild-escopos`)
+    op.execute("""
+        INSERT INTO membro_escopo (membro_id, escopo, escopo_id, area_id, papel)
+        SELECT m.id, 'pg', pg.id, s.area_id, 'participante'
+          FROM membro m JOIN pequeno_grupo pg ON m.pg_id = pg.id JOIN setor s ON pg.setor_id = s.id
+        UNION
+        SELECT m.id, 'setor', s.id, s.area_id, 'participante'
+          FROM membro m JOIN pequeno_grupo pg ON m.pg_id = pg.id JOIN setor s ON pg.setor_id = s.id
+         WHERE pg.ativo
+        UNION
+        SELECT m.id, 'area', s.area_id, s.area_id, 'participante'
+          FROM membro m JOIN pequeno_grupo pg ON m.pg_id = pg.id JOIN setor s ON pg.setor_id = s.id
+         WHERE pg.ativo
+        UNION
+        SELECT pg.facilitador_id, 'pg', pg.id, s.area_id, 'facilitador'
+          FROM pequeno_grupo pg JOIN setor s ON pg.setor_id = s.id
+         WHERE pg.facilitador_id IS NOT NULL
+        UNION
+        SELECT pg.facilitador_id, 'setor', s.id, s.area_id, 'facilitador'
+          FROM pequeno_grupo pg JOIN setor s ON pg.setor_id = s.id
+         WHERE pg.facilitador_id IS NOT NULL AND pg.ativo
+        UNION
+        SELECT pg.facilitador_id, 'area', s.area_id, s.area_id, 'facilitador'
+          FROM pequeno_grupo pg JOIN setor s ON pg.setor_id = s.id
+         WHERE pg.facilitador_id IS NOT NULL AND pg.ativo
+        UNION
+        SELECT pg.anfitriao_id, 'pg', pg.id, s.area_id, 'anfitriao'
+          FROM pequeno_grupo pg JOIN setor s ON pg.setor_id = s.id
+         WHERE pg.anfitriao_id IS NOT NULL
+        UNION
+        SELECT pg.anfitriao_id, 'setor', s.id, s.area_id, 'anfitriao'
+          FROM pequeno_grupo pg JOIN setor s ON pg.setor_id = s.id
+         WHERE pg.anfitriao_id IS NOT NULL AND pg.ativo
+        UNION
+        SELECT pg.anfitriao_id, 'area', s.area_id, s.area_id, 'anfitriao'
+          FROM pequeno_grupo pg JOIN setor s ON pg.setor_id = s.id
+         WHERE pg.anfitriao_id IS NOT NULL AND pg.ativo
+        UNION
+        SELECT ss.supervisor_id, 'setor', s.id, s.area_id, 'supervisor_setor'
+          FROM setor_supervisores ss JOIN setor s ON ss.setor_id = s.id
+        UNION
+        SELECT ss.supervisor_id, 'area', s.area_id, s.area_id, 'supervisor_setor'
+          FROM setor_supervisores ss JOIN setor s ON ss.setor_id = s.id
+        UNION
+        SELECT sa.supervisor_id, 'area', sa.area_id, sa.area_id, 'supervisor_area'
+          FROM area_supervisores sa
+    """)
+
+
+def downgrade():
+    with op.batch_alter_table('membro_escopo', schema=None) as batch_op:
+        batch_op.drop_index(batch_op.f('ix_membro_escopo_membro_id'))
+
+    op.drop_table('membro_escopo')